@@ -3,6 +3,12 @@
 # Licensed under the MIT License. See License.txt in the project root for
 # license information.
 # --------------------------------------------------------------------------
+from ._blob_io import (
+    AppendBlobLogWriter,
+    BlobReader,
+    BlobWriter,
+    ShardedLogWriter,
+)
 from .appendblobservice import AppendBlobService
 from .blockblobservice import BlockBlobService
 from .models import (
@@ -20,6 +26,8 @@ from .models import (
     _LeaseActions,
     AppendBlockProperties,
     PageBlobProperties,
+    PageBlobBackup,
+    LogRecord,
     ResourceProperties,
     Include,
     SequenceNumberAction,
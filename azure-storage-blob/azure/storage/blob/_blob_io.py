@@ -0,0 +1,1054 @@
+# -------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+# --------------------------------------------------------------------------
+import heapq
+import io
+import re
+import struct
+import threading
+import time
+import zlib
+from collections import (
+    OrderedDict,
+    deque,
+)
+
+from azure.common import AzureHttpError
+from azure.storage.common.models import _OperationContext
+
+from ._constants import _MAX_BLOCK_COUNT
+from ._error import _ERROR_WRITER_TOO_MANY_BLOCKS
+from ._upload_chunking import _get_block_id
+from .models import (
+    AppendBlockProperties,
+    BlobBlock,
+    LogRecord,
+    _BlobTypes,
+)
+
+
+class BlobReader(io.RawIOBase):
+    '''
+    A seekable, read-only file object over a blob, as returned by
+    :func:`~azure.storage.blob.baseblobservice.BaseBlobService.open_blob`.
+
+    The blob is read in blocks of block_size bytes, with a ranged get for each
+    block when it is first read, so reading a few bytes anywhere in the blob
+    costs a single request of at most block_size bytes. The most recently read
+    blocks are kept in a cache of at most max_cached_blocks blocks. Once reads
+    follow each other, the next max_connections blocks are downloaded in the
+    background while the current ones are read, and a read spanning several
+    blocks downloads them in parallel.
+
+    Every get is made only if the blob still matches the etag it had when it was
+    opened, so the reads are consistent even if the blob is modified, in which
+    case the reads fail. As appending to an append blob does not modify the
+    data already there, an append blob can still be read while it is appended
+    to, up to the size it had when it was opened. A BlobReader must not be
+    shared between threads without locking. It can be wrapped in an
+    io.BufferedReader to buffer small reads.
+
+    :ivar ~azure.storage.blob.models.Blob blob:
+        The blob read, with the properties and metadata it was opened with.
+    :ivar int size:
+        The size of the blob, in bytes.
+    '''
+
+    def __init__(self, blob_service, container_name, blob_name, snapshot, blob, block_size,
+                 max_connections, max_cached_blocks, lease_id, validate_content, timeout):
+        super(BlobReader, self).__init__()
+        self.blob = blob
+        self.size = blob.properties.content_length
+
+        self._blob_service = blob_service
+        self._container_name = container_name
+        self._blob_name = blob_name
+        self._snapshot = snapshot
+        self._block_size = block_size
+        self._max_connections = max_connections
+        self._max_cached_blocks = max_cached_blocks
+        self._lease_id = lease_id
+        self._validate_content = validate_content
+        self._timeout = timeout
+
+        # Send a context object to make sure we always retry to the initial location
+        self._operation_context = _OperationContext(location_lock=True)
+        self._if_match = None if blob.properties.blob_type == _BlobTypes.AppendBlob else blob.properties.etag
+
+        self._position = 0
+        # where the last read ended, to detect sequential reads
+        self._last_read_end = None
+
+        # the blocks read last, least recently used first
+        self._cache = OrderedDict()
+        # the blocks being downloaded in the background, by index
+        self._pending = {}
+        self._executor = None
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        self._check_not_closed()
+        return self._position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        self._check_not_closed()
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self._position + offset
+        elif whence == io.SEEK_END:
+            position = self.size + offset
+        else:
+            raise ValueError('invalid whence ({0}, should be 0, 1 or 2)'.format(whence))
+
+        if position < 0:
+            raise ValueError('negative seek position {0}'.format(position))
+        self._position = position
+        return position
+
+    def readall(self):
+        return self.read(max(self.size - self._position, 0))
+
+    def readinto(self, b):
+        self._check_not_closed()
+        view = memoryview(b).cast('B') if hasattr(memoryview, 'cast') else memoryview(b)
+        read_start = self._position
+        read_end = min(read_start + len(view), self.size)
+        if read_end <= read_start:
+            return 0
+
+        first_block = read_start // self._block_size
+        last_block = (read_end - 1) // self._block_size
+        sequential = read_start == self._last_read_end
+        self._last_read_end = read_end
+
+        # download the other blocks of the read, and the next ones if the reads
+        # are sequential, while the first block is read
+        read_ahead = self._max_connections if sequential else 0
+        if self._max_connections > 1 and (last_block > first_block or read_ahead):
+            self._prefetch(first_block, last_block + 1 + read_ahead)
+
+        offset = read_start
+        while offset < read_end:
+            index = offset // self._block_size
+            block_start = index * self._block_size
+            data = self._get_block(index)[offset - block_start:read_end - block_start]
+            view[offset - read_start:offset - read_start + len(data)] = data
+            offset += len(data)
+
+        self._position = read_end
+        return read_end - read_start
+
+    def close(self):
+        if not self.closed:
+            for future in self._pending.values():
+                future.cancel()
+            self._pending = {}
+            self._cache.clear()
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+        super(BlobReader, self).close()
+
+    def _check_not_closed(self):
+        if self.closed:
+            raise ValueError('I/O operation on closed file.')
+
+    def _get_block(self, index):
+        data = self._cache.pop(index, None)
+        if data is None:
+            future = self._pending.pop(index, None)
+            data = future.result() if future is not None else self._download_block(index)
+
+        self._cache[index] = data
+        while len(self._cache) > self._max_cached_blocks:
+            self._cache.popitem(last=False)
+        return data
+
+    def _prefetch(self, start_index, end_index):
+        import concurrent.futures
+        if self._executor is None:
+            self._executor = concurrent.futures.ThreadPoolExecutor(self._max_connections)
+
+        # the blocks downloaded for reads which were given up on are dropped, so
+        # the memory held by the downloads stays bounded
+        end_index = min(end_index, -(-self.size // self._block_size))
+        for index in list(self._pending):
+            if not start_index <= index < end_index:
+                self._pending.pop(index).cancel()
+
+        for index in range(start_index, end_index):
+            if index not in self._cache and index not in self._pending:
+                self._pending[index] = self._executor.submit(self._download_block, index)
+
+    def _download_block(self, index):
+        block_start = index * self._block_size
+        block_end = min(block_start + self._block_size, self.size)
+        return self._blob_service._get_blob(
+            self._container_name,
+            self._blob_name,
+            snapshot=self._snapshot,
+            start_range=block_start,
+            end_range=block_end - 1,
+            validate_content=self._validate_content,
+            lease_id=self._lease_id,
+            if_match=self._if_match,
+            timeout=self._timeout,
+            _context=self._operation_context,
+            _decrypt=False,
+        ).content
+
+
+class BlobWriter(io.BufferedIOBase):
+    '''
+    A write-only file object uploading a blob, as returned by
+    :func:`~azure.storage.blob.blockblobservice.BlockBlobService.open_blob_for_write`
+    and :func:`~azure.storage.blob.appendblobservice.AppendBlobService.open_blob_for_write`.
+
+    The data written is accumulated into blocks of block_size bytes, in a pool of
+    at most max_connections + 1 buffers which are reused from block to block. Each
+    full block is uploaded in the background while the next one is written, with
+    at most max_connections blocks uploaded at once, or one at a time and in
+    order for an append blob. A write waits while all the buffers are in use, so
+    at most (max_connections + 1) * block_size bytes are held in memory however
+    fast the data is written.
+
+    Closing the writer uploads the last block, then for a block blob commits the
+    blocks uploaded, which creates or replaces the blob with the data written,
+    so a block blob is not modified until the writer is closed. The blocks of an
+    append blob are appended as they are uploaded. If a block fails to upload,
+    no more blocks are uploaded and the error is raised by the next write, flush
+    or close. A write which would need more blocks than a blob can hold fails
+    before uploading them.
+
+    A writer left by an error raised in its with block, or garbage collected
+    without being closed, is aborted instead of closed: the data not uploaded
+    yet is dropped and the blocks of a block blob are not committed.
+
+    A BlobWriter must not be shared between threads without locking.
+
+    :ivar ~azure.storage.blob.models.ResourceProperties properties:
+        The etag and last modified time of the blob, once the writer is closed.
+    '''
+
+    def __init__(self, target, block_size, max_connections):
+        super(BlobWriter, self).__init__()
+        self.properties = None
+
+        self._target = target
+        self._block_size = block_size
+        self._max_connections = max_connections
+
+        # the buffer being written to, and the offset of its data in the blob
+        self._buffer = None
+        self._buffer_length = 0
+        self._offset = 0
+        self._block_offsets = []
+
+        # guards the buffers, the uploads in flight and the error
+        self._condition = threading.Condition()
+        self._free_buffers = []
+        self._buffer_count = 0
+        self._in_flight = 0
+        self._error = None
+        self._aborted = False
+        self._executor = None
+
+    def writable(self):
+        return True
+
+    def tell(self):
+        self._check_not_closed()
+        return self._offset + self._buffer_length
+
+    def write(self, b):
+        self._check_not_closed()
+        self._raise_upload_error()
+
+        view = memoryview(b).cast('B') if hasattr(memoryview, 'cast') else memoryview(b)
+        written = 0
+        while written < len(view):
+            if self._buffer is None:
+                self._buffer = self._get_buffer()
+                self._buffer_length = 0
+
+            length = min(self._block_size - self._buffer_length, len(view) - written)
+            self._buffer[self._buffer_length:self._buffer_length + length] = view[written:written + length]
+            self._buffer_length += length
+            written += length
+
+            if self._buffer_length == self._block_size:
+                self._upload_buffer()
+
+        return written
+
+    def flush(self):
+        '''
+        Raises the error of a failed upload, if any. For an append blob, also
+        appends the data written so far and waits until it is appended. The data
+        of a block blob is only committed when the writer is closed.
+        '''
+        self._check_not_closed()
+        if self._target.sequential:
+            if self._buffer_length:
+                self._upload_buffer()
+            with self._condition:
+                while self._in_flight:
+                    self._condition.wait()
+        self._raise_upload_error()
+
+    def close(self):
+        if self.closed:
+            return
+
+        try:
+            if self._error is None and self._buffer_length:
+                self._upload_buffer()
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+            self._raise_upload_error()
+            self.properties = self._target.commit(self._block_offsets)
+        finally:
+            self._release()
+
+    def abort(self):
+        '''
+        Closes the writer without uploading the data not uploaded yet, and
+        without committing the blocks of a block blob, which is left unchanged.
+        The blocks already appended to an append blob stay appended.
+        '''
+        if self.closed:
+            return
+
+        with self._condition:
+            self._aborted = True
+        try:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+        finally:
+            self._release()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def __del__(self):
+        # io.IOBase closes a file object when it is garbage collected, which
+        # would commit the blocks of a writer which was never closed
+        try:
+            self.abort()
+        except Exception:
+            pass
+
+    def _release(self):
+        self._executor = None
+        self._buffer = None
+        self._free_buffers = []
+        super(BlobWriter, self).close()
+
+    def _check_not_closed(self):
+        if self.closed:
+            raise ValueError('I/O operation on closed file.')
+
+    def _raise_upload_error(self):
+        if self._error is not None:
+            raise self._error
+
+    def _get_buffer(self):
+        # wait for an upload to complete once all the buffers are in use
+        with self._condition:
+            while not self._free_buffers and self._buffer_count > self._max_connections and self._error is None:
+                self._condition.wait()
+            self._raise_upload_error()
+
+            if self._free_buffers:
+                return self._free_buffers.pop()
+            self._buffer_count += 1
+        return bytearray(self._block_size)
+
+    def _upload_buffer(self):
+        import concurrent.futures
+        if self._target.max_blocks is not None and len(self._block_offsets) >= self._target.max_blocks:
+            raise ValueError(_ERROR_WRITER_TOO_MANY_BLOCKS.format(self._target.max_blocks))
+        if self._executor is None:
+            self._executor = concurrent.futures.ThreadPoolExecutor(
+                1 if self._target.sequential else self._max_connections)
+
+        buffer, length, offset = self._buffer, self._buffer_length, self._offset
+        self._buffer = None
+        self._buffer_length = 0
+        self._offset += length
+        self._block_offsets.append(offset)
+
+        with self._condition:
+            self._in_flight += 1
+        self._executor.submit(self._upload, buffer, length, offset)
+
+    def _upload(self, buffer, length, offset):
+        try:
+            # the blocks after a failed one are dropped, the writer fails anyway
+            if self._error is None and not self._aborted:
+                self._target.upload(offset, memoryview(buffer)[:length])
+        except Exception as ex:
+            with self._condition:
+                if self._error is None:
+                    self._error = ex
+        finally:
+            with self._condition:
+                self._in_flight -= 1
+                self._free_buffers.append(buffer)
+                self._condition.notify_all()
+
+
+class _BufferStream(io.RawIOBase):
+    '''
+    A seekable, read-only stream over a buffer, to send a buffer of a BlobWriter
+    as a request body without copying it.
+    '''
+
+    def __init__(self, view):
+        super(_BufferStream, self).__init__()
+        self._view = view
+        self._position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += len(self._view)
+        self._position = max(offset, 0)
+        return self._position
+
+    def readinto(self, b):
+        data = self._view[self._position:self._position + len(b)]
+        b[:len(data)] = data
+        self._position += len(data)
+        return len(data)
+
+
+class _BlockBlobWriteTarget(object):
+    '''
+    Puts the blocks of a BlobWriter, and commits them when it is closed.
+    '''
+
+    sequential = False
+    max_blocks = _MAX_BLOCK_COUNT
+
+    def __init__(self, blob_service, container_name, blob_name, content_settings, metadata,
+                 validate_content, lease_id, if_modified_since, if_unmodified_since, if_match,
+                 if_none_match, timeout):
+        self.blob_service = blob_service
+        self.container_name = container_name
+        self.blob_name = blob_name
+        self.content_settings = content_settings
+        self.metadata = metadata
+        self.validate_content = validate_content
+        self.lease_id = lease_id
+        self.if_modified_since = if_modified_since
+        self.if_unmodified_since = if_unmodified_since
+        self.if_match = if_match
+        self.if_none_match = if_none_match
+        self.timeout = timeout
+
+    def upload(self, offset, view):
+        self.blob_service._put_block(
+            self.container_name,
+            self.blob_name,
+            _BufferStream(view),
+            _get_block_id(offset),
+            validate_content=self.validate_content,
+            lease_id=self.lease_id,
+            timeout=self.timeout,
+        )
+
+    def commit(self, block_offsets):
+        return self.blob_service._put_block_list(
+            self.container_name,
+            self.blob_name,
+            [BlobBlock(_get_block_id(offset)) for offset in block_offsets],
+            content_settings=self.content_settings,
+            metadata=self.metadata,
+            validate_content=self.validate_content,
+            lease_id=self.lease_id,
+            if_modified_since=self.if_modified_since,
+            if_unmodified_since=self.if_unmodified_since,
+            if_match=self.if_match,
+            if_none_match=self.if_none_match,
+            timeout=self.timeout,
+        )
+
+
+class _AppendBlobWriteTarget(object):
+    '''
+    Appends the blocks of a BlobWriter, in order, to an existing append blob.
+    '''
+
+    sequential = True
+    max_blocks = _MAX_BLOCK_COUNT
+
+    def __init__(self, blob_service, container_name, blob_name, validate_content,
+                 maxsize_condition, lease_id, timeout):
+        self.blob_service = blob_service
+        self.container_name = container_name
+        self.blob_name = blob_name
+        self.validate_content = validate_content
+        self.maxsize_condition = maxsize_condition
+        self.lease_id = lease_id
+        self.timeout = timeout
+
+        # the offset in the blob of the first block appended, and the response
+        # to the last block appended
+        self.append_offset = None
+        self.properties = None
+
+    def upload(self, offset, view):
+        # after the first block, each block must be appended right after the
+        # previous one, so blocks appended by another writer fail the writer
+        appendpos_condition = None if self.append_offset is None else self.append_offset + offset
+        try:
+            resp = self.blob_service.append_block(
+                self.container_name,
+                self.blob_name,
+                view.tobytes(),
+                validate_content=self.validate_content,
+                maxsize_condition=self.maxsize_condition,
+                appendpos_condition=appendpos_condition,
+                lease_id=self.lease_id,
+                timeout=self.timeout,
+            )
+        except AzureHttpError as ex:
+            # a retry of an append which went through, but whose response was
+            # lost, fails the position condition as the block is already there
+            if appendpos_condition is None or ex.status_code != 412:
+                raise
+            resp = self._get_appended_block(appendpos_condition, len(view))
+            if resp is None:
+                raise
+
+        if self.append_offset is None:
+            self.append_offset = resp.append_offset - offset
+        self.properties = resp
+
+    def _get_appended_block(self, appendpos_condition, length):
+        '''
+        Gets the properties of the block of length bytes appended at
+        appendpos_condition, if the blob ends with it, or None.
+        '''
+        blob = self.blob_service.get_blob_properties(self.container_name, self.blob_name,
+                                                     lease_id=self.lease_id, timeout=self.timeout)
+        if blob.properties.content_length != appendpos_condition + length:
+            return None
+
+        resp = AppendBlockProperties()
+        resp.etag = blob.properties.etag
+        resp.last_modified = blob.properties.last_modified
+        resp.append_offset = appendpos_condition
+        resp.committed_block_count = blob.properties.append_blob_committed_block_count
+        return resp
+
+    def commit(self, block_offsets):
+        return self.properties
+
+
+class AppendBlobLogWriter(BlobWriter):
+    '''
+    A BlobWriter shipping a log to a series of append blobs, as returned by
+    :func:`~azure.storage.blob.appendblobservice.AppendBlobService.open_log_writer`.
+
+    Small writes are coalesced into blocks of block_size bytes, so a log written
+    in small batches is appended with few, full size blocks. A block is appended
+    once it is full, or by a background thread once its first byte has waited
+    for flush_interval seconds. Each block is appended at the position where the
+    previous one ended, so an append retried after its response was lost is not
+    appended twice.
+
+    The log is written to segment blobs named after the log, with a 6 digit
+    segment number appended, such as 'app.log.000000'. The writer appends to the
+    last segment of the log if it has room, and rolls over to a new segment once
+    the current one has max_segment_blocks blocks, before the service limit of
+    50,000 blocks per append blob.
+
+    Unlike a BlobWriter, an AppendBlobLogWriter can be written to from several
+    threads, each write being appended whole and in order. Leaving its with
+    block on an error closes it, so the log written before the error is kept.
+
+    :ivar list(str) segments:
+        The names of the segments written to so far, in order.
+    '''
+
+    def __init__(self, target, block_size, max_connections, flush_interval):
+        super(AppendBlobLogWriter, self).__init__(target, block_size, max_connections)
+        self.segments = target.segments
+
+        self._lock = threading.RLock()
+        self._flush_interval = flush_interval
+        # when the data buffered must be appended
+        self._flush_deadline = None
+        self._stopped = threading.Event()
+        self._flusher = threading.Thread(target=self._flush_periodically)
+        self._flusher.daemon = True
+        self._flusher.start()
+
+    def write(self, b):
+        with self._lock:
+            written = super(AppendBlobLogWriter, self).write(b)
+            if self._buffer_length and self._flush_deadline is None:
+                self._flush_deadline = time.time() + self._flush_interval
+            return written
+
+    def flush(self):
+        with self._lock:
+            super(AppendBlobLogWriter, self).flush()
+
+    def close(self):
+        self._stopped.set()
+        try:
+            with self._lock:
+                super(AppendBlobLogWriter, self).close()
+        finally:
+            self._join_flusher()
+
+    def abort(self):
+        self._stopped.set()
+        try:
+            with self._lock:
+                super(AppendBlobLogWriter, self).abort()
+        finally:
+            self._join_flusher()
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _join_flusher(self):
+        if self._flusher is not threading.current_thread():
+            self._flusher.join()
+
+    def _upload_buffer(self):
+        self._flush_deadline = None
+        super(AppendBlobLogWriter, self)._upload_buffer()
+
+    def _flush_periodically(self):
+        while True:
+            deadline = self._flush_deadline
+            timeout = self._flush_interval if deadline is None else max(deadline - time.time(), 0)
+            if self._stopped.wait(timeout):
+                return
+
+            with self._lock:
+                # the block is only appended, without waiting for it, errors are
+                # raised by the next write
+                if not self.closed and self._error is None and self._flush_deadline is not None and \
+                        self._flush_deadline <= time.time():
+                    self._upload_buffer()
+
+
+def _get_segment_name(log_name, index):
+    return '{0}.{1:06d}'.format(log_name, index)
+
+
+class _AppendBlobLogTarget(_AppendBlobWriteTarget):
+    '''
+    Appends the blocks of an AppendBlobLogWriter to the segments of a log,
+    rolling over to a new segment when the current one is full.
+    '''
+
+    # the segments roll over before they are full
+    max_blocks = None
+
+    def __init__(self, blob_service, container_name, log_name, content_settings, metadata,
+                 max_segment_blocks, validate_content, timeout):
+        super(_AppendBlobLogTarget, self).__init__(blob_service, container_name, None, validate_content,
+                                                   None, None, timeout)
+        self.log_name = log_name
+        self.content_settings = content_settings
+        self.metadata = metadata
+        self.max_segment_blocks = max_segment_blocks
+        self.segments = []
+        self.segment_index = None
+        self.segment_blocks = 0
+
+    def open(self):
+        '''
+        Continues the last segment of the log if it has room, or starts a new one.
+        '''
+        segment_pattern = re.compile(re.escape(self.log_name) + r'\.(\d{6})$')
+        last_index = None
+        for blob in self.blob_service.list_blobs(self.container_name, prefix=self.log_name + '.',
+                                                 timeout=self.timeout):
+            match = segment_pattern.match(blob.name)
+            if match and (last_index is None or int(match.group(1)) > last_index):
+                last_index = int(match.group(1))
+
+        if last_index is None:
+            self._roll_over(0, 0)
+            return
+
+        blob_name = _get_segment_name(self.log_name, last_index)
+        blob = self.blob_service.get_blob_properties(self.container_name, blob_name, timeout=self.timeout)
+        self.blob_name = blob_name
+        self.segment_index = last_index
+        self.segment_blocks = blob.properties.append_blob_committed_block_count or 0
+        self.append_offset = blob.properties.content_length
+        self.segments.append(blob_name)
+
+    def upload(self, offset, view):
+        if self.segment_blocks >= self.max_segment_blocks:
+            self._roll_over(self.segment_index + 1, offset)
+
+        super(_AppendBlobLogTarget, self).upload(offset, view)
+        self.segment_blocks = self.properties.committed_block_count or self.segment_blocks + 1
+
+    def _roll_over(self, index, offset):
+        # the segment is created only if it does not exist, so two writers of
+        # the same log cannot overwrite each other's segments
+        blob_name = _get_segment_name(self.log_name, index)
+        self.blob_service.create_blob(self.container_name, blob_name, content_settings=self.content_settings,
+                                      metadata=self.metadata, if_none_match='*', timeout=self.timeout)
+        self.blob_name = blob_name
+        self.segment_index = index
+        self.segment_blocks = 0
+        # the writer offsets are relative to the whole log
+        self.append_offset = -offset
+        self.segments.append(blob_name)
+
+
+def _tail_append_blob(blob_service, container_name, blob_name, offset, min_poll_interval, max_poll_interval,
+                      idle_timeout, timeout, log_name=None, segment_index=None):
+    '''
+    Yields the data appended to a blob from offset on. The blob is read in
+    ranged gets of MAX_CHUNK_GET_SIZE. Once a get returned less than that, the
+    data appended so far has been read, and the blob is polled with ranged gets
+    made only if its etag changed, so that an idle poll costs a request with no
+    content, and the polls are made less often while the blob stays idle. When
+    following a log, moves on to the next segment of the log once it exists and
+    an unconditional get found no more data in the current segment.
+    '''
+    # Send a context object to make sure we always retry to the initial location
+    operation_context = _OperationContext(location_lock=True)
+    etag = None
+    block_count = 0
+    poll_interval = min_poll_interval
+    idle_since = time.time()
+    next_segment_exists = False
+    # whether the data appended before the etag was read, so that the get can be conditional
+    caught_up = False
+
+    while True:
+        data = None
+        try:
+            blob = blob_service._get_blob(
+                container_name,
+                blob_name,
+                start_range=offset,
+                end_range=offset + blob_service.MAX_CHUNK_GET_SIZE - 1,
+                if_none_match=etag if caught_up and not next_segment_exists else None,
+                timeout=timeout,
+                _context=operation_context,
+                _decrypt=False,
+            )
+            if (blob.properties.append_blob_committed_block_count or 0) < block_count:
+                # the blob was recreated since the last poll, so read it from the start
+                offset, etag, block_count, caught_up = 0, None, 0, False
+                continue
+            data = blob.content
+            etag = blob.properties.etag
+            block_count = blob.properties.append_blob_committed_block_count or 0
+            caught_up = len(data) < blob_service.MAX_CHUNK_GET_SIZE
+        except AzureHttpError as ex:
+            if ex.status_code == 416:
+                # the blob changed but has no data past the offset, or it was
+                # recreated shorter than the offset
+                blob = blob_service.get_blob_properties(container_name, blob_name, timeout=timeout)
+                if blob.properties.content_length < offset:
+                    offset, etag, block_count, caught_up = 0, None, 0, False
+                    continue
+                etag = blob.properties.etag
+                block_count = blob.properties.append_blob_committed_block_count or 0
+                caught_up = True
+            elif ex.status_code not in (304, 404):
+                # the blob is unchanged, or does not exist yet
+                raise
+
+        if data:
+            offset += len(data)
+            poll_interval = min_poll_interval
+            idle_since = time.time()
+            yield data
+            continue
+
+        if log_name is not None:
+            if next_segment_exists:
+                # the writer appends no more to a segment once it rolled over, and
+                # an unconditional get since found no more data in the segment
+                segment_index += 1
+                blob_name = _get_segment_name(log_name, segment_index)
+                offset, etag, block_count, caught_up = 0, None, 0, False
+                next_segment_exists = False
+                continue
+            if blob_service.exists(container_name, _get_segment_name(log_name, segment_index + 1), timeout=timeout):
+                next_segment_exists = True
+                continue
+
+        if idle_timeout is not None and time.time() - idle_since >= idle_timeout:
+            return
+        time.sleep(poll_interval)
+        poll_interval = min(poll_interval * 2, max_poll_interval)
+
+
+def _tail_log(blob_service, container_name, log_name, min_poll_interval, max_poll_interval, idle_timeout, timeout):
+    '''
+    Yields the data of the segments of a log from its first segment on.
+    '''
+    segment_pattern = re.compile(re.escape(log_name) + r'\.(\d{6})$')
+    first_index = None
+    for blob in blob_service.list_blobs(container_name, prefix=log_name + '.', timeout=timeout):
+        match = segment_pattern.match(blob.name)
+        if match and (first_index is None or int(match.group(1)) < first_index):
+            first_index = int(match.group(1))
+    first_index = first_index or 0
+
+    return _tail_append_blob(blob_service, container_name, _get_segment_name(log_name, first_index), 0,
+                             min_poll_interval, max_poll_interval, idle_timeout, timeout,
+                             log_name=log_name, segment_index=first_index)
+
+
+# the header of each record of a sharded log: a marker, its sequence number, its
+# length, the CRC32 of its data, and the CRC32 of the header fields before it
+_LOG_RECORD_HEADER = struct.Struct('>4sQIII')
+_LOG_RECORD_MARKER = b'LgR1'
+
+
+def _pack_log_record(sequence, data):
+    header = _LOG_RECORD_HEADER.pack(_LOG_RECORD_MARKER, sequence, len(data), zlib.crc32(data) & 0xffffffff, 0)
+    header_crc = zlib.crc32(header[:-4]) & 0xffffffff
+    return header[:-4] + struct.pack('>I', header_crc) + data
+
+
+def _get_shard_name(log_name, shard):
+    return '{0}.{1:03d}'.format(log_name, shard)
+
+
+class ShardedLogWriter(object):
+    '''
+    Writes the records of a log to several shards in parallel, as returned by
+    :func:`~azure.storage.blob.appendblobservice.AppendBlobService.open_sharded_log_writer`.
+    As the blocks of an append blob are appended one at a time, a log written to
+    a single append blob is limited to the throughput of one connection, while
+    the shards are appended to in parallel.
+
+    Each shard is a log of its own written by an AppendBlobLogWriter, named after
+    the log with a 3 digit shard number appended, such as 'app.log.002', whose
+    segments are named such as 'app.log.002.000000'. The records with the same
+    key are written to the same shard, and the records without a key are spread
+    round robin over the shards.
+
+    Each record is written with a sequence number, the time it was written at in
+    microseconds since the epoch, made strictly increasing for the records of a
+    writer, its length, and checksums of the header and data. read_sharded_log
+    merges the shards back into the order the records were written in by this
+    sequence number. A record left incomplete by a writer which stopped while
+    appending it fails its checksums, so the reader skips it and finds the next
+    record by its header, and a writer opened later can append to the same shard.
+
+    A log must have a single writer at a time. Writers of the same log open at
+    once append to the same shards and fail each other's appends, as the writer
+    of each shard only appends at the position it expects the shard to end at. A
+    writer opened after another one was closed numbers its records from its own
+    clock, so their records are only read back in order if the clock of the
+    later writer is not behind the clock of the earlier one.
+
+    A ShardedLogWriter can be written to from several threads.
+
+    :ivar shards:
+        The writers of the shards, by shard number.
+    :vartype shards: list(:class:`~azure.storage.blob.AppendBlobLogWriter`)
+    '''
+
+    def __init__(self, shards):
+        self.shards = shards
+        self._shard_locks = [threading.Lock() for _ in shards]
+        self._lock = threading.Lock()
+        self._sequence = 0
+        self._next_shard = 0
+
+    def write_record(self, data, key=None):
+        '''
+        Writes a record to the shard of its key, or to the next shard if it has
+        no key.
+
+        :param bytes data:
+            The content of the record.
+        :param key:
+            The key which picks the shard of the record, if any.
+        :type key: str or bytes
+        :return: The sequence number of the record.
+        :rtype: int
+        '''
+        if key is None:
+            with self._lock:
+                shard = self._next_shard
+                self._next_shard = (shard + 1) % len(self.shards)
+        else:
+            key = key if isinstance(key, bytes) else key.encode('utf-8')
+            shard = (zlib.crc32(key) & 0xffffffff) % len(self.shards)
+
+        # the sequence numbers must increase in the order the records are written
+        # to a shard, so a shard is locked from numbering a record to writing it
+        with self._shard_locks[shard]:
+            with self._lock:
+                self._sequence = max(self._sequence + 1, int(time.time() * 1000000))
+                sequence = self._sequence
+            self.shards[shard].write(_pack_log_record(sequence, data))
+        return sequence
+
+    def flush(self):
+        '''
+        Appends the records written so far to their shards.
+        '''
+        for shard in self.shards:
+            shard.flush()
+
+    def close(self):
+        '''
+        Appends the records written so far and closes the writers of the shards.
+        If a shard fails, the other shards are still closed before its error is raised.
+        '''
+        error = None
+        for shard in self.shards:
+            try:
+                shard.close()
+            except Exception as ex:
+                error = error or ex
+        if error is not None:
+            raise error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def _read_sharded_log(blob_service, container_name, log_name, timeout):
+    '''
+    Reads the records of all the shards of a log, merged by sequence number.
+    '''
+    segment_pattern = re.compile(re.escape(log_name) + r'\.(\d{3})\.(\d{6})$')
+    shards = {}
+    for blob in blob_service.list_blobs(container_name, prefix=log_name + '.', timeout=timeout):
+        match = segment_pattern.match(blob.name)
+        if match:
+            shards.setdefault(int(match.group(1)), []).append((int(match.group(2)), blob))
+
+    shard_records = [_read_shard_records(blob_service, container_name, shard,
+                                         [blob for _, blob in sorted(segments, key=lambda segment: segment[0])],
+                                         timeout)
+                     for shard, segments in sorted(shards.items())]
+    for _, _, record in heapq.merge(*shard_records):
+        yield record
+
+
+def _read_shard_records(blob_service, container_name, shard, segments, timeout):
+    '''
+    Reads the records of a shard from its segments, in order, as (sequence, shard,
+    record) tuples to be merged with the other shards. A record may span two
+    segments. A record which is incomplete, because it is still being written or
+    its writer stopped, fails its checksums and is skipped up to the next record
+    marker.
+    '''
+    stream = _SegmentStream(blob_service, container_name, segments, timeout)
+    try:
+        while True:
+            header = stream.read_exactly(_LOG_RECORD_HEADER.size)
+            if header is None:
+                return
+            marker, sequence, length, data_crc, header_crc = _LOG_RECORD_HEADER.unpack(header)
+            if marker == _LOG_RECORD_MARKER and header_crc == zlib.crc32(header[:-4]) & 0xffffffff:
+                data = stream.read_exactly(length)
+                if data is not None and data_crc == zlib.crc32(data) & 0xffffffff:
+                    yield sequence, shard, LogRecord(sequence, shard, data)
+                    continue
+                if data is not None:
+                    stream.unread(data)
+
+            # not a complete record, look for the next marker after the start of this one
+            resync = header.find(_LOG_RECORD_MARKER[:1], 1)
+            stream.unread(header[resync:] if resync != -1 else b'')
+    finally:
+        stream.close()
+
+
+class _SegmentStream(object):
+    '''
+    Reads the segments of a log one after the other, as a single stream.
+    '''
+
+    def __init__(self, blob_service, container_name, segments, timeout):
+        self.blob_service = blob_service
+        self.container_name = container_name
+        self.segments = list(segments)
+        self.timeout = timeout
+        self.current = None
+        # the data put back to be read again, as views which are sliced without copying
+        self.pending = deque()
+
+    def unread(self, data):
+        '''
+        Puts data back in front of the stream, to be read again.
+        '''
+        if data:
+            self.pending.appendleft(memoryview(data))
+
+    def read_exactly(self, length):
+        '''
+        Reads length bytes, or returns None if the segments end before, leaving
+        the bytes which remain to be read again.
+        '''
+        parts = []
+        remaining = length
+        while remaining and self.pending:
+            view = self.pending.popleft()
+            parts.append(view[:remaining].tobytes())
+            if len(view) > remaining:
+                self.pending.appendleft(view[remaining:])
+            remaining -= len(parts[-1])
+        while remaining:
+            if self.current is None:
+                if not self.segments:
+                    self.unread(b''.join(parts))
+                    return None
+                segment = self.segments.pop(0)
+                self.current = io.BufferedReader(self.blob_service.open_blob(
+                    self.container_name, segment.name, timeout=self.timeout, blob_hint=segment))
+
+            data = self.current.read(remaining)
+            if not data:
+                self.current.close()
+                self.current = None
+                continue
+            parts.append(data)
+            remaining -= len(data)
+        return b''.join(parts)
+
+    def close(self):
+        if self.current is not None:
+            self.current.close()
+            self.current = None
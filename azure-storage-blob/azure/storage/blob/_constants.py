@@ -12,3 +12,8 @@ X_MS_VERSION = '2018-03-28'
 
 # internal configurations, should not be changed
 _LARGE_BLOB_UPLOAD_MAX_READ_BUFFER_SIZE = 4 * 1024 * 1024
+_PAGE_SIZE = 512
+_PAGE_BLOB_BACKUP_MAGIC = b'AZPBBAK1'
+_MAX_BLOCK_COUNT = 50000
+_MAX_PUT_BLOCK_SIZE = 100 * 1024 * 1024
+_MAX_RANGE_MD5_SIZE = 4 * 1024 * 1024
@@ -5,6 +5,8 @@
 # --------------------------------------------------------------------------
 from azure.common import AzureException
 from dateutil import parser
+from json import loads
+from struct import unpack
 
 try:
     from xml.etree import cElementTree as ETree
@@ -36,8 +38,11 @@ from .models import (
     ResourceProperties,
     BlobPrefix,
     AccountInformation,
+    PageBlobBackup,
 )
+from ._constants import _PAGE_BLOB_BACKUP_MAGIC
 from ._encryption import _decrypt_blob
+from ._error import _ERROR_INVALID_PAGE_BLOB_BACKUP
 from azure.storage.common.models import _list
 from azure.storage.common._error import (
     _validate_content_match,
@@ -449,3 +454,22 @@ def _parse_account_information(response):
     account_info.account_kind = response.headers['x-ms-account-kind']
 
     return account_info
+
+
+def _read_page_blob_backup_header(stream):
+    '''
+    Reads the header written by _write_page_blob_backup_header, leaving the
+    stream positioned at the content of the first page range.
+    '''
+    if stream.read(len(_PAGE_BLOB_BACKUP_MAGIC)) != _PAGE_BLOB_BACKUP_MAGIC:
+        raise ValueError(_ERROR_INVALID_PAGE_BLOB_BACKUP)
+
+    header_length = unpack('>Q', stream.read(8))[0]
+    header = loads(stream.read(header_length).decode('utf-8'))
+
+    return PageBlobBackup(
+        header['Snapshot'],
+        header['PreviousSnapshot'],
+        header['BlobSize'],
+        [PageRange(start, end) for start, end in header['PageRanges']],
+        [PageRange(start, end, True) for start, end in header['ClearedRanges']])
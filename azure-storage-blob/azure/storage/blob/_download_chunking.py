@@ -5,14 +5,32 @@
 # --------------------------------------------------------------------------
 import threading
 
+from azure.common import AzureException
+
+from azure.storage.common._error import _ERROR_DECRYPTION_FAILURE
+from azure.storage.common._scheduler import _ScheduledTransfer
+from azure.storage.common._tuning import (
+    _TunedTransfer,
+    _timed,
+)
+from ._constants import _MAX_RANGE_MD5_SIZE
+from ._encryption import _decrypt_blob_chunk
+
 
 def _download_blob_chunks(blob_service, container_name, blob_name, snapshot,
                           download_size, block_size, progress, start_range, end_range,
                           stream, max_connections, progress_callback, validate_content,
                           lease_id, if_modified_since, if_unmodified_since, if_match,
-                          if_none_match, timeout, operation_context):
+                          if_none_match, timeout, operation_context,
+                          content_encryption_key=None, initialization_vector=None, checkpoint=None,
+                          tuner=None):
 
-    downloader_class = _ParallelBlobChunkDownloader if max_connections > 1 else _SequentialBlobChunkDownloader
+    # a checkpointed download writes each chunk at its offset of the stream
+    # even with a single connection, as the completed chunks are skipped
+    if max_connections > 1 or checkpoint is not None:
+        downloader_class = _ParallelBlobChunkDownloader
+    else:
+        downloader_class = _SequentialBlobChunkDownloader
 
     downloader = downloader_class(
         blob_service,
@@ -36,13 +54,80 @@ def _download_blob_chunks(blob_service, container_name, blob_name, snapshot,
         operation_context,
     )
 
+    # Decryption runs as part of each chunk, so it is spread across the download threads
+    downloader.content_encryption_key = content_encryption_key
+    downloader.initialization_vector = initialization_vector
+    downloader.checkpoint = checkpoint
+
+    # the chunks of a checkpointed download must keep the size they are recorded with
+    if tuner is not None and checkpoint is None:
+        downloader.tuner = tuner
+        process, chunks = downloader.process_range, downloader.get_tuned_chunk_ranges()
+    else:
+        process, chunks = downloader.process_chunk, downloader.get_chunk_offsets()
+
+    if max_connections > 1:
+        if downloader.tuner is not None:
+            transfer = _TunedTransfer(process, chunks, lambda chunk_range: chunk_range[1] - chunk_range[0],
+                                      max_connections, tuner)
+        else:
+            transfer = _ScheduledTransfer(process, chunks, max_connections)
+        blob_service._run_transfer(transfer)
+    else:
+        for chunk in chunks:
+            process(chunk)
+
+    # the decrypted content is shorter than the download by its padding
+    return downloader.padding_length
+
+
+def _download_blob_ranges(blob_service, container_name, blob_name, snapshot, page_ranges,
+                          block_size, stream, max_connections, progress_callback, validate_content,
+                          lease_id, if_match, timeout, operation_context, packed=False):
+    '''
+    Downloads only the given ranges of a blob, writing each one at its own offset
+    of the (seekable) stream. Anything between the ranges is left untouched, so
+    the ranges of a page blob can be downloaded into a sparse file. If packed is
+    set, the ranges are instead written back to back, in order, from the current
+    position of the stream.
+    '''
+    download_size = sum(page_range.end - page_range.start + 1 for page_range in page_ranges)
+    blob_end = page_ranges[-1].end + 1 if page_ranges else 0
+
+    # the ranges are written out of order, so the parallel downloader is used
+    # even with a single connection as it seeks before every write
+    downloader_class = _PackedRangeChunkDownloader if packed else _ParallelBlobChunkDownloader
+    downloader = downloader_class(
+        blob_service,
+        container_name,
+        blob_name,
+        snapshot,
+        download_size,
+        block_size,
+        0,
+        0,
+        blob_end,
+        stream,
+        progress_callback,
+        validate_content,
+        lease_id,
+        None,
+        None,
+        if_match,
+        None,
+        timeout,
+        operation_context,
+    )
+
+    if progress_callback is not None:
+        progress_callback(0, download_size)
+
     if max_connections > 1:
-        import concurrent.futures
-        executor = concurrent.futures.ThreadPoolExecutor(max_connections)
-        list(executor.map(downloader.process_chunk, downloader.get_chunk_offsets()))
+        blob_service._run_transfer(
+            _ScheduledTransfer(downloader.process_range, downloader.get_range_chunks(page_ranges), max_connections))
     else:
-        for chunk in downloader.get_chunk_offsets():
-            downloader.process_chunk(chunk)
+        for chunk_range in downloader.get_range_chunks(page_ranges):
+            downloader.process_range(chunk_range)
 
 
 class _BlobChunkDownloader(object):
@@ -79,24 +164,79 @@ class _BlobChunkDownloader(object):
         self.if_match = if_match
         self.if_none_match = if_none_match
 
+        # decryption of the chunks, only set for encrypted blobs
+        self.content_encryption_key = None
+        self.initialization_vector = None
+
+        # the chunks completed so far, only set for checkpointed downloads
+        self.checkpoint = None
+
+        # sizes the chunks from the measured requests, only set for tuned downloads
+        self.tuner = None
+
+        # the length of the padding removed from the last chunk of an encrypted blob
+        self.padding_length = 0
+
     def get_chunk_offsets(self):
         index = self.start_index
         while index < self.blob_end:
-            yield index
+            if self.checkpoint is not None and self.checkpoint.is_chunk_complete(self._get_chunk_index(index)):
+                self._update_progress(min(self.chunk_size, self.blob_end - index))
+            else:
+                yield index
             index += self.chunk_size
 
+    def _get_chunk_index(self, chunk_start):
+        return (chunk_start - self.start_index) // self.chunk_size
+
+    def get_tuned_chunk_ranges(self):
+        # each chunk is sized when it is about to be downloaded, from the chunks before it,
+        # and kept within the largest range the service returns a transactional MD5 for
+        max_chunk_size = _MAX_RANGE_MD5_SIZE if self.validate_content else None
+        index = self.start_index
+        while index < self.blob_end:
+            chunk_end = min(index + self.tuner.get_chunk_size(self.chunk_size, max_chunk_size=max_chunk_size),
+                            self.blob_end)
+            yield index, chunk_end
+            index = chunk_end
+
+    def get_range_chunks(self, page_ranges):
+        # merge adjacent ranges, then split them up into chunks of at most chunk_size
+        merged_ranges = []
+        for page_range in page_ranges:
+            if merged_ranges and merged_ranges[-1][1] == page_range.start:
+                merged_ranges[-1][1] = page_range.end + 1
+            else:
+                merged_ranges.append([page_range.start, page_range.end + 1])
+
+        for range_start, range_end in merged_ranges:
+            for chunk_start in range(range_start, range_end, self.chunk_size):
+                yield chunk_start, min(chunk_start + self.chunk_size, range_end)
+
     def process_chunk(self, chunk_start):
         if chunk_start + self.chunk_size > self.blob_end:
             chunk_end = self.blob_end
         else:
             chunk_end = chunk_start + self.chunk_size
 
-        chunk_data = self._download_chunk(chunk_start, chunk_end).content
+        self.process_range((chunk_start, chunk_end))
+
+    def process_range(self, chunk_range):
+        chunk_start, chunk_end = chunk_range
+
         length = chunk_end - chunk_start
+        if self.content_encryption_key is None:
+            chunk_data = self._download_chunk(chunk_start, chunk_end).content
+        else:
+            chunk_data = self._download_and_decrypt_chunk(chunk_start, chunk_end)
+            self.padding_length = max(self.padding_length, length - len(chunk_data))
         if length > 0:
             self._write_to_stream(chunk_data, chunk_start)
             self._update_progress(length)
 
+        if self.checkpoint is not None:
+            self.checkpoint.set_chunk_complete(self._get_chunk_index(chunk_start))
+
     # should be provided by the subclass
     def _update_progress(self, length):
         pass
@@ -105,8 +245,27 @@ class _BlobChunkDownloader(object):
     def _write_to_stream(self, chunk_data, chunk_start):
         pass
 
+    def _download_and_decrypt_chunk(self, chunk_start, chunk_end):
+        # Align the range along 16 byte blocks and include the preceding
+        # block, which is the IV for this chunk
+        start_offset = chunk_start % 16
+        encrypted_start = chunk_start - start_offset
+        if encrypted_start > 0:
+            start_offset += 16
+            encrypted_start -= 16
+
+        end_offset = 15 - ((chunk_end - 1) % 16)
+        encrypted_end = chunk_end + end_offset
+
+        response = self._download_chunk(encrypted_start, encrypted_end)
+        try:
+            return _decrypt_blob_chunk(self.content_encryption_key, self.initialization_vector,
+                                       response, start_offset, end_offset)
+        except:
+            raise AzureException(_ERROR_DECRYPTION_FAILURE)
+
     def _download_chunk(self, chunk_start, chunk_end):
-        response = self.blob_service._get_blob(
+        response = _timed(self.tuner, chunk_end - chunk_start, lambda: self.blob_service._get_blob(
             self.container_name,
             self.blob_name,
             snapshot=self.snapshot,
@@ -119,8 +278,10 @@ class _BlobChunkDownloader(object):
             if_match=self.if_match,
             if_none_match=self.if_none_match,
             timeout=self.timeout,
-            _context=self.operation_context
-        )
+            _context=self.operation_context,
+            # decryption, if any, is done by _download_and_decrypt_chunk
+            _decrypt=False,
+        ))
 
         # This makes sure that if_match is set so that we can validate 
         # that subsequent downloads are to an unmodified blob
@@ -163,6 +324,10 @@ class _ParallelBlobChunkDownloader(_BlobChunkDownloader):
             self.stream.seek(self.stream_start + (chunk_start - self.start_index))
             self.stream.write(chunk_data)
 
+            # the chunk must reach the file before it is marked as complete
+            if self.checkpoint is not None:
+                self.stream.flush()
+
 
 class _SequentialBlobChunkDownloader(_BlobChunkDownloader):
     def __init__(self, *args):
@@ -176,3 +341,19 @@ class _SequentialBlobChunkDownloader(_BlobChunkDownloader):
     def _write_to_stream(self, chunk_data, chunk_start):
         # chunk_start is ignored in the case of sequential download since we cannot seek the destination stream
         self.stream.write(chunk_data)
+
+
+class _PackedRangeChunkDownloader(_ParallelBlobChunkDownloader):
+    def get_range_chunks(self, page_ranges):
+        # note down where each chunk goes in the packed stream, as the chunks complete out of order
+        self.packed_offsets = {}
+        packed_offset = self.stream_start
+        for chunk_start, chunk_end in super(_PackedRangeChunkDownloader, self).get_range_chunks(page_ranges):
+            self.packed_offsets[chunk_start] = packed_offset
+            packed_offset += chunk_end - chunk_start
+            yield chunk_start, chunk_end
+
+    def _write_to_stream(self, chunk_data, chunk_start):
+        with self.stream_lock:
+            self.stream.seek(self.packed_offsets[chunk_start])
+            self.stream.write(chunk_data)
@@ -175,6 +175,86 @@ def _decrypt_blob(require_encryption, key_encryption_key, key_resolver,
     return content[start_offset: len(content) - end_offset]
 
 
+def _get_blob_decryption_key(require_encryption, key_encryption_key, key_resolver, metadata):
+    '''
+    Unwraps the content-encryption-key of a blob from its metadata. Chunked
+    downloads call this once and reuse the key for every chunk rather than
+    unwrapping it again for each ranged get.
+
+    :param bool require_encryption:
+        Whether or not the calling blob service requires objects to be decrypted.
+    :param object key_encryption_key:
+        The user-provided key-encryption-key. See _decrypt_blob for the interface.
+    :param key_resolver(kid):
+        The user-provided key resolver. See _decrypt_blob for the interface.
+    :param dict metadata:
+        The metadata of the blob, as returned by a get blob request.
+    :return: A tuple of the content-encryption-key and the initialization vector
+        of the blob, or (None, None) if the blob is not encrypted.
+    :rtype: (bytes, bytes)
+    '''
+    encryption_data = None
+    for key, value in (metadata or {}).items():
+        if key.lower() == 'encryptiondata':
+            encryption_data = _dict_to_encryption_data(loads(value))
+
+    if encryption_data is None:
+        if require_encryption:
+            raise ValueError(_ERROR_DATA_NOT_ENCRYPTED)
+        return None, None
+
+    if not (encryption_data.encryption_agent.encryption_algorithm == _EncryptionAlgorithm.AES_CBC_256):
+        raise ValueError(_ERROR_UNSUPPORTED_ENCRYPTION_ALGORITHM)
+
+    content_encryption_key = _validate_and_unwrap_cek(encryption_data, key_encryption_key, key_resolver)
+    return content_encryption_key, encryption_data.content_encryption_IV
+
+
+def _decrypt_blob_chunk(content_encryption_key, initialization_vector, blob, start_offset, end_offset):
+    '''
+    Decrypts a single chunk of a parallel download. The chunk must have been
+    requested along 16 byte boundaries, including the preceding cipher block
+    when it does not start at the beginning of the blob, as that block is the
+    IV for the chunk in CBC mode.
+
+    :param bytes content_encryption_key:
+        The unwrapped content-encryption-key, see _get_blob_decryption_key.
+    :param bytes initialization_vector:
+        The IV stored with the blob. Only used for a chunk at the start of the blob.
+    :param ~azure.storage.blob.models.Blob blob:
+        The raw (still encrypted) ranged get response.
+    :param int start_offset:
+        The number of leading bytes, including the IV block, to drop.
+    :param int end_offset:
+        The number of trailing bytes to drop.
+    :return: A view of the decrypted bytes of the requested range.
+    :rtype: memoryview
+    '''
+    content = memoryview(blob.content)
+
+    if start_offset >= 16:
+        initialization_vector = content[:16].tobytes()
+        content = content[16:]
+        start_offset -= 16
+
+    cipher = _generate_AES_CBC_cipher(content_encryption_key, initialization_vector)
+    decryptor = cipher.decryptor()
+    plaintext = decryptor.update(content)
+    decryptor.finalize()
+    length = len(plaintext)
+
+    # Only the final block carries the padding, so just that block is unpadded
+    # rather than copying the whole chunk through the unpadder.
+    content_range = blob.properties.content_range.split(' ')[1]
+    end_range, blob_size = content_range.split('-')[1].split('/')
+    if int(end_range) == int(blob_size) - 1 and blob.properties.blob_type != 'PageBlob':
+        unpadder = PKCS7(128).unpadder()
+        last_block = unpadder.update(plaintext[-16:]) + unpadder.finalize()
+        length -= 16 - len(last_block)
+
+    return memoryview(plaintext)[start_offset: length - end_offset]
+
+
 def _get_blob_encryptor_and_padder(cek, iv, should_pad):
     encryptor = None
     padder = None
@@ -27,3 +27,21 @@ _ERROR_NO_SINGLE_THREAD_CHUNKING = \
     'To use blob chunk downloader more than 1 thread must be ' + \
     'used since get_blob_to_bytes should be called for single threaded ' + \
     'blob downloads.'
+
+_ERROR_INVALID_PAGE_BLOB_BACKUP = \
+    'The file is not a page blob backup.'
+
+_ERROR_TRUNCATED_PAGE_BLOB_BACKUP = \
+    'The page blob backup is truncated, it holds {0} bytes of page content instead of {1}.'
+
+_ERROR_COPY_SOURCE_MODIFIED = \
+    'The copy source {0} was modified during the copy.'
+
+_ERROR_TOO_MANY_BLOCKS = \
+    'The sources require {0} blocks, more than the {1} blocks a block blob can hold.'
+
+_ERROR_STREAM_TOO_MANY_BLOCKS = \
+    'The stream requires more than the {0} blocks a block blob can hold.'
+
+_ERROR_WRITER_TOO_MANY_BLOCKS = \
+    'The data written requires more than the {0} blocks a blob can hold, use a larger block size.'
@@ -24,6 +24,11 @@ from ._error import (
     _ERROR_INVALID_BLOCK_ID,
 )
 from io import BytesIO
+from collections import OrderedDict
+from json import dumps
+from struct import pack
+
+from ._constants import _PAGE_BLOB_BACKUP_MAGIC
 
 
 def _get_path(container_name=None, blob_name=None):
@@ -45,6 +50,17 @@ def _get_path(container_name=None, blob_name=None):
         return '/'
 
 
+def _is_path_style_host(host):
+    '''
+    Checks whether urls of host name the account in their path rather than in
+    the host, which is the case for the emulator and other hosts given by address.
+    '''
+    if not host:
+        return False
+    # an IPv6 address has colons, an IPv4 address only digits and dots
+    return host == 'localhost' or ':' in host or host.replace('.', '').isdigit()
+
+
 def _validate_and_format_range_headers(request, start_range, end_range, start_range_required=True,
                                        end_range_required=True, check_content_md5=False, align_to_page=False):
     # If end range is provided, start range must be provided
@@ -116,3 +132,24 @@ def _convert_block_list_to_xml(block_id_list):
 
     # return xml value
     return output
+
+
+def _write_page_blob_backup_header(stream, backup):
+    '''
+    Writes the header of a page blob backup file. The header is followed by the
+    content of each of the page ranges of the backup, in order.
+
+    Layout: the magic bytes, the length of the header body as an 8 byte big
+    endian integer and the header body as utf-8 encoded json.
+    '''
+    header = OrderedDict()
+    header['Snapshot'] = backup.snapshot
+    header['PreviousSnapshot'] = backup.previous_snapshot
+    header['BlobSize'] = backup.blob_size
+    header['PageRanges'] = [[page_range.start, page_range.end] for page_range in backup.page_ranges]
+    header['ClearedRanges'] = [[page_range.start, page_range.end] for page_range in backup.cleared_ranges]
+    header = dumps(header).encode('utf-8')
+
+    stream.write(_PAGE_BLOB_BACKUP_MAGIC)
+    stream.write(pack('>Q', len(header)))
+    stream.write(header)
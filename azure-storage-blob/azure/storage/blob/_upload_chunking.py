@@ -3,25 +3,73 @@
 # Licensed under the MIT License. See License.txt in the project root for
 # license information.
 # --------------------------------------------------------------------------
+import binascii
+import errno
+import hashlib
+import json
+import os
+import struct
 from io import (BytesIO, IOBase, SEEK_CUR, SEEK_END, SEEK_SET, UnsupportedOperation)
 from threading import Lock
 
 from math import ceil
 
-from azure.storage.common._common_conversion import _encode_base64
+from azure.storage.common._common_conversion import (
+    _encode_base64,
+    _get_content_md5,
+)
 from azure.storage.common._error import _ERROR_VALUE_SHOULD_BE_SEEKABLE_STREAM
 from azure.storage.common._serialization import (
     url_quote,
     _get_data_bytes_only,
     _len_plus
 )
+from azure.storage.common._scheduler import _ScheduledTransfer
+from azure.storage.common._tuning import (
+    _TunedTransfer,
+    _timed,
+)
 from ._constants import (
-    _LARGE_BLOB_UPLOAD_MAX_READ_BUFFER_SIZE
+    _LARGE_BLOB_UPLOAD_MAX_READ_BUFFER_SIZE,
+    _MAX_BLOCK_COUNT,
+    _MAX_PUT_BLOCK_SIZE,
+    _PAGE_SIZE,
 )
+from ._error import _ERROR_STREAM_TOO_MANY_BLOCKS
 from ._encryption import (
     _get_blob_encryptor_and_padder,
 )
-from .models import BlobBlock
+from .models import (
+    BlobBlock,
+    BlobBlockState,
+)
+
+_EMPTY_PAGE = b'\x00' * _PAGE_SIZE
+
+# runs of non-empty pages closer than this are uploaded in one request with the
+# empty pages between them, as sending the zeros costs less than another request
+_MIN_SKIPPED_PAGE_GAP = 64 * 1024
+
+# the content defined chunker hashes the content by translating each byte through
+# a random but fixed table, so that chunk boundaries are stable across runs, and
+# multiplying the result as a little endian integer by an odd 64 bit constant,
+# which mixes each byte of the product with the 7 bytes before it
+_CDC_TABLE = b''.join(hashlib.md5(struct.pack('>B', i)).digest() for i in range(16))
+_CDC_MULTIPLIER = 0x9E3779B97F4A7C15
+_CDC_WINDOW = 8
+
+if hasattr(int, 'from_bytes'):
+    def _bytes_to_int(data):
+        return int.from_bytes(data, 'little')
+
+    def _int_to_bytes(value, length):
+        return value.to_bytes(length, 'little')
+else:
+    def _bytes_to_int(data):
+        return int(binascii.hexlify(bytes(data[::-1])), 16) if data else 0
+
+    def _int_to_bytes(value, length):
+        return binascii.unhexlify('{0:0{1}x}'.format(value, length * 2))[::-1]
 
 
 def _upload_blob_chunks(blob_service, container_name, blob_name,
@@ -29,7 +77,8 @@ def _upload_blob_chunks(blob_service, container_name, blob_name,
                         progress_callback, validate_content, lease_id, uploader_class,
                         maxsize_condition=None, if_modified_since=None, if_unmodified_since=None, if_match=None,
                         if_none_match=None, timeout=None,
-                        content_encryption_key=None, initialization_vector=None, resource_properties=None):
+                        content_encryption_key=None, initialization_vector=None, resource_properties=None,
+                        committed_block_ids=None, journal=None, tuner=None, min_block_size=None):
     encryptor, padder = _get_blob_encryptor_and_padder(content_encryption_key, initialization_vector,
                                                        uploader_class is not _PageBlobChunkUploader)
 
@@ -50,6 +99,10 @@ def _upload_blob_chunks(blob_service, container_name, blob_name,
     )
 
     uploader.maxsize_condition = maxsize_condition
+    uploader.committed_block_ids = committed_block_ids
+    uploader.journal = journal
+    uploader.tuner = tuner
+    uploader.min_block_size = min_block_size
 
     # Access conditions do not work with parallelism
     if max_connections > 1:
@@ -64,39 +117,14 @@ def _upload_blob_chunks(blob_service, container_name, blob_name,
         progress_callback(0, blob_size)
 
     if max_connections > 1:
-        import concurrent.futures
-        from threading import BoundedSemaphore
-
-        '''
-        Ensures we bound the chunking so we only buffer and submit 'max_connections' amount of work items to the executor.
-        This is necessary as the executor queue will keep accepting submitted work items, which results in buffering all the blocks if
-        the max_connections + 1 ensures the next chunk is already buffered and ready for when the worker thread is available.
-        '''
-        chunk_throttler = BoundedSemaphore(max_connections + 1)
-
-        executor = concurrent.futures.ThreadPoolExecutor(max_connections)
-        futures = []
-        running_futures = []
-
-        # Check for exceptions and fail fast.
-        for chunk in uploader.get_chunk_streams():
-            for f in running_futures:
-                if f.done():
-                    if f.exception():
-                        raise f.exception()
-                    else:
-                        running_futures.remove(f)
-
-            chunk_throttler.acquire()
-            future = executor.submit(uploader.process_chunk, chunk)
-
-            # Calls callback upon completion (even if the callback was added after the Future task is done).
-            future.add_done_callback(lambda x: chunk_throttler.release())
-            futures.append(future)
-            running_futures.append(future)
-
-        # result() will wait until completion and also raise any exceptions that may have been set.
-        range_ids = [f.result() for f in futures]
+        # the chunks are read from the stream as workers become available, so only
+        # the chunks in flight are buffered
+        if tuner is not None:
+            transfer = _TunedTransfer(uploader.process_chunk, uploader.get_chunk_streams(),
+                                      lambda chunk: len(chunk[1]), max_connections, tuner)
+        else:
+            transfer = _ScheduledTransfer(uploader.process_chunk, uploader.get_chunk_streams(), max_connections)
+        range_ids = blob_service._run_transfer(transfer)
     else:
         range_ids = [uploader.process_chunk(result) for result in uploader.get_chunk_streams()]
 
@@ -110,7 +138,8 @@ def _upload_blob_chunks(blob_service, container_name, blob_name,
 def _upload_blob_substream_blocks(blob_service, container_name, blob_name,
                                   blob_size, block_size, stream, max_connections,
                                   progress_callback, validate_content, lease_id, uploader_class,
-                                  maxsize_condition=None, if_match=None, timeout=None):
+                                  maxsize_condition=None, if_match=None, timeout=None, tuner=None,
+                                  min_block_size=None):
     uploader = uploader_class(
         blob_service,
         container_name,
@@ -128,6 +157,8 @@ def _upload_blob_substream_blocks(blob_service, container_name, blob_name,
     )
 
     uploader.maxsize_condition = maxsize_condition
+    uploader.tuner = tuner
+    uploader.min_block_size = min_block_size
 
     # ETag matching does not work with parallelism as a ranged upload may start
     # before the previous finishes and provides an etag
@@ -137,15 +168,97 @@ def _upload_blob_substream_blocks(blob_service, container_name, blob_name,
         progress_callback(0, blob_size)
 
     if max_connections > 1:
-        import concurrent.futures
-        executor = concurrent.futures.ThreadPoolExecutor(max_connections)
-        range_ids = list(executor.map(uploader.process_substream_block, uploader.get_substream_blocks()))
+        if tuner is not None:
+            transfer = _TunedTransfer(uploader.process_substream_block, uploader.get_substream_blocks(),
+                                      lambda block: len(block[1]), max_connections, tuner)
+        else:
+            transfer = _ScheduledTransfer(uploader.process_substream_block, uploader.get_substream_blocks(),
+                                          max_connections)
+        range_ids = blob_service._run_transfer(transfer)
     else:
         range_ids = [uploader.process_substream_block(result) for result in uploader.get_substream_blocks()]
 
     return range_ids
 
 
+def _copy_blob_ranges(blob_service, container_name, blob_name, source_ranges, max_connections,
+                      progress_callback, lease_id, timeout):
+    '''
+    Puts a block from each (copy_source_url, start, end) source range, end being
+    exclusive, with put_block_from_url so that the data is copied by the service
+    without going through the client. The blocks are named after their offset in
+    the destination blob and returned in order.
+    '''
+    copier = _BlockBlobRangeCopier(
+        blob_service,
+        container_name,
+        blob_name,
+        sum(end - start for _, start, end in source_ranges),
+        max_connections > 1,
+        progress_callback,
+        lease_id,
+        timeout
+    )
+
+    if progress_callback is not None:
+        progress_callback(0, copier.blob_size)
+
+    if max_connections > 1:
+        return blob_service._run_transfer(
+            _ScheduledTransfer(copier.process_range, copier.get_block_ranges(source_ranges), max_connections))
+    else:
+        return [copier.process_range(block_range) for block_range in copier.get_block_ranges(source_ranges)]
+
+
+class _BlockBlobRangeCopier(object):
+    def __init__(self, blob_service, container_name, blob_name, blob_size, parallel,
+                 progress_callback, lease_id, timeout):
+        self.blob_service = blob_service
+        self.container_name = container_name
+        self.blob_name = blob_name
+        self.blob_size = blob_size
+        self.progress_callback = progress_callback
+        self.progress_total = 0
+        self.progress_lock = Lock() if parallel else None
+        self.lease_id = lease_id
+        self.timeout = timeout
+
+    def get_block_ranges(self, source_ranges):
+        offset = 0
+        for copy_source_url, start, end in source_ranges:
+            yield offset, copy_source_url, start, end
+            offset += end - start
+
+    def process_range(self, block_range):
+        offset, copy_source_url, start, end = block_range
+        block_id = _get_block_id(offset)
+
+        # failures are retried by the retry policy of the service for this range only
+        self.blob_service.put_block_from_url(
+            self.container_name,
+            self.blob_name,
+            copy_source_url,
+            start,
+            end - 1,
+            block_id,
+            lease_id=self.lease_id,
+            timeout=self.timeout,
+        )
+        self._update_progress(end - start)
+        return BlobBlock(block_id)
+
+    def _update_progress(self, length):
+        if self.progress_callback is not None:
+            if self.progress_lock is not None:
+                with self.progress_lock:
+                    self.progress_total += length
+                    total = self.progress_total
+            else:
+                self.progress_total += length
+                total = self.progress_total
+            self.progress_callback(total, self.blob_size)
+
+
 class _BlobChunkUploader(object):
     def __init__(self, blob_service, container_name, blob_name, blob_size,
                  chunk_size, stream, parallel, progress_callback,
@@ -170,26 +283,36 @@ class _BlobChunkUploader(object):
         self.last_modified = None
         self.etag = None
 
+        # sizes the chunks from the measured requests, only set for tuned uploads
+        self.tuner = None
+        self.min_block_size = None
+
+    def _get_next_chunk_size(self):
+        if self.tuner is None:
+            return self.chunk_size
+        return self.tuner.get_chunk_size(self.chunk_size, self.min_block_size)
+
     def get_chunk_streams(self):
         index = 0
         while True:
             data = b''
-            read_size = self.chunk_size
+            chunk_size = self._get_next_chunk_size()
+            read_size = chunk_size
 
             # Buffer until we either reach the end of the stream or get a whole chunk.
             while True:
                 if self.blob_size:
-                    read_size = min(self.chunk_size - len(data), self.blob_size - (index + len(data)))
+                    read_size = min(chunk_size - len(data), self.blob_size - (index + len(data)))
                 temp = self.stream.read(read_size)
                 temp = _get_data_bytes_only('temp', temp)
                 data += temp
 
                 # We have read an empty string and so are at the end
                 # of the buffer or we have read a full chunk.
-                if temp == b'' or len(data) == self.chunk_size:
+                if temp == b'' or len(data) == chunk_size:
                     break
 
-            if len(data) == self.chunk_size:
+            if len(data) == chunk_size:
                 if self.padder:
                     data = self.padder.update(data)
                 if self.encryptor:
@@ -222,7 +345,7 @@ class _BlobChunkUploader(object):
             self.progress_callback(total, self.blob_size)
 
     def _upload_chunk_with_progress(self, chunk_offset, chunk_data):
-        range_id = self._upload_chunk(chunk_offset, chunk_data)
+        range_id = _timed(self.tuner, len(chunk_data), lambda: self._upload_chunk(chunk_offset, chunk_data))
         self._update_progress(len(chunk_data))
         return range_id
 
@@ -236,6 +359,15 @@ class _BlobChunkUploader(object):
             if blob_length is None:
                 raise ValueError(_ERROR_VALUE_SHOULD_BE_SEEKABLE_STREAM.format('stream'))
 
+        if self.tuner is not None:
+            # each block is sized when it is about to be uploaded, from the blocks before it
+            i, block_start = 0, 0
+            while block_start < blob_length:
+                block_length = min(self._get_next_chunk_size(), blob_length - block_start)
+                yield ('BlockId{}'.format("%05d" % i), _SubStream(self.stream, block_start, block_length, lock))
+                i, block_start = i + 1, block_start + block_length
+            return
+
         blocks = int(ceil(blob_length / (self.chunk_size * 1.0)))
         last_block_size = self.chunk_size if blob_length % self.chunk_size == 0 else blob_length % self.chunk_size
 
@@ -248,8 +380,9 @@ class _BlobChunkUploader(object):
         return self._upload_substream_block_with_progress(block_data[0], block_data[1])
 
     def _upload_substream_block_with_progress(self, block_id, block_stream):
-        range_id = self._upload_substream_block(block_id, block_stream)
-        self._update_progress(len(block_stream))
+        block_length = len(block_stream)
+        range_id = _timed(self.tuner, block_length, lambda: self._upload_substream_block(block_id, block_stream))
+        self._update_progress(block_length)
         return range_id
 
     def set_response_properties(self, resp):
@@ -257,9 +390,13 @@ class _BlobChunkUploader(object):
         self.last_modified = resp.last_modified
 
 
+def _get_block_id(chunk_offset):
+    return url_quote(_encode_base64('{0:032d}'.format(chunk_offset)))
+
+
 class _BlockBlobChunkUploader(_BlobChunkUploader):
     def _upload_chunk(self, chunk_offset, chunk_data):
-        block_id = url_quote(_encode_base64('{0:032d}'.format(chunk_offset)))
+        block_id = _get_block_id(chunk_offset)
         self.blob_service._put_block(
             self.container_name,
             self.blob_name,
@@ -287,25 +424,310 @@ class _BlockBlobChunkUploader(_BlobChunkUploader):
         return BlobBlock(block_id)
 
 
+class _ResumableBlockBlobChunkUploader(_BlockBlobChunkUploader):
+    '''
+    Uploads the blocks of the stream which are not recorded in the journal, and
+    records each block in the journal once it is uploaded.
+    '''
+
+    def get_chunk_streams(self):
+        stream_start = self.stream.tell()
+        for chunk_offset in range(0, self.blob_size, self.chunk_size):
+            chunk_length = min(self.chunk_size, self.blob_size - chunk_offset)
+            content_md5 = self.journal.blocks.get(_get_block_id(chunk_offset))
+
+            # the content of the blocks already uploaded is only read again
+            # to check it against the journal when validating the content
+            if content_md5 is not None and not self.validate_content:
+                self._update_progress(chunk_length)
+                continue
+
+            self.stream.seek(stream_start + chunk_offset)
+            data = _get_data_bytes_only('data', self.stream.read(chunk_length))
+            if content_md5 is not None and content_md5 == _get_content_md5(data):
+                self._update_progress(chunk_length)
+                continue
+
+            yield chunk_offset, data
+
+    def _upload_chunk(self, chunk_offset, chunk_data):
+        block = super(_ResumableBlockBlobChunkUploader, self)._upload_chunk(chunk_offset, chunk_data)
+        self.journal.record(chunk_offset, block.id, _get_content_md5(chunk_data))
+        return block
+
+
+class _BlockBlobUploadJournal(object):
+    '''
+    A local journal of the blocks put by a resumable block blob upload. The first
+    line holds the identity of the upload, which is the destination blob, the source
+    file and the block size, and a line holding the offset, id and MD5 hash of each
+    block is appended once the block is uploaded.
+    '''
+
+    def __init__(self, journal_path, identity):
+        self.journal_path = journal_path
+        self.identity = identity
+        self.blocks = {}
+        self.block_offsets = {}
+        self.lock = Lock()
+        self.stream = None
+
+    def load(self):
+        '''
+        Loads the blocks recorded by a previous attempt of the same upload. The
+        journal is ignored if it belongs to another upload or the source changed.
+        '''
+        try:
+            with open(self.journal_path, 'r') as stream:
+                lines = stream.read().splitlines()
+        except (IOError, OSError):
+            return
+
+        try:
+            if not lines or json.loads(lines[0]) != self.identity:
+                return
+        except ValueError:
+            return
+
+        for line in lines[1:]:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                # the last line may have been partially written
+                break
+            self.blocks[entry['BlockId']] = entry['ContentMD5']
+            self.block_offsets[entry['BlockId']] = entry['Offset']
+
+    def reconcile(self, uncommitted_blocks, blob_size, block_size):
+        '''
+        Only keeps the blocks which are still uncommitted on the service with
+        the expected size, and rewrites the journal with them.
+        '''
+        uncommitted_block_sizes = dict((block.id, block.size) for block in uncommitted_blocks)
+        for block_id, offset in list(self.block_offsets.items()):
+            if uncommitted_block_sizes.get(block_id) != min(block_size, blob_size - offset):
+                del self.blocks[block_id]
+                del self.block_offsets[block_id]
+
+        self.stream = open(self.journal_path, 'w')
+        self.stream.write(json.dumps(self.identity) + '\n')
+        for block_id, offset in sorted(self.block_offsets.items(), key=lambda block: block[1]):
+            self._write_entry(offset, block_id, self.blocks[block_id])
+        self.stream.flush()
+
+    def record(self, offset, block_id, content_md5):
+        with self.lock:
+            self.blocks[block_id] = content_md5
+            self.block_offsets[block_id] = offset
+            self._write_entry(offset, block_id, content_md5)
+            self.stream.flush()
+
+    def _write_entry(self, offset, block_id, content_md5):
+        self.stream.write(json.dumps({'Offset': offset, 'BlockId': block_id, 'ContentMD5': content_md5}) + '\n')
+
+    def close(self):
+        if self.stream is not None:
+            self.stream.close()
+            self.stream = None
+
+    def delete(self):
+        self.close()
+        os.remove(self.journal_path)
+
+
+class _BlockBlobDeltaChunkUploader(_BlockBlobChunkUploader):
+    '''
+    Splits the stream into content defined chunks of chunk_size bytes on average
+    and names the blocks after a hash of their content, so that the blocks which
+    did not change since the last upload keep their id and can be committed again
+    without being uploaded.
+    '''
+
+    def __init__(self, *args):
+        super(_BlockBlobDeltaChunkUploader, self).__init__(*args)
+        self.uploaded_block_ids = set()
+        self.uploaded_block_ids_lock = Lock() if self.parallel else None
+
+    def _set_chunk_sizes(self):
+        # the smallest chunks are large enough for the blob to fit in the block limit,
+        # and the largest ones are no larger than a block can be
+        self.min_chunk_size = max(self.chunk_size // 4, self.min_block_size or 0, 2 * _CDC_WINDOW)
+        self.max_chunk_size = max(min(self.chunk_size * 4, _MAX_PUT_BLOCK_SIZE), self.min_chunk_size)
+
+        # a boundary is found on average every 2^bits bytes past the minimum size,
+        # where the hash has boundary_bytes zero bytes in a row, the last of which
+        # is masked to the bits which are left
+        bits = min(max((self.chunk_size - self.min_chunk_size).bit_length() - 1, 1), 32)
+        self.boundary_bytes = -(-bits // 8)
+        mask = bytearray([(1 << (bits - 8 * (self.boundary_bytes - 1))) - 1])
+        self.boundary_mask = _bytes_to_int(mask * (self.chunk_size + 2 * _CDC_WINDOW + 8))
+
+    def get_chunk_streams(self):
+        self._set_chunk_sizes()
+        index = 0
+        count = 0
+        data = bytearray()
+        while True:
+            # Buffer until we either reach the end of the stream or hold a maximum sized chunk.
+            while len(data) < self.max_chunk_size:
+                read_size = self.max_chunk_size - len(data)
+                if self.blob_size:
+                    read_size = min(read_size, self.blob_size - (index + len(data)))
+                temp = self.stream.read(read_size) if read_size > 0 else b''
+                if not temp:
+                    break
+                data += _get_data_bytes_only('temp', temp)
+
+            if not data:
+                break
+
+            count += 1
+            if count > _MAX_BLOCK_COUNT:
+                raise ValueError(_ERROR_STREAM_TOO_MANY_BLOCKS.format(_MAX_BLOCK_COUNT))
+
+            chunk_length = self._find_chunk_boundary(data)
+            yield index, bytes(data[:chunk_length])
+            del data[:chunk_length]
+            index += chunk_length
+
+    def _find_chunk_boundary(self, data):
+        # the bytes before the minimum chunk size are skipped, which both bounds
+        # the smallest chunk and saves hashing them
+        end = min(len(data), self.max_chunk_size)
+        start = self.min_chunk_size
+        while start < end:
+            # the data is hashed a chunk size at a time, as the boundary is
+            # usually found well before the maximum chunk size
+            segment_end = min(start + self.chunk_size, end)
+            position = self._find_boundary_in_segment(data, start, segment_end)
+            if position is not None:
+                return position + 1
+            start = segment_end
+        return end
+
+    def _find_boundary_in_segment(self, data, start, end):
+        # the hash is computed for all the positions at once with big integer
+        # operations, rather than rolled over the bytes one at a time in Python.
+        # The bytes before start are hashed too, so that the hash of the first
+        # positions depends on the same bytes as for any other position.
+        hash_start = start - 2 * _CDC_WINDOW
+        length = end - hash_start
+        value = _bytes_to_int(data[hash_start:end].translate(_CDC_TABLE)) * _CDC_MULTIPLIER
+
+        # the fingerprint byte of a position is zero only if the boundary_bytes
+        # hash bytes from there on are, the last one masked
+        last_shift = 8 * (self.boundary_bytes - 1)
+        fingerprint = (value & self.boundary_mask) >> last_shift
+        for shift in range(0, last_shift, 8):
+            fingerprint |= value >> shift
+
+        # the boundary is after the last byte of the hash bytes found
+        first = 2 * _CDC_WINDOW - self.boundary_bytes + 1
+        position = _int_to_bytes(fingerprint, length + 8).find(b'\x00', first, length - self.boundary_bytes + 1)
+        return None if position < 0 else hash_start + position + self.boundary_bytes - 1
+
+    def _upload_chunk(self, chunk_offset, chunk_data):
+        # hex digests are 32 characters long like the offsets used as block ids
+        # by _BlockBlobChunkUploader, as all the block ids of a blob must have the same length
+        block_id = url_quote(_encode_base64(hashlib.sha256(chunk_data).hexdigest()[:32]))
+        if self.committed_block_ids and block_id in self.committed_block_ids:
+            return BlobBlock(block_id, BlobBlockState.Committed)
+
+        # a chunk repeated within the stream is only uploaded once
+        if self.uploaded_block_ids_lock is not None:
+            with self.uploaded_block_ids_lock:
+                already_uploaded = block_id in self.uploaded_block_ids
+                self.uploaded_block_ids.add(block_id)
+        else:
+            already_uploaded = block_id in self.uploaded_block_ids
+            self.uploaded_block_ids.add(block_id)
+
+        if not already_uploaded:
+            self.blob_service._put_block(
+                self.container_name,
+                self.blob_name,
+                chunk_data,
+                block_id,
+                validate_content=self.validate_content,
+                lease_id=self.lease_id,
+                timeout=self.timeout,
+            )
+        return BlobBlock(block_id, BlobBlockState.Latest)
+
+
 class _PageBlobChunkUploader(_BlobChunkUploader):
+    def __init__(self, *args):
+        super(_PageBlobChunkUploader, self).__init__(*args)
+        self.empty_chunk = b'\x00' * self.chunk_size
+
+    def get_chunk_streams(self):
+        # the holes of a sparse file are skipped without being read, this is
+        # not possible when encrypting as each chunk depends on the previous one
+        data_extents = None if self.encryptor else _get_data_extents(self.stream, self.blob_size)
+        if data_extents is None:
+            for chunk in super(_PageBlobChunkUploader, self).get_chunk_streams():
+                yield chunk
+            return
+
+        stream_start = self.stream.tell()
+        index = 0
+        for extent_start, extent_end in data_extents:
+            # the holes are reported as progress since they do not need to be uploaded
+            if extent_start > index:
+                self._update_progress(extent_start - index)
+
+            for chunk_start in range(extent_start, extent_end, self.chunk_size):
+                self.stream.seek(stream_start + chunk_start)
+                data = self.stream.read(min(self.chunk_size, extent_end - chunk_start))
+                yield chunk_start, _get_data_bytes_only('data', data)
+            index = extent_end
+
+        if self.blob_size > index:
+            self._update_progress(self.blob_size - index)
+
     def _is_chunk_empty(self, chunk_data):
-        # read until non-zero byte is encountered
-        # if reached the end without returning, then chunk_data is all 0's
-        for each_byte in chunk_data:
-            if each_byte != 0 and each_byte != b'\x00':
-                return False
-        return True
+        # compare against a cached zero buffer, which is a single memcmp
+        # rather than a walk over every byte of the chunk
+        if len(chunk_data) == self.chunk_size:
+            return chunk_data == self.empty_chunk
+        return chunk_data == b'\x00' * len(chunk_data)
+
+    def _get_non_empty_page_ranges(self, chunk_data):
+        # yield (start, end) offsets within the chunk of each run of
+        # consecutive pages that contain any non-zero byte, merging the
+        # runs separated by fewer than _MIN_SKIPPED_PAGE_GAP empty bytes
+        run_start = run_end = None
+        for page_start in range(0, len(chunk_data), _PAGE_SIZE):
+            if chunk_data.startswith(_EMPTY_PAGE, page_start):
+                continue
+            if run_end is not None and page_start - run_end >= _MIN_SKIPPED_PAGE_GAP:
+                yield run_start, run_end
+                run_start = None
+            if run_start is None:
+                run_start = page_start
+            run_end = min(page_start + _PAGE_SIZE, len(chunk_data))
+
+        if run_start is not None:
+            yield run_start, run_end
 
     def _upload_chunk(self, chunk_start, chunk_data):
         # avoid uploading the empty pages
-        if not self._is_chunk_empty(chunk_data):
-            chunk_end = chunk_start + len(chunk_data) - 1
+        if self._is_chunk_empty(chunk_data):
+            return
+
+        for range_start, range_end in self._get_non_empty_page_ranges(chunk_data):
+            # only copy the pages out if part of the chunk is being skipped
+            if range_end - range_start == len(chunk_data):
+                page_data = chunk_data
+            else:
+                page_data = chunk_data[range_start:range_end]
+
             resp = self.blob_service._update_page(
                 self.container_name,
                 self.blob_name,
-                chunk_data,
-                chunk_start,
-                chunk_end,
+                page_data,
+                chunk_start + range_start,
+                chunk_start + range_end - 1,
                 validate_content=self.validate_content,
                 lease_id=self.lease_id,
                 if_match=self.if_match,
@@ -318,6 +740,54 @@ class _PageBlobChunkUploader(_BlobChunkUploader):
             self.set_response_properties(resp)
 
 
+def _get_data_extents(stream, length):
+    '''
+    Finds the allocated extents of the file backing the stream with SEEK_DATA
+    and SEEK_HOLE, so that the holes of a sparse file can be skipped.
+
+    :return: A list of (start, end) offsets, relative to the current position of
+        the stream and aligned to pages, of the extents within the next length bytes,
+        or None if the stream is not a file or the platform does not support it.
+    '''
+    if not hasattr(os, 'SEEK_DATA'):
+        return None
+
+    try:
+        fileno = stream.fileno()
+        stream_start = stream.tell()
+        file_position = os.lseek(fileno, 0, SEEK_CUR)
+    except (AttributeError, IOError, OSError, UnsupportedOperation):
+        return None
+
+    extents = []
+    stream_end = stream_start + length
+    try:
+        position = stream_start
+        while position < stream_end:
+            data_start = os.lseek(fileno, position, os.SEEK_DATA)
+            if data_start >= stream_end:
+                break
+            position = min(os.lseek(fileno, data_start, os.SEEK_HOLE), stream_end)
+
+            # extend the extent to whole pages and merge it with the previous
+            # one if they now overlap
+            extent_start = (data_start - stream_start) // _PAGE_SIZE * _PAGE_SIZE
+            extent_end = min(-(-(position - stream_start) // _PAGE_SIZE) * _PAGE_SIZE, length)
+            if extents and extents[-1][1] >= extent_start:
+                extents[-1] = (extents[-1][0], extent_end)
+            else:
+                extents.append((extent_start, extent_end))
+    except OSError as ex:
+        # ENXIO means there is no data past the position, anything else
+        # means the file system cannot report the extents
+        if ex.errno != errno.ENXIO:
+            return None
+    finally:
+        os.lseek(fileno, file_position, SEEK_SET)
+
+    return extents
+
+
 class _AppendBlobChunkUploader(_BlobChunkUploader):
     def _upload_chunk(self, chunk_offset, chunk_data):
         if not hasattr(self, 'current_length'):
@@ -27,6 +27,20 @@ from azure.storage.common._serialization import (
     _get_data_bytes_only,
     _add_metadata_headers,
 )
+from ._blob_io import (
+    AppendBlobLogWriter,
+    BlobWriter,
+    ShardedLogWriter,
+    _AppendBlobLogTarget,
+    _AppendBlobWriteTarget,
+    _get_shard_name,
+    _read_sharded_log,
+    _tail_append_blob,
+    _tail_log,
+)
+from ._constants import (
+    _MAX_BLOCK_COUNT,
+)
 from ._deserialization import (
     _parse_append_block,
     _parse_base_properties,
@@ -659,3 +673,275 @@ class AppendBlobService(BaseBlobService):
         )
 
         return resource_properties
+
+    def open_blob_for_write(
+            self, container_name, blob_name, validate_content=False, maxsize_condition=None,
+            max_connections=2, lease_id=None, timeout=None):
+        '''
+        Opens an existing append blob for appending as a file object, to append
+        data produced as it is written without buffering it locally. The data is
+        appended in blocks of self.MAX_BLOCK_SIZE, in order, in the background
+        while the next block is written. Flushing the writer appends the data
+        written so far. See :class:`~azure.storage.blob.BlobWriter` for more details.
+
+        After the first block, each block is appended only at the offset following
+        the previous one, so the writer fails if the blob is appended to by
+        someone else at the same time.
+
+        :param str container_name:
+            Name of existing container.
+        :param str blob_name:
+            Name of existing append blob.
+        :param bool validate_content:
+            If true, calculates an MD5 hash for each block of the blob. The storage
+            service checks the hash of the content that has arrived with the hash
+            that was sent. This is primarily valuable for detecting bitflips on
+            the wire if using http instead of https as https (the default) will
+            already validate. Note that this MD5 hash is not stored with the
+            blob.
+        :param int maxsize_condition:
+            Conditional header. The max length in bytes permitted for
+            the append blob. If the Append Block operation would cause the blob
+            to exceed that limit or if the blob size is already greater than the
+            value specified in this header, the request will fail with
+            MaxBlobSizeConditionNotMet error (HTTP status code 412 - Precondition Failed).
+        :param int max_connections:
+            Maximum number of blocks waiting to be appended. The blocks are
+            appended one at a time, and at most max_connections + 1 blocks are
+            held in memory.
+        :param str lease_id:
+            Required if the blob has an active lease.
+        :param int timeout:
+            The timeout parameter is expressed in seconds. This method may make
+            multiple calls to the Azure service and the timeout will apply to
+            each call individually.
+        :return: A file object appending to the blob.
+        :rtype: :class:`~azure.storage.blob.BlobWriter`
+        '''
+        _validate_not_none('container_name', container_name)
+        _validate_not_none('blob_name', blob_name)
+        _validate_encryption_unsupported(self.require_encryption, self.key_encryption_key)
+
+        target = _AppendBlobWriteTarget(self, container_name, blob_name, validate_content, maxsize_condition,
+                                        lease_id, timeout)
+        return BlobWriter(target, self.MAX_BLOCK_SIZE, max_connections)
+
+    def open_log_writer(
+            self, container_name, log_name, content_settings=None, metadata=None,
+            flush_interval=1, max_segment_blocks=_MAX_BLOCK_COUNT, max_connections=2,
+            validate_content=False, timeout=None):
+        '''
+        Opens a log for writing as a file object, to ship a log written in small
+        batches to a series of append blobs with few, full size append_block calls.
+        The log is written to segment blobs named after log_name, with a 6 digit
+        segment number appended, and rolls over to a new segment before an append
+        blob reaches its block limit. The writer continues the last segment of
+        the log, if any. See :class:`~azure.storage.blob.AppendBlobLogWriter` for
+        more details.
+
+        :param str container_name:
+            Name of existing container.
+        :param str log_name:
+            The name of the log, which the names of its segments start with.
+        :param ~azure.storage.blob.models.ContentSettings content_settings:
+            ContentSettings object used to set the properties of new segments.
+        :param metadata:
+            Name-value pairs associated with new segments as metadata.
+        :type metadata: dict(str, str)
+        :param float flush_interval:
+            The maximum time, in seconds, the data written waits to be appended
+            while a block is not full.
+        :param int max_segment_blocks:
+            The number of blocks of a segment after which the log rolls over to a
+            new segment. The service supports at most 50,000 blocks per append blob.
+        :param int max_connections:
+            Maximum number of blocks waiting to be appended. The blocks are
+            appended one at a time, and at most max_connections + 1 blocks are
+            held in memory.
+        :param bool validate_content:
+            If true, calculates an MD5 hash for each block of the blob. The storage
+            service checks the hash of the content that has arrived with the hash
+            that was sent. This is primarily valuable for detecting bitflips on
+            the wire if using http instead of https as https (the default) will
+            already validate. Note that this MD5 hash is not stored with the
+            blob.
+        :param int timeout:
+            The timeout parameter is expressed in seconds. This method may make
+            multiple calls to the Azure service and the timeout will apply to
+            each call individually.
+        :return: A file object appending to the log.
+        :rtype: :class:`~azure.storage.blob.AppendBlobLogWriter`
+        '''
+        _validate_not_none('container_name', container_name)
+        _validate_not_none('log_name', log_name)
+        _validate_encryption_unsupported(self.require_encryption, self.key_encryption_key)
+
+        target = _AppendBlobLogTarget(self, container_name, log_name, content_settings, metadata,
+                                      max_segment_blocks, validate_content, timeout)
+        target.open()
+        return AppendBlobLogWriter(target, self.MAX_BLOCK_SIZE, max_connections, flush_interval)
+
+    def open_sharded_log_writer(
+            self, container_name, log_name, shard_count, content_settings=None, metadata=None,
+            flush_interval=1, max_segment_blocks=_MAX_BLOCK_COUNT, max_connections=2,
+            validate_content=False, timeout=None):
+        '''
+        Opens a log sharded over several logs of append blobs for writing, to
+        write records to the shards in parallel, as a single append blob is
+        appended to one block at a time. Each record is written with a sequence
+        number so that read_sharded_log reads the shards back in the order the
+        records were written in. A log must have a single writer at a time. See
+        :class:`~azure.storage.blob.ShardedLogWriter` for more details.
+
+        :param str container_name:
+            Name of existing container.
+        :param str log_name:
+            The name of the log, which the names of its shards start with.
+        :param int shard_count:
+            The number of shards to write the records to.
+        :param ~azure.storage.blob.models.ContentSettings content_settings:
+            ContentSettings object used to set the properties of new segments.
+        :param metadata:
+            Name-value pairs associated with new segments as metadata.
+        :type metadata: dict(str, str)
+        :param float flush_interval:
+            The maximum time, in seconds, the records written to a shard wait to
+            be appended while its block is not full.
+        :param int max_segment_blocks:
+            The number of blocks of a segment after which a shard rolls over to a
+            new segment. The service supports at most 50,000 blocks per append blob.
+        :param int max_connections:
+            Maximum number of blocks of each shard waiting to be appended.
+        :param bool validate_content:
+            If true, calculates an MD5 hash for each block of the blob. The storage
+            service checks the hash of the content that has arrived with the hash
+            that was sent. This is primarily valuable for detecting bitflips on
+            the wire if using http instead of https as https (the default) will
+            already validate. Note that this MD5 hash is not stored with the
+            blob.
+        :param int timeout:
+            The timeout parameter is expressed in seconds. This method may make
+            multiple calls to the Azure service and the timeout will apply to
+            each call individually.
+        :return: A writer of the records of the log.
+        :rtype: :class:`~azure.storage.blob.ShardedLogWriter`
+        '''
+        _validate_not_none('container_name', container_name)
+        _validate_not_none('log_name', log_name)
+        _validate_not_none('shard_count', shard_count)
+
+        shards = []
+        try:
+            for shard in range(shard_count):
+                shards.append(self.open_log_writer(
+                    container_name, _get_shard_name(log_name, shard), content_settings, metadata, flush_interval,
+                    max_segment_blocks, max_connections, validate_content, timeout))
+        except:
+            for writer in shards:
+                writer.close()
+            raise
+        return ShardedLogWriter(shards)
+
+    def read_sharded_log(self, container_name, log_name, timeout=None):
+        '''
+        Reads the records of a log written by a ShardedLogWriter, merging its
+        shards back into the order the records were written in. The segments of
+        each shard are read one after the other with open_blob. The segments
+        listed when the read starts are read, up to the size they had then. A
+        record still being written at the end of a shard, or left incomplete by a
+        writer which stopped, is skipped.
+
+        :param str container_name:
+            Name of existing container.
+        :param str log_name:
+            The name of the log.
+        :param int timeout:
+            The timeout parameter is expressed in seconds. This method may make
+            multiple calls to the Azure service and the timeout will apply to
+            each call individually.
+        :return: A generator of the records of the log, by sequence number.
+        :rtype: Iterator[:class:`~azure.storage.blob.models.LogRecord`]
+        '''
+        _validate_not_none('container_name', container_name)
+        _validate_not_none('log_name', log_name)
+
+        return _read_sharded_log(self, container_name, log_name, timeout)
+
+    def tail_append_blob(self, container_name, blob_name, start_offset=0, min_poll_interval=0.5,
+                         max_poll_interval=30, idle_timeout=None, timeout=None):
+        '''
+        Follows an append blob, returning a generator of the data appended to it
+        from start_offset on, as it is appended. Only the data past the offset
+        read so far is downloaded. The blob is polled with ranged gets made only
+        if its etag changed, so that a poll finding no new data costs a request
+        with no content, and the time between polls doubles from
+        min_poll_interval up to max_poll_interval while the blob stays idle.
+
+        If the blob does not exist yet, it is polled until it is created. If the
+        blob is deleted and created again, it is followed from its start.
+
+        :param str container_name:
+            Name of existing container.
+        :param str blob_name:
+            Name of the blob to follow.
+        :param int start_offset:
+            The offset of the blob to start reading from.
+        :param float min_poll_interval:
+            The time, in seconds, before polling the blob again once no new data
+            was found.
+        :param float max_poll_interval:
+            The maximum time, in seconds, between polls of an idle blob.
+        :param float idle_timeout:
+            If set, the generator ends once no data was appended to the blob for
+            this time, in seconds. Otherwise it follows the blob until it is closed.
+        :param int timeout:
+            The timeout parameter is expressed in seconds. This method may make
+            multiple calls to the Azure service and the timeout will apply to
+            each call individually.
+        :return: A generator of the data appended to the blob.
+        :rtype: Iterator[bytes]
+        '''
+        _validate_not_none('container_name', container_name)
+        _validate_not_none('blob_name', blob_name)
+        _validate_encryption_unsupported(self.require_encryption, self.key_encryption_key)
+
+        if start_offset < 0:
+            raise ValueError(_ERROR_VALUE_NEGATIVE.format('start_offset'))
+
+        return _tail_append_blob(self, container_name, blob_name, start_offset, min_poll_interval,
+                                 max_poll_interval, idle_timeout, timeout)
+
+    def tail_log(self, container_name, log_name, min_poll_interval=0.5, max_poll_interval=30,
+                 idle_timeout=None, timeout=None):
+        '''
+        Follows a log written by an AppendBlobLogWriter, returning a generator
+        of the data of its segments from the first one on, as it is appended.
+        Each segment is followed as with tail_append_blob, and once the writer
+        rolled over to the next segment, the rest of the current segment is read
+        before following the next one.
+
+        :param str container_name:
+            Name of existing container.
+        :param str log_name:
+            The name of the log.
+        :param float min_poll_interval:
+            The time, in seconds, before polling the log again once no new data
+            was found.
+        :param float max_poll_interval:
+            The maximum time, in seconds, between polls of an idle log.
+        :param float idle_timeout:
+            If set, the generator ends once no data was appended to the log for
+            this time, in seconds. Otherwise it follows the log until it is closed.
+        :param int timeout:
+            The timeout parameter is expressed in seconds. This method may make
+            multiple calls to the Azure service and the timeout will apply to
+            each call individually.
+        :return: A generator of the data appended to the log.
+        :rtype: Iterator[bytes]
+        '''
+        _validate_not_none('container_name', container_name)
+        _validate_not_none('log_name', log_name)
+        _validate_encryption_unsupported(self.require_encryption, self.key_encryption_key)
+
+        return _tail_log(self, container_name, log_name, min_poll_interval, max_poll_interval,
+                         idle_timeout, timeout)
@@ -3,8 +3,10 @@
 # Licensed under the MIT License. See License.txt in the project root for
 # license information.
 # --------------------------------------------------------------------------
+import copy
 import sys
 from abc import ABCMeta
+from os import path
 
 from azure.common import AzureHttpError
 
@@ -18,7 +20,9 @@ from azure.storage.common._common_conversion import (
     _to_str,
     _datetime_to_utc_string,
 )
+from azure.storage.common._checkpoint import _DownloadCheckpoint
 from azure.storage.common._connection import _ServiceParameters
+from azure.storage.common._copy import _CopyScheduler
 from azure.storage.common._constants import (
     SERVICE_HOST_BASE,
     DEFAULT_PROTOCOL,
@@ -35,10 +39,22 @@ from azure.storage.common._error import (
     _dont_fail_on_exist,
     _validate_not_none,
     _validate_decryption_required,
+    _validate_encryption_unsupported,
     _validate_access_policies,
     _ERROR_PARALLEL_NOT_SEEKABLE,
 )
 from azure.storage.common._http import HTTPRequest
+from azure.storage.common._transfer import (
+    _get_local_path,
+    _get_transfer_pool,
+    _is_local_file_unchanged,
+    _make_parent_directories,
+    _prefetch,
+    _set_local_file_time,
+    _transfer_files,
+)
+from azure.storage.common._scheduler import _TransferScheduler
+from azure.storage.common._tuning import _TransferTuner
 from azure.storage.common._serialization import (
     _get_request_body,
     _convert_signed_identifiers_to_xml,
@@ -65,7 +81,9 @@ from ._deserialization import (
     _parse_base_properties,
     _parse_account_information,
 )
+from ._blob_io import BlobReader
 from ._download_chunking import _download_blob_chunks
+from ._encryption import _get_blob_decryption_key
 from ._error import (
     _ERROR_INVALID_LEASE_DURATION,
     _ERROR_INVALID_LEASE_BREAK_PERIOD,
@@ -75,7 +93,9 @@ from ._serialization import (
     _validate_and_format_range_headers,
 )
 from .models import (
+    Blob,
     BlobProperties,
+    Include,
     _LeaseActions,
     ContainerPermissions,
     BlobPermissions,
@@ -117,6 +137,26 @@ class BaseBlobService(StorageClient):
         this. If this is set to larger than 4MB, content_validation will throw an
         error if enabled. However, if content_validation is not desired a size
         greater than 4MB may be optimal. Setting this below 4MB is not recommended.
+    :ivar int MAX_PROBE_GET_SIZE:
+        If set, the size of the initial get performed by get_blob_to_* methods if
+        max_connections is greater than 1 and no blob_hint with the size of the
+        blob is given, instead of MAX_SINGLE_GET_SIZE. A small probe gets the size
+        of the blob sooner, so the rest of a large blob starts downloading in
+        parallel sooner, at the cost of an extra request for blobs smaller than
+        MAX_SINGLE_GET_SIZE.
+    :ivar bool AUTO_TUNE_TRANSFERS:
+        If true, the chunked transfers of get_blob_to_* and create_blob_from_*
+        methods size each chunk from the throughput and latency measured on the
+        previous chunk requests of this service, instead of MAX_CHUNK_GET_SIZE and
+        MAX_BLOCK_SIZE, and adjust the number of connections during the transfer,
+        starting from max_connections. Checkpointed and resumable transfers keep
+        fixed chunk sizes.
+    :ivar int MAX_TRANSFER_CONNECTIONS:
+        The maximum number of chunk requests in flight over all the parallel
+        chunked transfers of this service object. The chunks are run on a pool of
+        threads shared by the transfers, which take turns on the threads, and each
+        transfer still has at most max_connections chunk requests in flight. If a
+        request_scheduler is set, its pool and limit are used instead.
     :ivar object key_encryption_key:
         The key-encryption-key optionally provided by the user. If provided, will be used to
         encrypt/decrypt in supported methods.
@@ -143,6 +183,9 @@ class BaseBlobService(StorageClient):
     __metaclass__ = ABCMeta
     MAX_SINGLE_GET_SIZE = 32 * 1024 * 1024
     MAX_CHUNK_GET_SIZE = 4 * 1024 * 1024
+    MAX_PROBE_GET_SIZE = None
+    AUTO_TUNE_TRANSFERS = False
+    MAX_TRANSFER_CONNECTIONS = 64
 
     def __init__(self, account_name=None, account_key=None, sas_token=None, is_emulated=False,
                  protocol=DEFAULT_PROTOCOL, endpoint_suffix=SERVICE_HOST_BASE, custom_domain=None, request_session=None,
@@ -222,6 +265,8 @@ class BaseBlobService(StorageClient):
         self.require_encryption = False
         self.key_encryption_key = None
         self.key_resolver_function = None
+        self._transfer_tuner = _TransferTuner()
+        self._transfer_scheduler = _TransferScheduler()
         self._X_MS_VERSION = X_MS_VERSION
         self._update_user_agent_string(package_version)
 
@@ -1636,7 +1681,7 @@ class BaseBlobService(StorageClient):
             self, container_name, blob_name, snapshot=None, start_range=None,
             end_range=None, validate_content=False, lease_id=None, if_modified_since=None,
             if_unmodified_since=None, if_match=None, if_none_match=None, timeout=None,
-            _context=None):
+            _context=None, _decrypt=True):
         '''
         Downloads a blob's content, metadata, and properties. You can also
         call this API to read a snapshot. You can specify a range if you don't
@@ -1701,8 +1746,13 @@ class BaseBlobService(StorageClient):
                                       self.key_encryption_key,
                                       self.key_resolver_function)
 
+        # Chunked downloads request the encrypted range themselves and decrypt
+        # it with a key unwrapped once for the whole download.
+        key_encryption_key = self.key_encryption_key if _decrypt else None
+        key_resolver_function = self.key_resolver_function if _decrypt else None
+
         start_offset, end_offset = 0, 0
-        if self.key_encryption_key is not None or self.key_resolver_function is not None:
+        if key_encryption_key is not None or key_resolver_function is not None:
             if start_range is not None:
                 # Align the start of the range along a 16 byte block
                 start_offset = start_range % 16
@@ -1745,7 +1795,7 @@ class BaseBlobService(StorageClient):
 
         return self._perform_request(request, _parse_blob,
                                      [blob_name, snapshot, validate_content, self.require_encryption,
-                                      self.key_encryption_key, self.key_resolver_function,
+                                      key_encryption_key, key_resolver_function,
                                       start_offset, end_offset],
                                      operation_context=_context)
 
@@ -1755,7 +1805,7 @@ class BaseBlobService(StorageClient):
             validate_content=False, progress_callback=None,
             max_connections=2, lease_id=None, if_modified_since=None,
             if_unmodified_since=None, if_match=None, if_none_match=None,
-            timeout=None):
+            timeout=None, checkpoint_path=None, blob_hint=None):
         '''
         Downloads a blob to a file path, with automatic chunking and progress
         notifications. Returns an instance of :class:`~azure.storage.blob.models.Blob` with
@@ -1839,6 +1889,23 @@ class BaseBlobService(StorageClient):
             The timeout parameter is expressed in seconds. This method may make 
             multiple calls to the Azure service and the timeout will apply to 
             each call individually.
+        :param str checkpoint_path:
+            If specified, the download is resumable. The blob is downloaded in chunks
+            of self.MAX_CHUNK_GET_SIZE, which are written at their offset of the file,
+            and the completed chunks are recorded with the etag of the blob in a
+            checkpoint at this path. If the download fails, calling this method again
+            with the same checkpoint path only downloads the missing chunks, provided
+            the blob did not change in between, in which case the download restarts
+            from the beginning. The chunks are only downloaded if the blob still
+            matches the recorded etag, and the checkpoint is deleted once the download
+            completes. open_mode is ignored when a checkpoint is used.
+        :param ~azure.storage.blob.models.Blob blob_hint:
+            The blob as returned by get_blob_properties or listed by list_blobs, if
+            already known. If max_connections is greater than 1 and the hint has a
+            content length and an etag, all the chunks are downloaded in parallel
+            right away instead of after a first get, and only if the blob still
+            matches the etag of the hint. The properties and metadata returned are
+            then those of the hint. The hint is not used with client side encryption.
         :return: A Blob with properties and metadata. If max_connections is greater 
             than 1, the content_md5 (if set on the blob) will not be returned. If you 
             require this value, either use get_blob_properties or set max_connections 
@@ -1850,6 +1917,25 @@ class BaseBlobService(StorageClient):
         _validate_not_none('file_path', file_path)
         _validate_not_none('open_mode', open_mode)
 
+        if checkpoint_path is not None:
+            return self._get_blob_to_path_checkpointed(
+                container_name,
+                blob_name,
+                file_path,
+                checkpoint_path,
+                snapshot,
+                start_range,
+                end_range,
+                validate_content,
+                progress_callback,
+                max_connections,
+                lease_id,
+                if_modified_since,
+                if_unmodified_since,
+                if_match,
+                if_none_match,
+                timeout)
+
         if max_connections > 1 and 'a' in open_mode:
             raise ValueError(_ERROR_PARALLEL_NOT_SEEKABLE)
 
@@ -1869,7 +1955,105 @@ class BaseBlobService(StorageClient):
                 if_unmodified_since,
                 if_match,
                 if_none_match,
-                timeout)
+                timeout,
+                blob_hint=blob_hint)
+
+        return blob
+
+    def _get_blob_to_path_checkpointed(
+            self, container_name, blob_name, file_path, checkpoint_path, snapshot=None,
+            start_range=None, end_range=None, validate_content=False,
+            progress_callback=None, max_connections=2, lease_id=None,
+            if_modified_since=None, if_unmodified_since=None, if_match=None,
+            if_none_match=None, timeout=None):
+        '''
+        See get_blob_to_path for more details. Downloads the chunks of the blob
+        which are not recorded as complete in the checkpoint.
+        '''
+        if end_range is not None:
+            _validate_not_none("start_range", start_range)
+
+        blob = self.get_blob_properties(
+            container_name,
+            blob_name,
+            snapshot=snapshot,
+            lease_id=lease_id,
+            if_modified_since=if_modified_since,
+            if_unmodified_since=if_unmodified_since,
+            if_match=if_match,
+            if_none_match=if_none_match,
+            timeout=timeout)
+
+        blob_size = blob.properties.content_length
+        download_start = start_range if start_range is not None else 0
+        download_end = blob_size if end_range is None else min(blob_size, end_range + 1)
+        download_size = max(download_end - download_start, 0)
+
+        # Unwrap the content encryption key once so that the chunks can be
+        # decrypted in the download threads without unwrapping it per chunk
+        content_encryption_key, initialization_vector = None, None
+        if self.key_encryption_key is not None or self.key_resolver_function is not None:
+            content_encryption_key, initialization_vector = _get_blob_decryption_key(
+                self.require_encryption,
+                self.key_encryption_key,
+                self.key_resolver_function,
+                blob.metadata)
+
+        checkpoint = _DownloadCheckpoint(checkpoint_path, {
+            'Container': container_name,
+            'Blob': blob_name,
+            'Snapshot': snapshot,
+            'StartRange': start_range,
+            'EndRange': end_range,
+            'ChunkSize': self.MAX_CHUNK_GET_SIZE,
+            'ETag': blob.properties.etag,
+            'Size': blob_size,
+        }, -(-download_size // self.MAX_CHUNK_GET_SIZE))
+
+        # the chunks already written can only be kept if the file is still there
+        resumed = checkpoint.open(resume=path.isfile(file_path))
+        try:
+            with open(file_path, 'r+b' if resumed else 'wb') as stream:
+                if progress_callback:
+                    progress_callback(0, download_size)
+
+                # Send a context object to make sure we always retry to the initial location
+                operation_context = _OperationContext(location_lock=True)
+                _download_blob_chunks(
+                    self,
+                    container_name,
+                    blob_name,
+                    snapshot,
+                    download_size,
+                    self.MAX_CHUNK_GET_SIZE,
+                    0,
+                    download_start,
+                    download_end,
+                    stream,
+                    max_connections,
+                    progress_callback,
+                    validate_content,
+                    lease_id,
+                    None,
+                    None,
+                    blob.properties.etag,
+                    None,
+                    timeout,
+                    operation_context,
+                    content_encryption_key,
+                    initialization_vector,
+                    checkpoint,
+                )
+        finally:
+            checkpoint.close()
+
+        checkpoint.delete()
+
+        # the padding of an encrypted blob was removed from the file, possibly by an earlier attempt
+        blob.properties.content_length = download_size if content_encryption_key is None else \
+            path.getsize(file_path)
+        if start_range is not None:
+            blob.properties.content_range = 'bytes {0}-{1}/{2}'.format(start_range, end_range, blob_size)
 
         return blob
 
@@ -1878,7 +2062,7 @@ class BaseBlobService(StorageClient):
             start_range=None, end_range=None, validate_content=False,
             progress_callback=None, max_connections=2, lease_id=None,
             if_modified_since=None, if_unmodified_since=None, if_match=None,
-            if_none_match=None, timeout=None):
+            if_none_match=None, timeout=None, blob_hint=None):
 
         '''
         Downloads a blob to a stream, with automatic chunking and progress
@@ -1959,6 +2143,13 @@ class BaseBlobService(StorageClient):
             The timeout parameter is expressed in seconds. This method may make 
             multiple calls to the Azure service and the timeout will apply to 
             each call individually.
+        :param ~azure.storage.blob.models.Blob blob_hint:
+            The blob as returned by get_blob_properties or listed by list_blobs, if
+            already known. If max_connections is greater than 1 and the hint has a
+            content length and an etag, all the chunks are downloaded in parallel
+            right away instead of after a first get, and only if the blob still
+            matches the etag of the hint. The properties and metadata returned are
+            then those of the hint. The hint is not used with client side encryption.
         :return: A Blob with properties and metadata. If max_connections is greater 
             than 1, the content_md5 (if set on the blob) will not be returned. If you 
             require this value, either use get_blob_properties or set max_connections 
@@ -1982,10 +2173,22 @@ class BaseBlobService(StorageClient):
                 except (NotImplementedError, AttributeError):
                     raise ValueError(_ERROR_PARALLEL_NOT_SEEKABLE)
 
+            # With the size and etag known, there is no need for a first get
+            if self._can_plan_download(blob_hint, start_range, end_range):
+                return self._get_blob_to_stream_planned(
+                    container_name, blob_name, stream, blob_hint, snapshot, start_range, end_range,
+                    validate_content, progress_callback, max_connections, lease_id, if_modified_since,
+                    if_unmodified_since, if_match, if_none_match, timeout)
+
         # The service only provides transactional MD5s for chunks under 4MB.
         # If validate_content is on, get only self.MAX_CHUNK_GET_SIZE for the first
-        # chunk so a transactional MD5 can be retrieved.
-        first_get_size = self.MAX_SINGLE_GET_SIZE if not validate_content else self.MAX_CHUNK_GET_SIZE
+        # chunk so a transactional MD5 can be retrieved. A parallel download may
+        # start with a smaller probe, so that the rest starts in parallel sooner.
+        first_get_size = self.MAX_SINGLE_GET_SIZE
+        if max_connections > 1 and self.MAX_PROBE_GET_SIZE is not None:
+            first_get_size = self.MAX_PROBE_GET_SIZE
+        if validate_content:
+            first_get_size = min(first_get_size, self.MAX_CHUNK_GET_SIZE)
 
         initial_request_start = start_range if start_range is not None else 0
 
@@ -2065,7 +2268,17 @@ class BaseBlobService(StorageClient):
                 # Use the end_range unless it is over the end of the blob
                 end_blob = min(blob_size, end_range + 1)
 
-            _download_blob_chunks(
+            # Unwrap the content encryption key once so that the chunks can be
+            # decrypted in the download threads without unwrapping it per chunk
+            content_encryption_key, initialization_vector = None, None
+            if self.key_encryption_key is not None or self.key_resolver_function is not None:
+                content_encryption_key, initialization_vector = _get_blob_decryption_key(
+                    self.require_encryption,
+                    self.key_encryption_key,
+                    self.key_resolver_function,
+                    blob.metadata)
+
+            padding_length = _download_blob_chunks(
                 self,
                 container_name,
                 blob_name,
@@ -2085,12 +2298,15 @@ class BaseBlobService(StorageClient):
                 if_match,
                 if_none_match,
                 timeout,
-                operation_context
+                operation_context,
+                content_encryption_key,
+                initialization_vector,
+                tuner=self._transfer_tuner if self.AUTO_TUNE_TRANSFERS else None,
             )
 
             # Set the content length to the download size instead of the size of
-            # the last range
-            blob.properties.content_length = download_size
+            # the last range, without the padding of an encrypted blob
+            blob.properties.content_length = download_size - padding_length
 
             # Overwrite the content range to the user requested range
             blob.properties.content_range = 'bytes {0}-{1}/{2}'.format(start_range, end_range, blob_size)
@@ -2102,12 +2318,83 @@ class BaseBlobService(StorageClient):
 
         return blob
 
+    def _can_plan_download(self, blob_hint, start_range, end_range):
+        '''
+        Whether a download can skip the first get, using the size and etag of blob_hint.
+        '''
+        if blob_hint is None or blob_hint.properties.content_length is None or blob_hint.properties.etag is None:
+            return False
+
+        # the metadata needed to decrypt may be missing from a listed blob
+        if self.require_encryption or self.key_encryption_key is not None or self.key_resolver_function is not None:
+            return False
+
+        # an empty range takes a request anyway, which checks the blob exists
+        download_start = start_range if start_range is not None else 0
+        download_end = blob_hint.properties.content_length if end_range is None else \
+            min(blob_hint.properties.content_length, end_range + 1)
+        return download_end > download_start
+
+    def _get_blob_to_stream_planned(
+            self, container_name, blob_name, stream, blob_hint, snapshot, start_range,
+            end_range, validate_content, progress_callback, max_connections, lease_id,
+            if_modified_since, if_unmodified_since, if_match, if_none_match, timeout):
+        '''
+        See get_blob_to_stream for more details. Downloads all the chunks in
+        parallel from the start, planned from the size of blob_hint.
+        '''
+        blob_size = blob_hint.properties.content_length
+        download_start = start_range if start_range is not None else 0
+        download_end = blob_size if end_range is None else min(blob_size, end_range + 1)
+        download_size = download_end - download_start
+
+        if progress_callback:
+            progress_callback(0, download_size)
+
+        # Lock on the etag of the hint, so a blob which changed since the hint fails
+        # rather than be downloaded with a stale size. This can be overriden by the
+        # user by specifying '*'
+        if_match = if_match if if_match is not None else blob_hint.properties.etag
+
+        # Send a context object to make sure we always retry to the initial location
+        operation_context = _OperationContext(location_lock=True)
+        _download_blob_chunks(
+            self,
+            container_name,
+            blob_name,
+            snapshot,
+            download_size,
+            self.MAX_CHUNK_GET_SIZE,
+            0,
+            download_start,
+            download_end,
+            stream,
+            max_connections,
+            progress_callback,
+            validate_content,
+            lease_id,
+            if_modified_since,
+            if_unmodified_since,
+            if_match,
+            if_none_match,
+            timeout,
+            operation_context,
+            tuner=self._transfer_tuner if self.AUTO_TUNE_TRANSFERS else None,
+        )
+
+        properties = copy.copy(blob_hint.properties)
+        properties.content_length = download_size
+        properties.content_md5 = None
+        if start_range is not None:
+            properties.content_range = 'bytes {0}-{1}/{2}'.format(start_range, end_range, blob_size)
+        return Blob(blob_name, snapshot, None, properties, blob_hint.metadata)
+
     def get_blob_to_bytes(
             self, container_name, blob_name, snapshot=None,
             start_range=None, end_range=None, validate_content=False,
             progress_callback=None, max_connections=2, lease_id=None,
             if_modified_since=None, if_unmodified_since=None, if_match=None,
-            if_none_match=None, timeout=None):
+            if_none_match=None, timeout=None, blob_hint=None):
         '''
         Downloads a blob as an array of bytes, with automatic chunking and
         progress notifications. Returns an instance of :class:`~azure.storage.blob.models.Blob` with
@@ -2185,6 +2472,13 @@ class BaseBlobService(StorageClient):
             The timeout parameter is expressed in seconds. This method may make 
             multiple calls to the Azure service and the timeout will apply to 
             each call individually.
+        :param ~azure.storage.blob.models.Blob blob_hint:
+            The blob as returned by get_blob_properties or listed by list_blobs, if
+            already known. If max_connections is greater than 1 and the hint has a
+            content length and an etag, all the chunks are downloaded in parallel
+            right away instead of after a first get, and only if the blob still
+            matches the etag of the hint. The properties and metadata returned are
+            then those of the hint. The hint is not used with client side encryption.
         :return: A Blob with properties and metadata. If max_connections is greater 
             than 1, the content_md5 (if set on the blob) will not be returned. If you 
             require this value, either use get_blob_properties or set max_connections 
@@ -2210,7 +2504,8 @@ class BaseBlobService(StorageClient):
             if_unmodified_since,
             if_match,
             if_none_match,
-            timeout)
+            timeout,
+            blob_hint=blob_hint)
 
         blob.content = stream.getvalue()
         return blob
@@ -2220,7 +2515,7 @@ class BaseBlobService(StorageClient):
             start_range=None, end_range=None, validate_content=False,
             progress_callback=None, max_connections=2, lease_id=None,
             if_modified_since=None, if_unmodified_since=None, if_match=None,
-            if_none_match=None, timeout=None):
+            if_none_match=None, timeout=None, blob_hint=None):
         '''
         Downloads a blob as unicode text, with automatic chunking and progress
         notifications. Returns an instance of :class:`~azure.storage.blob.models.Blob` with
@@ -2300,6 +2595,13 @@ class BaseBlobService(StorageClient):
             The timeout parameter is expressed in seconds. This method may make 
             multiple calls to the Azure service and the timeout will apply to 
             each call individually.
+        :param ~azure.storage.blob.models.Blob blob_hint:
+            The blob as returned by get_blob_properties or listed by list_blobs, if
+            already known. If max_connections is greater than 1 and the hint has a
+            content length and an etag, all the chunks are downloaded in parallel
+            right away instead of after a first get, and only if the blob still
+            matches the etag of the hint. The properties and metadata returned are
+            then those of the hint. The hint is not used with client side encryption.
         :return: A Blob with properties and metadata. If max_connections is greater 
             than 1, the content_md5 (if set on the blob) will not be returned. If you 
             require this value, either use get_blob_properties or set max_connections 
@@ -2323,10 +2625,189 @@ class BaseBlobService(StorageClient):
                                       if_unmodified_since,
                                       if_match,
                                       if_none_match,
-                                      timeout)
+                                      timeout,
+                                      blob_hint=blob_hint)
         blob.content = blob.content.decode(encoding)
         return blob
 
+    def open_blob(
+            self, container_name, blob_name, snapshot=None, block_size=1024 * 1024,
+            max_connections=2, max_cached_blocks=8, lease_id=None, validate_content=False,
+            timeout=None, blob_hint=None):
+        '''
+        Opens a blob for reading as a seekable, read-only file object, for
+        libraries which read files in place, such as zipfile, tarfile or a
+        Parquet reader. Only the blocks of the blob which are read are
+        downloaded, with a ranged get for each block, and sequential reads
+        download the next blocks in the background. See
+        :class:`~azure.storage.blob.BlobReader` for more details.
+
+        The reads fail if the blob is modified after it was opened. Client side
+        encryption is not supported.
+
+        :param str container_name:
+            Name of existing container.
+        :param str blob_name:
+            Name of existing blob.
+        :param str snapshot:
+            The snapshot parameter is an opaque value that,
+            when present, specifies the blob snapshot to read.
+        :param int block_size:
+            The size of the ranged gets, and of the blocks cached.
+        :param int max_connections:
+            The number of blocks downloaded in the background ahead of sequential
+            reads, and in parallel for a read spanning several blocks. If 1,
+            the blocks are only downloaded when they are read.
+        :param int max_cached_blocks:
+            The maximum number of blocks read which are kept in memory.
+        :param str lease_id:
+            Required if the blob has an active lease.
+        :param bool validate_content:
+            If true, validates an MD5 hash of each block downloaded, in which case
+            block_size must be at most 4MB.
+        :param int timeout:
+            The timeout parameter is expressed in seconds. This method may make
+            multiple calls to the Azure service and the timeout will apply to
+            each call individually.
+        :param ~azure.storage.blob.models.Blob blob_hint:
+            The blob as returned by get_blob_properties or listed by list_blobs, if
+            already known, in which case the blob is opened with its size and etag
+            without a get_blob_properties request.
+        :return: A file object reading the blob.
+        :rtype: :class:`~azure.storage.blob.BlobReader`
+        '''
+        _validate_not_none('container_name', container_name)
+        _validate_not_none('blob_name', blob_name)
+        _validate_encryption_unsupported(self.require_encryption, self.key_encryption_key)
+
+        if blob_hint is None or blob_hint.properties.content_length is None or blob_hint.properties.etag is None:
+            blob_hint = self.get_blob_properties(container_name, blob_name, snapshot=snapshot, lease_id=lease_id,
+                                                 timeout=timeout)
+
+        return BlobReader(self, container_name, blob_name, snapshot, blob_hint, block_size, max_connections,
+                          max_cached_blocks, lease_id, validate_content, timeout)
+
+    def download_container(
+            self, container_name, directory_path, skip_unchanged=False,
+            progress_callback=None, max_connections=8, timeout=None):
+        '''
+        Downloads all the blobs of a container to a local directory. See
+        download_prefix for the details.
+
+        :param str container_name:
+            Name of existing container.
+        :param str directory_path:
+            Path of the local directory to download to.
+        :param bool skip_unchanged:
+            If true, the blobs whose local file has the size and modification time
+            of the listed blob are not downloaded again. The size of a blob which is
+            decrypted is compared without its encryption padding.
+        :param progress_callback:
+            Callback with signature function(result), called every time a blob is
+            downloaded, skipped or fails with the DirectoryTransferResult of the
+            download so far.
+        :type progress_callback: func(:class:`~azure.storage.common.models.DirectoryTransferResult`)
+        :param int max_connections:
+            Maximum number of blobs, or chunks of large blobs, downloaded in parallel.
+        :param int timeout:
+            The timeout parameter is expressed in seconds. This method may make
+            multiple calls to the Azure service and the timeout will apply to
+            each call individually.
+        :return: The number of files and bytes downloaded, the throughput and the failures.
+        :rtype: :class:`~azure.storage.common.models.DirectoryTransferResult`
+        '''
+        return self.download_prefix(container_name, None, directory_path, skip_unchanged=skip_unchanged,
+                                    progress_callback=progress_callback, max_connections=max_connections,
+                                    timeout=timeout)
+
+    def download_prefix(
+            self, container_name, prefix, directory_path, skip_unchanged=False,
+            progress_callback=None, max_connections=8, timeout=None):
+        '''
+        Downloads the blobs whose name starts with prefix to a local directory, each
+        blob to the path given by the rest of its name, '/' being the separator.
+
+        The blobs are downloaded by a single pool of max_connections threads while
+        the listing continues in the background, so the download starts with the
+        first page of the listing and never has more than max_connections blob
+        requests in flight. Blobs smaller than MAX_SINGLE_GET_SIZE are downloaded
+        with a single get of the whole blob. Larger blobs are downloaded in chunks
+        of MAX_CHUNK_GET_SIZE bytes by the thread which downloads the blob, helped
+        by the threads of the pool which have no blob left to download. Every get
+        is conditioned on the ETag of the listed blob, and the modification time of
+        each file is set to the last modified time of its blob.
+
+        A blob which fails to download does not stop the download of the others,
+        and is reported in the result. Blob names ending with '/' are considered
+        directory markers and are not downloaded. A blob named exactly prefix is
+        downloaded to the file named after the last segment of its name.
+
+        :param str container_name:
+            Name of existing container.
+        :param str prefix:
+            Filters the blobs to those whose name begins with this prefix, which is
+            removed from their local path.
+        :param str directory_path:
+            Path of the local directory to download to.
+        :param bool skip_unchanged:
+            If true, the blobs whose local file has the size and modification time
+            of the listed blob are not downloaded again. The size of a blob which is
+            decrypted is compared without its encryption padding.
+        :param progress_callback:
+            Callback with signature function(result), called every time a blob is
+            downloaded, skipped or fails with the DirectoryTransferResult of the
+            download so far.
+        :type progress_callback: func(:class:`~azure.storage.common.models.DirectoryTransferResult`)
+        :param int max_connections:
+            Maximum number of blobs, or chunks of large blobs, downloaded in parallel.
+        :param int timeout:
+            The timeout parameter is expressed in seconds. This method may make
+            multiple calls to the Azure service and the timeout will apply to
+            each call individually.
+        :return: The number of files and bytes downloaded, the throughput and the failures.
+        :rtype: :class:`~azure.storage.common.models.DirectoryTransferResult`
+        '''
+        _validate_not_none('container_name', container_name)
+        _validate_not_none('directory_path', directory_path)
+        _validate_decryption_required(self.require_encryption, self.key_encryption_key,
+                                      self.key_resolver_function)
+
+        # the metadata tells which blobs are encrypted, and so padded, when they are decrypted
+        decrypt = self.key_encryption_key is not None or self.key_resolver_function is not None
+        include = Include(metadata=True) if decrypt else None
+
+        def download_blob(blob):
+            properties = blob.properties
+            # a blob named exactly prefix has no relative name, it is named after its last segment
+            relative_name = blob.name[len(prefix or ''):].lstrip('/') or blob.name.rpartition('/')[2]
+            file_path = _get_local_path(directory_path, relative_name)
+            encrypted = decrypt and any(key.lower() == 'encryptiondata' for key in blob.metadata or {})
+            if skip_unchanged and _is_local_file_unchanged(file_path, properties.content_length,
+                                                           properties.last_modified,
+                                                           padding_block_size=16 if encrypted else None):
+                return None
+
+            _make_parent_directories(file_path)
+            if properties.content_length <= self.MAX_SINGLE_GET_SIZE:
+                content = self._get_blob(container_name, blob.name, if_match=properties.etag,
+                                         timeout=timeout).content
+                with open(file_path, 'wb') as stream:
+                    stream.write(content)
+                count = len(content)
+            else:
+                # the chunks are downloaded on the threads of the prefix download, see _run_transfer
+                self.get_blob_to_path(container_name, blob.name, file_path, max_connections=max_connections,
+                                      if_match=properties.etag, timeout=timeout)
+                count = path.getsize(file_path)
+
+            _set_local_file_time(file_path, properties.last_modified)
+            return count
+
+        # keep about a page of the listing ahead of the downloads
+        blobs = _prefetch(self.list_blobs(container_name, prefix=prefix, include=include, timeout=timeout), 5000)
+        tasks = ((blob.name, blob) for blob in blobs if not blob.name.endswith('/'))
+        return _transfer_files(download_blob, tasks, max_connections, progress_callback)
+
     def get_blob_metadata(
             self, container_name, blob_name, snapshot=None, lease_id=None,
             if_modified_since=None, if_unmodified_since=None, if_match=None,
@@ -3179,6 +3660,59 @@ class BaseBlobService(StorageClient):
 
         self._perform_request(request)
 
+    def copy_blobs(self, copies, max_pending_copies=100, max_attempts=3, stall_timeout=None,
+                   max_connections=4, timeout=None):
+        '''
+        Runs many asynchronous copy_blob operations and tracks them until they
+        conclude, yielding a :class:`~azure.storage.common.models.CopyOperation`
+        every time the status or progress of one of the copies changes.
+
+        The copies are only run as the returned generator is iterated. At most
+        max_pending_copies copies are started at once, and all the pending copies
+        are polled from the same loop, at intervals estimated from the progress they
+        report so that copies close to completion are checked sooner. Copies which
+        fail, are aborted, or cannot be started are started again until max_attempts
+        is reached. A copy which cannot be polled max_attempts times in a row, or
+        for stall_timeout, is failed. A copy replaced by another copy to the same
+        destination is superseded and is not started again.
+
+        :param copies:
+            The copies to run, as (copy_source, container_name, blob_name) tuples.
+            See copy_blob for the copy_source format.
+        :type copies: iterable(tuple(str, str, str))
+        :param int max_pending_copies:
+            Maximum number of copies pending on the service at once.
+        :param int max_attempts:
+            Maximum number of times a copy is started.
+        :param int stall_timeout:
+            If specified, a pending copy which reports no progress for this number
+            of seconds is aborted and started again.
+        :param int max_connections:
+            Maximum number of parallel requests used to start and poll the copies.
+        :param int timeout:
+            The timeout parameter is expressed in seconds, and applies to each
+            request individually.
+        :return: A generator of the copy operations whose state changed.
+        :rtype: iterable(:class:`~azure.storage.common.models.CopyOperation`)
+        '''
+        _validate_not_none('copies', copies)
+
+        def start_copy(operation):
+            container_name, blob_name = operation.destination
+            return self.copy_blob(container_name, blob_name, operation.copy_source, timeout=timeout)
+
+        def get_copy_properties(operation):
+            container_name, blob_name = operation.destination
+            return self.get_blob_properties(container_name, blob_name, timeout=timeout).properties.copy
+
+        def abort_copy(operation):
+            container_name, blob_name = operation.destination
+            self.abort_copy_blob(container_name, blob_name, operation.copy.id, timeout=timeout)
+
+        scheduler = _CopyScheduler(start_copy, get_copy_properties, abort_copy, max_pending_copies,
+                                   max_connections, max_attempts, stall_timeout)
+        return scheduler.run(copies)
+
     def delete_blob(self, container_name, blob_name, snapshot=None,
                     lease_id=None, delete_snapshots=None,
                     if_modified_since=None, if_unmodified_since=None,
@@ -3277,3 +3811,19 @@ class BaseBlobService(StorageClient):
         }
 
         self._perform_request(request)
+
+    def _run_transfer(self, transfer):
+        '''
+        Runs the chunks of a parallel transfer on the threads of the directory
+        transfer it is part of, if any, else on the threads of the request
+        scheduler, if any, or else on those of this service object.
+        '''
+        pool = _get_transfer_pool()
+        if pool is not None:
+            return pool.run(transfer)
+
+        transfer.priority = self.priority
+        if self.request_scheduler is not None:
+            return self.request_scheduler._transfer_scheduler.run(
+                transfer, self.request_scheduler.max_transfer_connections)
+        return self._transfer_scheduler.run(transfer, self.MAX_TRANSFER_CONNECTIONS)
@@ -3,6 +3,7 @@
 # Licensed under the MIT License. See License.txt in the project root for
 # license information.
 # --------------------------------------------------------------------------
+import sys
 from io import (
     BytesIO
 )
@@ -10,6 +11,20 @@ from os import (
     path,
 )
 
+if sys.version_info >= (3,):
+    from urllib.parse import (
+        unquote as url_unquote,
+        urlparse,
+    )
+else:
+    from urllib2 import unquote as url_unquote
+    from urlparse import urlparse
+
+from azure.common import (
+    AzureException,
+    AzureHttpError,
+)
+
 from azure.storage.common._common_conversion import (
     _encode_base64,
     _to_str,
@@ -22,6 +37,7 @@ from azure.storage.common._constants import (
     DEFAULT_PROTOCOL,
 )
 from azure.storage.common._error import (
+    _dont_fail_not_exist,
     _validate_not_none,
     _validate_type_bytes,
     _validate_encryption_required,
@@ -30,6 +46,11 @@ from azure.storage.common._error import (
     _ERROR_VALUE_SHOULD_BE_STREAM
 )
 from azure.storage.common._http import HTTPRequest
+from azure.storage.common._scheduler import _ScheduledTransfer
+from azure.storage.common._transfer import (
+    _transfer_files,
+    _walk_files,
+)
 from azure.storage.common._serialization import (
     _get_request_body,
     _get_data_bytes_only,
@@ -39,6 +60,10 @@ from azure.storage.common._serialization import (
 from azure.storage.common._serialization import (
     _len_plus
 )
+from ._blob_io import (
+    BlobWriter,
+    _BlockBlobWriteTarget,
+)
 from ._deserialization import (
     _convert_xml_to_block_list,
     _parse_base_properties,
@@ -50,15 +75,30 @@ from ._encryption import (
 from ._serialization import (
     _convert_block_list_to_xml,
     _get_path,
+    _is_path_style_host,
+)
+from ._constants import (
+    _MAX_BLOCK_COUNT,
+)
+from ._error import (
+    _ERROR_COPY_SOURCE_MODIFIED,
+    _ERROR_TOO_MANY_BLOCKS,
 )
 from ._upload_chunking import (
     _BlockBlobChunkUploader,
+    _BlockBlobDeltaChunkUploader,
+    _BlockBlobUploadJournal,
+    _ResumableBlockBlobChunkUploader,
+    _copy_blob_ranges,
+    _get_block_id,
     _upload_blob_chunks,
     _upload_blob_substream_blocks,
 )
 from .baseblobservice import BaseBlobService
 from .models import (
     _BlobTypes,
+    BlobBlock,
+    BlockListType,
 )
 
 
@@ -80,18 +120,30 @@ class BlockBlobService(BaseBlobService):
     :ivar int MAX_BLOCK_SIZE:
         The size of the blocks put by create_blob_from_* methods if the content
         length is unknown or is larger than MAX_SINGLE_PUT_SIZE. Smaller blocks
-        may be put. The maximum block size the service supports is 100MB.
+        may be put. Larger blocks are put if a blob of known length would not fit
+        in 50,000 blocks otherwise. The maximum block size the service supports is 100MB.
     :ivar int MIN_LARGE_BLOCK_UPLOAD_THRESHOLD:
         The minimum block size at which the the memory-optimized, block upload
         algorithm is considered. This algorithm is only applicable to the create_blob_from_file and
         create_blob_from_stream methods and will prevent the full buffering of blocks.
         In addition to the block size, ContentMD5 validation and Encryption must be disabled as
         these options require the blocks to be buffered.
+    :ivar int DELTA_SYNC_BLOCK_SIZE:
+        The average size of the content defined blocks put by sync_blob_from_*
+        methods. Blocks are at least a quarter and at most four times this size.
+        Larger blocks are put if a stream of known length would not fit in
+        50,000 blocks otherwise.
+    :ivar int MAX_COPY_BLOCK_SIZE:
+        The size of the blocks put from a source url by copy_blob_from_url and
+        compose_blob. The maximum source range the service supports for
+        put_block_from_url is 100MB.
     '''
 
     MAX_SINGLE_PUT_SIZE = 64 * 1024 * 1024
     MAX_BLOCK_SIZE = 4 * 1024 * 1024
     MIN_LARGE_BLOCK_UPLOAD_THRESHOLD = 4 * 1024 * 1024 + 1
+    DELTA_SYNC_BLOCK_SIZE = 1024 * 1024
+    MAX_COPY_BLOCK_SIZE = 100 * 1024 * 1024
 
     def __init__(self, account_name=None, account_key=None, sas_token=None, is_emulated=False,
                  protocol=DEFAULT_PROTOCOL, endpoint_suffix=SERVICE_HOST_BASE, custom_domain=None,
@@ -376,7 +428,8 @@ class BlockBlobService(BaseBlobService):
             self, container_name, blob_name, file_path, content_settings=None,
             metadata=None, validate_content=False, progress_callback=None,
             max_connections=2, lease_id=None, if_modified_since=None,
-            if_unmodified_since=None, if_match=None, if_none_match=None, timeout=None):
+            if_unmodified_since=None, if_match=None, if_none_match=None, timeout=None,
+            journal_path=None):
         '''
         Creates a new blob from a file path, or updates the content of an
         existing blob, with automatic chunking and progress notifications.
@@ -436,6 +489,16 @@ class BlockBlobService(BaseBlobService):
             The timeout parameter is expressed in seconds. This method may make
             multiple calls to the Azure service and the timeout will apply to
             each call individually.
+        :param str journal_path:
+            If specified, the upload is resumable. The blob is always uploaded in
+            blocks of MAX_BLOCK_SIZE bytes, and each block put is recorded with its
+            MD5 hash in a journal at this path. If the upload fails, calling this
+            method again with the same journal path only uploads the blocks which
+            are missing from the journal or from the uncommitted blocks of the blob,
+            provided the file did not change in between. If validate_content is
+            true, the blocks in the journal are also read again and checked against
+            their recorded MD5 hash. The journal is deleted once the blob is committed.
+            Client side encryption is not supported with resumable uploads.
         :return: ETag and last modified properties for the Block Blob
         :rtype: :class:`~azure.storage.blob.models.ResourceProperties`
         '''
@@ -443,6 +506,24 @@ class BlockBlobService(BaseBlobService):
         _validate_not_none('blob_name', blob_name)
         _validate_not_none('file_path', file_path)
 
+        if journal_path is not None:
+            return self._create_blob_from_path_resumable(
+                container_name=container_name,
+                blob_name=blob_name,
+                file_path=file_path,
+                journal_path=journal_path,
+                content_settings=content_settings,
+                metadata=metadata,
+                validate_content=validate_content,
+                lease_id=lease_id,
+                progress_callback=progress_callback,
+                max_connections=max_connections,
+                if_modified_since=if_modified_since,
+                if_unmodified_since=if_unmodified_since,
+                if_match=if_match,
+                if_none_match=if_none_match,
+                timeout=timeout)
+
         count = path.getsize(file_path)
         with open(file_path, 'rb') as stream:
             return self.create_blob_from_stream(
@@ -587,9 +668,11 @@ class BlockBlobService(BaseBlobService):
             return resp
         else:  # Size is larger than MAX_SINGLE_PUT_SIZE, must upload with multiple put_block calls
             cek, iv, encryption_data = None, None, None
+            block_size = self._get_block_size(adjusted_count)
+            tuner = self._transfer_tuner if self.AUTO_TUNE_TRANSFERS else None
 
             use_original_upload_path = use_byte_buffer or validate_content or self.require_encryption or \
-                                       self.MAX_BLOCK_SIZE < self.MIN_LARGE_BLOCK_UPLOAD_THRESHOLD or \
+                                       block_size < self.MIN_LARGE_BLOCK_UPLOAD_THRESHOLD or \
                                        hasattr(stream, 'seekable') and not stream.seekable() or \
                                        not hasattr(stream, 'seek') or not hasattr(stream, 'tell')
 
@@ -602,7 +685,7 @@ class BlockBlobService(BaseBlobService):
                     container_name=container_name,
                     blob_name=blob_name,
                     blob_size=count,
-                    block_size=self.MAX_BLOCK_SIZE,
+                    block_size=block_size,
                     stream=stream,
                     max_connections=max_connections,
                     progress_callback=progress_callback,
@@ -611,7 +694,9 @@ class BlockBlobService(BaseBlobService):
                     uploader_class=_BlockBlobChunkUploader,
                     timeout=timeout,
                     content_encryption_key=cek,
-                    initialization_vector=iv
+                    initialization_vector=iv,
+                    tuner=tuner,
+                    min_block_size=self._get_min_block_size(adjusted_count)
                 )
             else:
                 block_ids = _upload_blob_substream_blocks(
@@ -619,7 +704,7 @@ class BlockBlobService(BaseBlobService):
                     container_name=container_name,
                     blob_name=blob_name,
                     blob_size=count,
-                    block_size=self.MAX_BLOCK_SIZE,
+                    block_size=block_size,
                     stream=stream,
                     max_connections=max_connections,
                     progress_callback=progress_callback,
@@ -627,6 +712,8 @@ class BlockBlobService(BaseBlobService):
                     lease_id=lease_id,
                     uploader_class=_BlockBlobChunkUploader,
                     timeout=timeout,
+                    tuner=tuner,
+                    min_block_size=self._get_min_block_size(adjusted_count)
                 )
 
             return self._put_block_list(
@@ -845,6 +932,582 @@ class BlockBlobService(BaseBlobService):
             if_none_match=if_none_match,
             timeout=timeout)
 
+    def open_blob_for_write(
+            self, container_name, blob_name, content_settings=None, metadata=None,
+            validate_content=False, max_connections=2, block_size=None, lease_id=None,
+            if_modified_since=None, if_unmodified_since=None, if_match=None,
+            if_none_match=None, timeout=None):
+        '''
+        Opens a blob for writing as a file object, to create a new blob or replace
+        the content of an existing blob from data produced as it is written,
+        without buffering it all locally. The data is put as blocks in the
+        background while it is written, and the blocks are committed when the
+        writer is closed, which is when the blob is created or replaced. See
+        :class:`~azure.storage.blob.BlobWriter` for more details.
+
+        :param str container_name:
+            Name of existing container.
+        :param str blob_name:
+            Name of blob to create or update.
+        :param ~azure.storage.blob.models.ContentSettings content_settings:
+            ContentSettings object used to set blob properties.
+        :param metadata:
+            Name-value pairs associated with the blob as metadata.
+        :type metadata: dict(str, str)
+        :param bool validate_content:
+            If true, calculates an MD5 hash for each block of the blob. The storage
+            service checks the hash of the content that has arrived with the hash
+            that was sent. This is primarily valuable for detecting bitflips on
+            the wire if using http instead of https as https (the default) will
+            already validate. Note that this MD5 hash is not stored with the
+            blob.
+        :param int max_connections:
+            Maximum number of blocks put in parallel. At most max_connections + 1
+            blocks are held in memory.
+        :param int block_size:
+            The size of the blocks put, self.MAX_BLOCK_SIZE by default. As a block
+            blob has at most 50,000 blocks, this limits the size of the blob.
+        :param str lease_id:
+            Required if the blob has an active lease.
+        :param datetime if_modified_since:
+            A DateTime value. Azure expects the date value passed in to be UTC.
+            If timezone is included, any non-UTC datetimes will be converted to UTC.
+            If a date is passed in without timezone info, it is assumed to be UTC.
+            Specify this header to perform the operation only
+            if the resource has been modified since the specified time.
+        :param datetime if_unmodified_since:
+            A DateTime value. Azure expects the date value passed in to be UTC.
+            If timezone is included, any non-UTC datetimes will be converted to UTC.
+            If a date is passed in without timezone info, it is assumed to be UTC.
+            Specify this header to perform the operation only if
+            the resource has not been modified since the specified date/time.
+        :param str if_match:
+            An ETag value, or the wildcard character (*). Specify this header to perform
+            the operation only if the resource's ETag matches the value specified.
+        :param str if_none_match:
+            An ETag value, or the wildcard character (*). Specify this header
+            to perform the operation only if the resource's ETag does not match
+            the value specified. Specify the wildcard character (*) to perform
+            the operation only if the resource does not exist, and fail the
+            operation if it does exist.
+        :param int timeout:
+            The timeout parameter is expressed in seconds. This method may make
+            multiple calls to the Azure service and the timeout will apply to
+            each call individually.
+        :return: A file object writing the blob.
+        :rtype: :class:`~azure.storage.blob.BlobWriter`
+        '''
+        _validate_not_none('container_name', container_name)
+        _validate_not_none('blob_name', blob_name)
+        _validate_encryption_unsupported(self.require_encryption, self.key_encryption_key)
+
+        target = _BlockBlobWriteTarget(self, container_name, blob_name, content_settings, metadata,
+                                       validate_content, lease_id, if_modified_since, if_unmodified_since,
+                                       if_match, if_none_match, timeout)
+        return BlobWriter(target, block_size or self.MAX_BLOCK_SIZE, max_connections)
+
+    def upload_directory(
+            self, container_name, directory_path, blob_prefix=None, content_settings=None,
+            metadata=None, validate_content=False, progress_callback=None, max_connections=8,
+            if_none_match=None, timeout=None):
+        '''
+        Uploads the files of a local directory tree to block blobs named after their
+        path relative to the directory. The tree is walked lazily while the files are
+        uploaded by a single pool of max_connections threads, so the upload starts
+        right away and never has more than max_connections requests in flight.
+
+        Files smaller than MAX_SINGLE_PUT_SIZE are uploaded with a single put. Larger
+        files are put in blocks of MAX_BLOCK_SIZE bytes by the thread which uploads
+        the file, helped by the threads of the pool which have no file left to
+        upload. A file which fails to upload does not stop the upload of the
+        others, and is reported in the result.
+
+        :param str container_name:
+            Name of existing container.
+        :param str directory_path:
+            Path of the local directory to upload.
+        :param str blob_prefix:
+            Prefix of the names of the blobs, such as 'backups/2018-01-01/'. The
+            relative path of each file is appended to it, using '/' as separator.
+        :param ~azure.storage.blob.models.ContentSettings content_settings:
+            ContentSettings object used to set the properties of every blob.
+        :param metadata:
+            Name-value pairs associated with every blob as metadata.
+        :type metadata: dict(str, str)
+        :param bool validate_content:
+            If true, calculates an MD5 hash for each put. The storage service checks
+            the hash of the content that has arrived with the hash that was sent.
+        :param progress_callback:
+            Callback with signature function(result), called every time a file is
+            uploaded or fails with the DirectoryTransferResult of the upload so far.
+        :type progress_callback: func(:class:`~azure.storage.common.models.DirectoryTransferResult`)
+        :param int max_connections:
+            Maximum number of files, and blocks of large files, uploaded in parallel.
+        :param str if_none_match:
+            Specify the wildcard character (*) to only upload the files whose blob
+            does not exist. The other files are reported as failures.
+        :param int timeout:
+            The timeout parameter is expressed in seconds. This method may make
+            multiple calls to the Azure service and the timeout will apply to
+            each call individually.
+        :return: The number of files and bytes uploaded, the throughput and the failures.
+        :rtype: :class:`~azure.storage.common.models.DirectoryTransferResult`
+        '''
+        _validate_not_none('container_name', container_name)
+        _validate_not_none('directory_path', directory_path)
+        _validate_encryption_required(self.require_encryption, self.key_encryption_key)
+
+        def upload_file(task):
+            file_path, blob_name = task
+            count = path.getsize(file_path)
+
+            # Adjust count to include padding if we are expected to encrypt.
+            adjusted_count = count
+            if self.key_encryption_key is not None:
+                adjusted_count += (16 - (count % 16))
+
+            if adjusted_count < self.MAX_SINGLE_PUT_SIZE:
+                with open(file_path, 'rb') as stream:
+                    data = stream.read()
+                self._put_blob(container_name, blob_name, data, content_settings=content_settings,
+                               metadata=metadata, validate_content=validate_content,
+                               if_none_match=if_none_match, timeout=timeout)
+                return len(data)
+
+            # the blocks are put on the threads of the directory upload, see _run_transfer
+            self.create_blob_from_path(container_name, blob_name, file_path,
+                                       content_settings=content_settings, metadata=metadata,
+                                       validate_content=validate_content, max_connections=max_connections,
+                                       if_none_match=if_none_match, timeout=timeout)
+            return count
+
+        tasks = ((file_path, (file_path, (blob_prefix or '') + relative_path))
+                 for file_path, relative_path in _walk_files(directory_path))
+        return _transfer_files(upload_file, tasks, max_connections, progress_callback)
+
+    def sync_blob_from_path(
+            self, container_name, blob_name, file_path, content_settings=None,
+            metadata=None, validate_content=False, progress_callback=None,
+            max_connections=2, lease_id=None, if_modified_since=None,
+            if_unmodified_since=None, if_match=None, if_none_match=None, timeout=None):
+        '''
+        Creates a new blob from a file path, or updates the content of an
+        existing blob, uploading only the blocks of the file which are not
+        already committed to the blob. See sync_blob_from_stream for details.
+
+        :param str container_name:
+            Name of existing container.
+        :param str blob_name:
+            Name of blob to create or update.
+        :param str file_path:
+            Path of the file to upload as the blob content.
+        :param ~azure.storage.blob.models.ContentSettings content_settings:
+            ContentSettings object used to set blob properties.
+        :param metadata:
+            Name-value pairs associated with the blob as metadata.
+        :type metadata: dict(str, str)
+        :param bool validate_content:
+            If true, calculates an MD5 hash for each block uploaded. The storage
+            service checks the hash of the content that has arrived with the hash
+            that was sent. This is primarily valuable for detecting bitflips on
+            the wire if using http instead of https as https (the default) will
+            already validate. Note that this MD5 hash is not stored with the
+            blob.
+        :param progress_callback:
+            Callback for progress with signature function(current, total) where
+            current is the number of bytes processed so far, including the bytes
+            of blocks which did not need to be uploaded, and total is the size of the blob.
+        :type progress_callback: func(current, total)
+        :param int max_connections:
+            Maximum number of parallel connections to use.
+        :param str lease_id:
+            Required if the blob has an active lease.
+        :param datetime if_modified_since:
+            A DateTime value. Azure expects the date value passed in to be UTC.
+            If timezone is included, any non-UTC datetimes will be converted to UTC.
+            If a date is passed in without timezone info, it is assumed to be UTC.
+            Specify this header to perform the operation only
+            if the resource has been modified since the specified time.
+        :param datetime if_unmodified_since:
+            A DateTime value. Azure expects the date value passed in to be UTC.
+            If timezone is included, any non-UTC datetimes will be converted to UTC.
+            If a date is passed in without timezone info, it is assumed to be UTC.
+            Specify this header to perform the operation only if
+            the resource has not been modified since the specified date/time.
+        :param str if_match:
+            An ETag value, or the wildcard character (*). Specify this header to perform
+            the operation only if the resource's ETag matches the value specified.
+        :param str if_none_match:
+            An ETag value, or the wildcard character (*). Specify this header
+            to perform the operation only if the resource's ETag does not match
+            the value specified. Specify the wildcard character (*) to perform
+            the operation only if the resource does not exist, and fail the
+            operation if it does exist.
+        :param int timeout:
+            The timeout parameter is expressed in seconds. This method may make
+            multiple calls to the Azure service and the timeout will apply to
+            each call individually.
+        :return: ETag and last modified properties for the Block Blob
+        :rtype: :class:`~azure.storage.blob.models.ResourceProperties`
+        '''
+        _validate_not_none('container_name', container_name)
+        _validate_not_none('blob_name', blob_name)
+        _validate_not_none('file_path', file_path)
+
+        count = path.getsize(file_path)
+        with open(file_path, 'rb') as stream:
+            return self.sync_blob_from_stream(
+                container_name=container_name,
+                blob_name=blob_name,
+                stream=stream,
+                count=count,
+                content_settings=content_settings,
+                metadata=metadata,
+                validate_content=validate_content,
+                lease_id=lease_id,
+                progress_callback=progress_callback,
+                max_connections=max_connections,
+                if_modified_since=if_modified_since,
+                if_unmodified_since=if_unmodified_since,
+                if_match=if_match,
+                if_none_match=if_none_match,
+                timeout=timeout)
+
+    def sync_blob_from_stream(
+            self, container_name, blob_name, stream, count=None,
+            content_settings=None, metadata=None, validate_content=False,
+            progress_callback=None, max_connections=2, lease_id=None,
+            if_modified_since=None, if_unmodified_since=None, if_match=None,
+            if_none_match=None, timeout=None):
+        '''
+        Creates a new blob from a file/stream, or updates the content of an
+        existing blob, uploading only the blocks of the stream which are not
+        already committed to the blob.
+
+        The stream is split into blocks at boundaries chosen by a hash of its
+        content, of DELTA_SYNC_BLOCK_SIZE bytes on average, or larger if count is
+        given and the blob would not fit in 50,000 blocks otherwise, and each block is
+        identified by a hash of its content. An edit to the content therefore only
+        changes the blocks around it, and the blocks found in the committed block
+        list of the blob are committed again without being uploaded, so that the
+        bytes transferred scale with the size of the change rather than the size
+        of the blob. Blobs previously uploaded with create_blob_from_* methods
+        share no blocks with the stream and are fully uploaded on the first sync.
+        Client side encryption is not supported.
+
+        :param str container_name:
+            Name of existing container.
+        :param str blob_name:
+            Name of blob to create or update.
+        :param io.IOBase stream:
+            Opened file/stream to upload as the blob content.
+        :param int count:
+            Number of bytes to read from the stream. This is optional, the
+            stream is read until its end if it is not specified.
+        :param ~azure.storage.blob.models.ContentSettings content_settings:
+            ContentSettings object used to set blob properties.
+        :param metadata:
+            Name-value pairs associated with the blob as metadata.
+        :type metadata: dict(str, str)
+        :param bool validate_content:
+            If true, calculates an MD5 hash for each block uploaded. The storage
+            service checks the hash of the content that has arrived with the hash
+            that was sent. This is primarily valuable for detecting bitflips on
+            the wire if using http instead of https as https (the default) will
+            already validate. Note that this MD5 hash is not stored with the
+            blob.
+        :param progress_callback:
+            Callback for progress with signature function(current, total) where
+            current is the number of bytes processed so far, including the bytes
+            of blocks which did not need to be uploaded, and total is the size of
+            the blob, or None if the total size is unknown.
+        :type progress_callback: func(current, total)
+        :param int max_connections:
+            Maximum number of parallel connections to use.
+        :param str lease_id:
+            Required if the blob has an active lease.
+        :param datetime if_modified_since:
+            A DateTime value. Azure expects the date value passed in to be UTC.
+            If timezone is included, any non-UTC datetimes will be converted to UTC.
+            If a date is passed in without timezone info, it is assumed to be UTC.
+            Specify this header to perform the operation only
+            if the resource has been modified since the specified time.
+        :param datetime if_unmodified_since:
+            A DateTime value. Azure expects the date value passed in to be UTC.
+            If timezone is included, any non-UTC datetimes will be converted to UTC.
+            If a date is passed in without timezone info, it is assumed to be UTC.
+            Specify this header to perform the operation only if
+            the resource has not been modified since the specified date/time.
+        :param str if_match:
+            An ETag value, or the wildcard character (*). Specify this header to perform
+            the operation only if the resource's ETag matches the value specified.
+        :param str if_none_match:
+            An ETag value, or the wildcard character (*). Specify this header
+            to perform the operation only if the resource's ETag does not match
+            the value specified. Specify the wildcard character (*) to perform
+            the operation only if the resource does not exist, and fail the
+            operation if it does exist.
+        :param int timeout:
+            The timeout parameter is expressed in seconds. This method may make
+            multiple calls to the Azure service and the timeout will apply to
+            each call individually.
+        :return: ETag and last modified properties for the Block Blob
+        :rtype: :class:`~azure.storage.blob.models.ResourceProperties`
+        '''
+        _validate_not_none('container_name', container_name)
+        _validate_not_none('blob_name', blob_name)
+        _validate_not_none('stream', stream)
+        _validate_encryption_unsupported(self.require_encryption, self.key_encryption_key)
+
+        committed_block_ids = set()
+        try:
+            block_list = self.get_block_list(container_name, blob_name, block_list_type=BlockListType.Committed,
+                                             lease_id=lease_id, timeout=timeout)
+            committed_block_ids.update(block.id for block in block_list.committed_blocks)
+        except AzureHttpError as ex:
+            _dont_fail_not_exist(ex)
+
+        block_list = _upload_blob_chunks(
+            blob_service=self,
+            container_name=container_name,
+            blob_name=blob_name,
+            blob_size=count,
+            block_size=self._get_delta_sync_block_size(count),
+            stream=stream,
+            max_connections=max_connections,
+            progress_callback=progress_callback,
+            validate_content=validate_content,
+            lease_id=lease_id,
+            uploader_class=_BlockBlobDeltaChunkUploader,
+            timeout=timeout,
+            committed_block_ids=committed_block_ids,
+            min_block_size=self._get_min_block_size(count),
+        )
+
+        return self._put_block_list(
+            container_name=container_name,
+            blob_name=blob_name,
+            block_list=block_list,
+            content_settings=content_settings,
+            metadata=metadata,
+            validate_content=validate_content,
+            lease_id=lease_id,
+            if_modified_since=if_modified_since,
+            if_unmodified_since=if_unmodified_since,
+            if_match=if_match,
+            if_none_match=if_none_match,
+            timeout=timeout
+        )
+
+    def copy_blob_from_url(
+            self, container_name, blob_name, copy_source_url, content_settings=None,
+            metadata=None, progress_callback=None, max_connections=4, lease_id=None,
+            if_modified_since=None, if_unmodified_since=None, if_match=None,
+            if_none_match=None, timeout=None):
+        '''
+        Copies a blob from a source url synchronously. Unlike copy_blob, which
+        schedules an asynchronous copy on the service, the source is split into
+        ranges of MAX_COPY_BLOCK_SIZE bytes which are put in parallel as blocks
+        with put_block_from_url, and the blocks are committed once all of them
+        are copied. The data never flows through the client. Each range is retried
+        on its own according to the retry policy of the service, so a failed range
+        does not restart the copy.
+
+        :param str container_name:
+            Name of the destination container. The container must exist.
+        :param str blob_name:
+            Name of the destination blob. If the destination blob exists, it will
+            be overwritten.
+        :param str copy_source_url:
+            The URL of the source blob. It can point to any Azure Blob, in any
+            account, that is either public or has a shared access signature attached.
+            It may include a snapshot query parameter.
+        :param ~azure.storage.blob.models.ContentSettings content_settings:
+            ContentSettings object used to set blob properties. If not specified,
+            the content settings of the source blob are copied.
+        :param metadata:
+            Name-value pairs associated with the blob as metadata. If not specified,
+            the metadata of the source blob is copied.
+        :type metadata: dict(str, str)
+        :param progress_callback:
+            Callback for progress with signature function(current, total) where
+            current is the number of bytes copied so far, and total is the size of
+            the source blob.
+        :type progress_callback: func(current, total)
+        :param int max_connections:
+            Maximum number of put_block_from_url calls in flight.
+        :param str lease_id:
+            Required if the destination blob has an active lease.
+        :param datetime if_modified_since:
+            A DateTime value. Azure expects the date value passed in to be UTC.
+            If timezone is included, any non-UTC datetimes will be converted to UTC.
+            If a date is passed in without timezone info, it is assumed to be UTC.
+            Specify this header to commit the destination blob only
+            if it has been modified since the specified time.
+        :param datetime if_unmodified_since:
+            A DateTime value. Azure expects the date value passed in to be UTC.
+            If timezone is included, any non-UTC datetimes will be converted to UTC.
+            If a date is passed in without timezone info, it is assumed to be UTC.
+            Specify this header to commit the destination blob only if
+            it has not been modified since the specified date/time.
+        :param str if_match:
+            An ETag value, or the wildcard character (*). Specify this header to commit
+            the destination blob only if its ETag matches the value specified.
+        :param str if_none_match:
+            An ETag value, or the wildcard character (*). Specify this header
+            to commit the destination blob only if its ETag does not match
+            the value specified. Specify the wildcard character (*) to commit
+            the destination blob only if it does not exist.
+        :param int timeout:
+            The timeout parameter is expressed in seconds. This method may make
+            multiple calls to the Azure service and the timeout will apply to
+            each call individually.
+        :return: ETag and last modified properties for the Block Blob
+        :rtype: :class:`~azure.storage.blob.models.ResourceProperties`
+        '''
+        _validate_not_none('container_name', container_name)
+        _validate_not_none('blob_name', blob_name)
+        _validate_not_none('copy_source_url', copy_source_url)
+        _validate_encryption_unsupported(self.require_encryption, self.key_encryption_key)
+
+        source = self._get_copy_source_properties(copy_source_url, timeout=timeout)
+        source_ranges = self._get_copy_source_ranges(copy_source_url, 0, source.properties.content_length)
+        block_list = _copy_blob_ranges(self, container_name, blob_name, source_ranges, max_connections,
+                                       progress_callback, lease_id, timeout)
+
+        # The ranges are copied with separate requests, make sure they all come
+        # from the same version of the source before committing them
+        etag = self._get_copy_source_properties(copy_source_url, timeout=timeout).properties.etag
+        if etag != source.properties.etag:
+            raise AzureException(_ERROR_COPY_SOURCE_MODIFIED.format(copy_source_url))
+
+        return self._put_block_list(
+            container_name,
+            blob_name,
+            block_list,
+            content_settings=content_settings if content_settings is not None else
+            source.properties.content_settings,
+            metadata=metadata if metadata is not None else source.metadata,
+            lease_id=lease_id,
+            if_modified_since=if_modified_since,
+            if_unmodified_since=if_unmodified_since,
+            if_match=if_match,
+            if_none_match=if_none_match,
+            timeout=timeout
+        )
+
+    def compose_blob(
+            self, container_name, blob_name, sources, content_settings=None, metadata=None,
+            progress_callback=None, max_connections=4, lease_id=None, if_modified_since=None,
+            if_unmodified_since=None, if_match=None, if_none_match=None, timeout=None):
+        '''
+        Creates a block blob by concatenating source blobs, or ranges of source
+        blobs, in the given order. The content of each source is put as blocks with
+        put_block_from_url, split in ranges of MAX_COPY_BLOCK_SIZE bytes, so that the
+        data is copied by the service and never flows through the client. The blocks
+        are put in parallel and committed once, so the destination blob only appears
+        once all the sources are copied.
+
+        A block blob holds at most 50,000 blocks and each source needs at least one,
+        so the composition fails before any block is put if the sources need more.
+        The sources are not checked for changes while they are copied; use snapshot
+        urls for sources which may be modified during the composition.
+
+        :param str container_name:
+            Name of the destination container. The container must exist.
+        :param str blob_name:
+            Name of the destination blob. If the destination blob exists, it will
+            be overwritten.
+        :param sources:
+            The sources to concatenate, in order. A source is either the URL of a
+            blob, or a (url, start_range, end_range) tuple for the range of a blob,
+            end_range being inclusive. See copy_blob_from_url for the url format.
+            The size of a whole blob source is read from its properties.
+        :type sources: list(str or tuple(str, int, int))
+        :param ~azure.storage.blob.models.ContentSettings content_settings:
+            ContentSettings object used to set blob properties.
+        :param metadata:
+            Name-value pairs associated with the blob as metadata.
+        :type metadata: dict(str, str)
+        :param progress_callback:
+            Callback for progress with signature function(current, total) where
+            current is the number of bytes copied so far, and total is the size of
+            the composed blob.
+        :type progress_callback: func(current, total)
+        :param int max_connections:
+            Maximum number of requests in flight, to get the properties of the
+            sources and to put the blocks.
+        :param str lease_id:
+            Required if the destination blob has an active lease.
+        :param datetime if_modified_since:
+            A DateTime value. Azure expects the date value passed in to be UTC.
+            If timezone is included, any non-UTC datetimes will be converted to UTC.
+            If a date is passed in without timezone info, it is assumed to be UTC.
+            Specify this header to commit the destination blob only
+            if it has been modified since the specified time.
+        :param datetime if_unmodified_since:
+            A DateTime value. Azure expects the date value passed in to be UTC.
+            If timezone is included, any non-UTC datetimes will be converted to UTC.
+            If a date is passed in without timezone info, it is assumed to be UTC.
+            Specify this header to commit the destination blob only if
+            it has not been modified since the specified date/time.
+        :param str if_match:
+            An ETag value, or the wildcard character (*). Specify this header to commit
+            the destination blob only if its ETag matches the value specified.
+        :param str if_none_match:
+            An ETag value, or the wildcard character (*). Specify this header
+            to commit the destination blob only if its ETag does not match
+            the value specified. Specify the wildcard character (*) to commit
+            the destination blob only if it does not exist.
+        :param int timeout:
+            The timeout parameter is expressed in seconds. This method may make
+            multiple calls to the Azure service and the timeout will apply to
+            each call individually.
+        :return: ETag and last modified properties for the Block Blob
+        :rtype: :class:`~azure.storage.blob.models.ResourceProperties`
+        '''
+        _validate_not_none('container_name', container_name)
+        _validate_not_none('blob_name', blob_name)
+        _validate_not_none('sources', sources)
+        _validate_encryption_unsupported(self.require_encryption, self.key_encryption_key)
+
+        def get_source_range(source):
+            if isinstance(source, tuple):
+                copy_source_url, start_range, end_range = source
+                return copy_source_url, start_range, end_range + 1
+
+            properties = self._get_copy_source_properties(source, timeout=timeout).properties
+            return source, 0, properties.content_length
+
+        if max_connections > 1:
+            sources = self._run_transfer(_ScheduledTransfer(get_source_range, sources, max_connections))
+        else:
+            sources = [get_source_range(source) for source in sources]
+
+        source_ranges = []
+        for copy_source_url, start, end in sources:
+            source_ranges.extend(self._get_copy_source_ranges(copy_source_url, start, end))
+
+        if len(source_ranges) > _MAX_BLOCK_COUNT:
+            raise ValueError(_ERROR_TOO_MANY_BLOCKS.format(len(source_ranges), _MAX_BLOCK_COUNT))
+
+        block_list = _copy_blob_ranges(self, container_name, blob_name, source_ranges, max_connections,
+                                       progress_callback, lease_id, timeout)
+
+        return self._put_block_list(
+            container_name,
+            blob_name,
+            block_list,
+            content_settings=content_settings,
+            metadata=metadata,
+            lease_id=lease_id,
+            if_modified_since=if_modified_since,
+            if_unmodified_since=if_unmodified_since,
+            if_match=if_match,
+            if_none_match=if_none_match,
+            timeout=timeout
+        )
+
     def set_standard_blob_tier(
             self, container_name, blob_name, standard_blob_tier, timeout=None):
         '''
@@ -881,6 +1544,181 @@ class BlockBlobService(BaseBlobService):
         self._perform_request(request)
 
     # -----Helper methods------------------------------------
+    def _create_blob_from_path_resumable(
+            self, container_name, blob_name, file_path, journal_path, content_settings=None,
+            metadata=None, validate_content=False, progress_callback=None,
+            max_connections=2, lease_id=None, if_modified_since=None,
+            if_unmodified_since=None, if_match=None, if_none_match=None, timeout=None):
+        '''
+        See create_blob_from_path for more details. Uploads the blocks of the file
+        which are missing from the journal, reconciled with the uncommitted blocks
+        of the blob, and commits the blob.
+        '''
+        _validate_encryption_unsupported(self.require_encryption, self.key_encryption_key)
+
+        count = path.getsize(file_path)
+        block_size = self._get_block_size(count)
+        journal = _BlockBlobUploadJournal(journal_path, {
+            'Container': container_name,
+            'Blob': blob_name,
+            'Source': path.abspath(file_path),
+            'Size': count,
+            'LastModified': path.getmtime(file_path),
+            'BlockSize': block_size,
+        })
+        journal.load()
+
+        uncommitted_blocks = []
+        if journal.blocks:
+            try:
+                uncommitted_blocks = self.get_block_list(
+                    container_name, blob_name, block_list_type=BlockListType.Uncommitted,
+                    lease_id=lease_id, timeout=timeout).uncommitted_blocks
+            except AzureHttpError as ex:
+                _dont_fail_not_exist(ex)
+
+        journal.reconcile(uncommitted_blocks, count, block_size)
+        try:
+            with open(file_path, 'rb') as stream:
+                _upload_blob_chunks(
+                    blob_service=self,
+                    container_name=container_name,
+                    blob_name=blob_name,
+                    blob_size=count,
+                    block_size=block_size,
+                    stream=stream,
+                    max_connections=max_connections,
+                    progress_callback=progress_callback,
+                    validate_content=validate_content,
+                    lease_id=lease_id,
+                    uploader_class=_ResumableBlockBlobChunkUploader,
+                    timeout=timeout,
+                    journal=journal
+                )
+        finally:
+            journal.close()
+
+        # the blocks are identified by their offset, so the block list covers the
+        # blocks uploaded by previous attempts as well
+        block_list = [BlobBlock(_get_block_id(offset)) for offset in range(0, count, block_size)]
+        resp = self._put_block_list(
+            container_name=container_name,
+            blob_name=blob_name,
+            block_list=block_list,
+            content_settings=content_settings,
+            metadata=metadata,
+            validate_content=validate_content,
+            lease_id=lease_id,
+            if_modified_since=if_modified_since,
+            if_unmodified_since=if_unmodified_since,
+            if_match=if_match,
+            if_none_match=if_none_match,
+            timeout=timeout
+        )
+
+        journal.delete()
+        return resp
+
+    def _get_min_block_size(self, count):
+        '''
+        Gets the smallest block size which fits count bytes in the 50,000 blocks
+        of a block blob, or None if the count is unknown.
+        '''
+        if count is None:
+            return None
+        return -(-count // _MAX_BLOCK_COUNT)
+
+    def _get_block_size(self, count):
+        '''
+        Gets the size of the blocks of an upload of count bytes, MAX_BLOCK_SIZE
+        unless larger blocks are needed for the blob to fit in 50,000 blocks, in
+        which case the block size is rounded up to whole megabytes.
+        '''
+        min_block_size = self._get_min_block_size(count) or 0
+        if min_block_size <= self.MAX_BLOCK_SIZE:
+            return self.MAX_BLOCK_SIZE
+        megabyte = 1024 * 1024
+        return -(-min_block_size // megabyte) * megabyte
+
+    def _get_delta_sync_block_size(self, count):
+        '''
+        Gets the average size of the content defined blocks of a sync of count
+        bytes, DELTA_SYNC_BLOCK_SIZE unless the blocks must be larger for the blob
+        to fit in 50,000 blocks, in which case the smallest blocks are of the
+        minimum size which fits and the average is twice that, rounded up to
+        whole megabytes.
+        '''
+        min_block_size = self._get_min_block_size(count) or 0
+        if 2 * min_block_size <= self.DELTA_SYNC_BLOCK_SIZE:
+            return self.DELTA_SYNC_BLOCK_SIZE
+        megabyte = 1024 * 1024
+        return -(-2 * min_block_size // megabyte) * megabyte
+
+    def _get_copy_source_ranges(self, copy_source_url, start, end):
+        '''
+        Splits the range [start, end) of a copy source in (copy_source_url, start, end)
+        ranges of at most MAX_COPY_BLOCK_SIZE bytes, one for each block to put.
+        '''
+        return [(copy_source_url, range_start, min(range_start + self.MAX_COPY_BLOCK_SIZE, end))
+                for range_start in range(start, end, self.MAX_COPY_BLOCK_SIZE)]
+
+    def _get_copy_source_properties(self, copy_source_url, timeout=None):
+        '''
+        Gets the properties and metadata of the blob at copy_source_url, which may
+        be in another account. The request is authorized by the shared access
+        signature of the url, if any, rather than by the credentials of this service.
+        '''
+        source_service, container_name, blob_name, snapshot = self._get_copy_source_service(copy_source_url)
+        return source_service.get_blob_properties(container_name, blob_name, snapshot=snapshot, timeout=timeout)
+
+    def _get_copy_source_service(self, copy_source_url):
+        '''
+        Gets a service for the account of copy_source_url, authorized by its shared
+        access signature, if any, along with the container, blob and snapshot it names.
+        '''
+        parsed_url = urlparse(copy_source_url)
+        location = parsed_url.netloc + parsed_url.path
+        if location.startswith(self.primary_endpoint + '/'):
+            # a blob of this account, whose endpoint holds the account name in its
+            # path for the emulator
+            account_name = self.account_name
+            endpoint = self.primary_endpoint
+        elif _is_path_style_host(parsed_url.hostname):
+            # the path of a path style url, as those of the emulator, starts with the account
+            account_name = parsed_url.path.lstrip('/').split('/', 1)[0]
+            endpoint = parsed_url.netloc + '/' + account_name
+        else:
+            account_name = parsed_url.netloc.split('.')[0]
+            endpoint = parsed_url.netloc
+        container_name, blob_name = location[len(endpoint):].lstrip('/').split('/', 1)
+
+        # the snapshot is passed on its own, the rest of the query is the signature
+        snapshot = None
+        sas_params = []
+        for param in parsed_url.query.split('&'):
+            if param.startswith('snapshot='):
+                snapshot = url_unquote(param[len('snapshot='):])
+            elif param:
+                sas_params.append(param)
+
+        source_service = BaseBlobService(
+            account_name=account_name,
+            sas_token='&'.join(sas_params) or None,
+            protocol=parsed_url.scheme,
+            custom_domain=parsed_url.scheme + '://' + endpoint,
+            request_session=self.request_session,
+            socket_timeout=self.socket_timeout)
+
+        # the source requests share the settings of this client, so that they count
+        # against its request cap with its priority and go through its proxy
+        source_service.retry = self.retry
+        source_service.request_scheduler = self.request_scheduler
+        source_service.priority = self.priority
+        source_service._httpclient.proxies = self._httpclient.proxies
+        source_service._transfer_scheduler = self._transfer_scheduler
+
+        return source_service, url_unquote(container_name), url_unquote(blob_name), snapshot
+
     def _put_blob(self, container_name, blob_name, blob, content_settings=None,
                   metadata=None, validate_content=False, lease_id=None, if_modified_since=None,
                   if_unmodified_since=None, if_match=None, if_none_match=None,
@@ -404,6 +404,55 @@ class PageBlobProperties(ResourceProperties):
         self.sequence_number = None
 
 
+class PageBlobBackup(object):
+    '''
+    Describes an incremental backup of a page blob taken by
+    :func:`~azure.storage.blob.pageblobservice.PageBlobService.backup_blob`.
+
+    :ivar str snapshot:
+        The snapshot of the blob that was backed up.
+    :ivar str previous_snapshot:
+        The snapshot the backup is relative to, or None for a full backup.
+    :ivar int blob_size:
+        The size of the blob at the time of the snapshot.
+    :ivar page_ranges:
+        The page ranges whose content is stored in the backup.
+    :vartype page_ranges: list(:class:`~azure.storage.blob.models.PageRange`)
+    :ivar cleared_ranges:
+        The page ranges cleared since the previous snapshot.
+    :vartype cleared_ranges: list(:class:`~azure.storage.blob.models.PageRange`)
+    '''
+
+    def __init__(self, snapshot=None, previous_snapshot=None, blob_size=None,
+                 page_ranges=None, cleared_ranges=None):
+        self.snapshot = snapshot
+        self.previous_snapshot = previous_snapshot
+        self.blob_size = blob_size
+        self.page_ranges = page_ranges or []
+        self.cleared_ranges = cleared_ranges or []
+
+
+class LogRecord(object):
+    '''
+    A record of a sharded append blob log, as read by
+    :func:`~azure.storage.blob.appendblobservice.AppendBlobService.read_sharded_log`.
+
+    :ivar int sequence:
+        The sequence number of the record, the time it was written at in
+        microseconds since the epoch, strictly increasing for the records of a
+        writer.
+    :ivar int shard:
+        The shard the record was written to.
+    :ivar bytes data:
+        The content of the record.
+    '''
+
+    def __init__(self, sequence=None, shard=None, data=None):
+        self.sequence = sequence
+        self.shard = shard
+        self.data = data
+
+
 class PublicAccess(object):
     '''
     Specifies whether data in the container may be accessed publicly and the level of access.
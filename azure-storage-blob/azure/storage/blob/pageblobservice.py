@@ -24,21 +24,27 @@ from azure.storage.common._error import (
     _ERROR_VALUE_NEGATIVE,
 )
 from azure.storage.common._http import HTTPRequest
+from azure.storage.common._scheduler import _ScheduledTransfer
+from azure.storage.common.models import _OperationContext
 from azure.storage.common._serialization import (
     _get_data_bytes_only,
     _add_metadata_headers,
 )
 from ._deserialization import (
     _convert_xml_to_page_ranges,
+    _read_page_blob_backup_header,
     _parse_page_properties,
     _parse_base_properties,
 )
+from ._download_chunking import _download_blob_ranges
 from ._encryption import _generate_blob_encryption_data
 from ._error import (
     _ERROR_PAGE_BLOB_SIZE_ALIGNMENT,
+    _ERROR_TRUNCATED_PAGE_BLOB_BACKUP,
 )
 from ._serialization import (
     _get_path,
+    _write_page_blob_backup_header,
     _validate_and_format_range_headers,
 )
 from ._upload_chunking import (
@@ -48,6 +54,8 @@ from ._upload_chunking import (
 from .baseblobservice import BaseBlobService
 from .models import (
     _BlobTypes,
+    PageBlobBackup,
+    PageRange,
     ResourceProperties)
 
 if sys.version_info >= (3,):
@@ -74,9 +82,15 @@ class PageBlobService(BaseBlobService):
         The size of the pages put by create_blob_from_* methods. Smaller pages 
         may be put if there is less data provided. The maximum page size the service 
         supports is 4MB. When using the create_blob_from_* methods, empty pages are skipped.
+    :ivar int MAX_PAGE_RANGES_SEGMENT_SIZE:
+        The size of the segments of the blob whose page ranges are listed by a single
+        get_page_ranges call in get_blob_to_sparse_path. Listing the page ranges of a
+        large, fragmented page blob in segments keeps each call from timing out and
+        allows the segments to be listed in parallel.
     '''
 
     MAX_PAGE_SIZE = 4 * 1024 * 1024
+    MAX_PAGE_RANGES_SEGMENT_SIZE = 1024 * 1024 * 1024
 
     def __init__(self, account_name=None, account_key=None, sas_token=None, is_emulated=False,
                  protocol=DEFAULT_PROTOCOL, endpoint_suffix=SERVICE_HOST_BASE, custom_domain=None,
@@ -651,6 +665,321 @@ class PageBlobService(BaseBlobService):
 
         return self._perform_request(request, _convert_xml_to_page_ranges)
 
+    def get_blob_to_sparse_path(
+            self, container_name, blob_name, file_path, snapshot=None,
+            validate_content=False, progress_callback=None, max_connections=2,
+            lease_id=None, if_modified_since=None, if_unmodified_since=None,
+            if_match=None, if_none_match=None, timeout=None):
+        '''
+        Downloads a page blob to a sparse file. Only the valid page ranges, as
+        reported by get_page_ranges, are downloaded and written to the file. The
+        file is extended to the size of the blob without writing the unallocated
+        pages, so on file systems that support it these are left as holes which
+        read back as zeros and do not use any disk space.
+        Returns an instance of :class:`~azure.storage.blob.models.Blob` with
+        properties and metadata.
+
+        :param str container_name:
+            Name of existing container.
+        :param str blob_name:
+            Name of existing blob.
+        :param str file_path:
+            Path of file to write out to. Any existing file is overwritten.
+        :param str snapshot:
+            The snapshot parameter is an opaque DateTime value that,
+            when present, specifies the blob snapshot to retrieve.
+        :param bool validate_content:
+            If set to true, validates an MD5 hash for each retrieved portion of 
+            the blob. This is primarily valuable for detecting bitflips on the wire 
+            if using http instead of https as https (the default) will already 
+            validate. Note that the service will only return transactional MD5s 
+            for chunks 4MB or less, so self.MAX_CHUNK_GET_SIZE must not be set to
+            greater than 4MB if this is used.
+        :param progress_callback:
+            Callback for progress with signature function(current, total) 
+            where current is the number of bytes transfered so far, and total is 
+            the number of bytes in the valid page ranges of the blob.
+        :type progress_callback: func(current, total)
+        :param int max_connections:
+            Maximum number of parallel connections to use to list the page ranges
+            and to download them. Each download will be of size at most
+            self.MAX_CHUNK_GET_SIZE.
+        :param str lease_id:
+            Required if the blob has an active lease.
+        :param datetime if_modified_since:
+            A DateTime value. Azure expects the date value passed in to be UTC.
+            If timezone is included, any non-UTC datetimes will be converted to UTC.
+            If a date is passed in without timezone info, it is assumed to be UTC. 
+            Specify this header to perform the operation only
+            if the resource has been modified since the specified time.
+        :param datetime if_unmodified_since:
+            A DateTime value. Azure expects the date value passed in to be UTC.
+            If timezone is included, any non-UTC datetimes will be converted to UTC.
+            If a date is passed in without timezone info, it is assumed to be UTC.
+            Specify this header to perform the operation only if
+            the resource has not been modified since the specified date/time.
+        :param str if_match:
+            An ETag value, or the wildcard character (*). Specify this header to perform
+            the operation only if the resource's ETag matches the value specified.
+        :param str if_none_match:
+            An ETag value, or the wildcard character (*). Specify this header
+            to perform the operation only if the resource's ETag does not match
+            the value specified. Specify the wildcard character (*) to perform
+            the operation only if the resource does not exist, and fail the
+            operation if it does exist.
+        :param int timeout:
+            The timeout parameter is expressed in seconds. This method may make 
+            multiple calls to the Azure service and the timeout will apply to 
+            each call individually.
+        :return: A Blob with properties and metadata.
+        :rtype: :class:`~azure.storage.blob.models.Blob`
+        '''
+        _validate_not_none('container_name', container_name)
+        _validate_not_none('blob_name', blob_name)
+        _validate_not_none('file_path', file_path)
+
+        # The unallocated pages of an encrypted blob do not hold encrypted zeros
+        _validate_encryption_unsupported(self.require_encryption, self.key_encryption_key)
+
+        blob = self.get_blob_properties(
+            container_name,
+            blob_name,
+            snapshot=snapshot,
+            lease_id=lease_id,
+            if_modified_since=if_modified_since,
+            if_unmodified_since=if_unmodified_since,
+            if_match=if_match,
+            if_none_match=if_none_match,
+            timeout=timeout)
+
+        # Lock on the etag. This can be overriden by the user by specifying '*'
+        if_match = if_match if if_match is not None else blob.properties.etag
+
+        page_ranges = self._get_page_ranges_in_segments(
+            container_name,
+            blob_name,
+            blob.properties.content_length,
+            max_connections,
+            snapshot=snapshot,
+            lease_id=lease_id,
+            if_match=if_match,
+            timeout=timeout)
+
+        # Send a context object to make sure we always retry to the initial location
+        operation_context = _OperationContext(location_lock=True)
+        with open(file_path, 'wb') as stream:
+            # Extending the file without writing to it leaves the unallocated pages as holes
+            stream.truncate(blob.properties.content_length)
+
+            _download_blob_ranges(
+                self,
+                container_name,
+                blob_name,
+                snapshot,
+                page_ranges,
+                self.MAX_CHUNK_GET_SIZE,
+                stream,
+                max_connections,
+                progress_callback,
+                validate_content,
+                lease_id,
+                if_match,
+                timeout,
+                operation_context)
+
+        return blob
+
+    def backup_blob(
+            self, container_name, blob_name, backup_path, previous_snapshot=None,
+            validate_content=False, progress_callback=None, max_connections=2,
+            lease_id=None, timeout=None):
+        '''
+        Takes a snapshot of a page blob and backs it up to a local file. If a
+        previous snapshot is given, only the pages that changed since that
+        snapshot, as reported by get_page_ranges_diff, are downloaded and the
+        ranges cleared since then are recorded, so the size of the backup is
+        proportional to the changes rather than to the size of the blob. Otherwise
+        all of the valid page ranges are backed up.
+
+        The backup is restored with restore_blob_backup, applying a full backup
+        and then each incremental backup in order. Keep the snapshot of the last
+        backup to take the next incremental backup against; older snapshots may
+        be deleted once the backups that need them have been restored or merged.
+
+        :param str container_name:
+            Name of existing container.
+        :param str blob_name:
+            Name of existing blob.
+        :param str backup_path:
+            Path of the backup file to write. Any existing file is overwritten.
+        :param str previous_snapshot:
+            The snapshot of the blob taken by the previous backup. If not given,
+            a full backup is taken.
+        :param bool validate_content:
+            If set to true, validates an MD5 hash for each retrieved portion of 
+            the blob. Note that the service will only return transactional MD5s 
+            for chunks 4MB or less, so self.MAX_CHUNK_GET_SIZE must not be set to
+            greater than 4MB if this is used.
+        :param progress_callback:
+            Callback for progress with signature function(current, total) 
+            where current is the number of bytes transfered so far, and total is 
+            the number of bytes to back up.
+        :type progress_callback: func(current, total)
+        :param int max_connections:
+            Maximum number of parallel connections to use to list and download
+            the page ranges.
+        :param str lease_id:
+            Required if the blob has an active lease.
+        :param int timeout:
+            The timeout parameter is expressed in seconds. This method may make 
+            multiple calls to the Azure service and the timeout will apply to 
+            each call individually.
+        :return: A description of the backup, including the snapshot that was taken.
+        :rtype: :class:`~azure.storage.blob.models.PageBlobBackup`
+        '''
+        _validate_not_none('container_name', container_name)
+        _validate_not_none('blob_name', blob_name)
+        _validate_not_none('backup_path', backup_path)
+        _validate_encryption_unsupported(self.require_encryption, self.key_encryption_key)
+
+        snapshot = self.snapshot_blob(container_name, blob_name, lease_id=lease_id, timeout=timeout).snapshot
+        blob = self.get_blob_properties(container_name, blob_name, snapshot=snapshot, timeout=timeout)
+
+        page_ranges = self._get_page_ranges_in_segments(
+            container_name,
+            blob_name,
+            blob.properties.content_length,
+            max_connections,
+            snapshot=snapshot,
+            previous_snapshot=previous_snapshot,
+            timeout=timeout)
+
+        backup = PageBlobBackup(
+            snapshot,
+            previous_snapshot,
+            blob.properties.content_length,
+            [page_range for page_range in page_ranges if not page_range.is_cleared],
+            [page_range for page_range in page_ranges if page_range.is_cleared])
+
+        # Send a context object to make sure we always retry to the initial location
+        operation_context = _OperationContext(location_lock=True)
+        with open(backup_path, 'wb') as stream:
+            _write_page_blob_backup_header(stream, backup)
+
+            # The snapshot cannot change, so there is no need to lock on the etag
+            _download_blob_ranges(
+                self,
+                container_name,
+                blob_name,
+                snapshot,
+                backup.page_ranges,
+                self.MAX_CHUNK_GET_SIZE,
+                stream,
+                max_connections,
+                progress_callback,
+                validate_content,
+                None,
+                None,
+                timeout,
+                operation_context,
+                packed=True)
+
+        return backup
+
+    def restore_blob_backup(self, file_path, backup_path):
+        '''
+        Applies a backup taken by backup_blob to a local image of the page blob.
+        A full backup replaces the content of the image, while an incremental
+        backup writes the changed pages on top of the image of the previous
+        snapshot, zeroes the cleared pages and resizes the image to the size of
+        the blob. This is a local operation, no calls are made to the service.
+        The image can then be uploaded with create_blob_from_path. A truncated
+        backup raises a ValueError, before the image is changed if the backup
+        file is truncated when the restore starts.
+
+        :param str file_path:
+            Path of the image file to update. It is created if it does not exist.
+        :param str backup_path:
+            Path of the backup file to apply.
+        :return: A description of the backup that was applied.
+        :rtype: :class:`~azure.storage.blob.models.PageBlobBackup`
+        '''
+        _validate_not_none('file_path', file_path)
+        _validate_not_none('backup_path', backup_path)
+
+        with open(backup_path, 'rb') as backup_stream:
+            backup = _read_page_blob_backup_header(backup_stream)
+
+            # check the backup holds every page before changing the image
+            expected_length = sum(page_range.end + 1 - page_range.start for page_range in backup.page_ranges)
+            available_length = path.getsize(backup_path) - backup_stream.tell()
+            if available_length < expected_length:
+                raise ValueError(_ERROR_TRUNCATED_PAGE_BLOB_BACKUP.format(available_length, expected_length))
+
+            with open(file_path, 'r+b' if path.isfile(file_path) else 'w+b') as stream:
+                if backup.previous_snapshot is None:
+                    stream.truncate(0)
+                stream.truncate(backup.blob_size)
+
+                empty_chunk = b'\x00' * self.MAX_PAGE_SIZE
+                for page_range in backup.cleared_ranges:
+                    stream.seek(page_range.start)
+                    for chunk_start in range(page_range.start, page_range.end + 1, self.MAX_PAGE_SIZE):
+                        chunk_end = min(chunk_start + self.MAX_PAGE_SIZE, page_range.end + 1)
+                        stream.write(empty_chunk[:chunk_end - chunk_start])
+
+                read_length = 0
+                for page_range in backup.page_ranges:
+                    stream.seek(page_range.start)
+                    for chunk_start in range(page_range.start, page_range.end + 1, self.MAX_PAGE_SIZE):
+                        chunk_end = min(chunk_start + self.MAX_PAGE_SIZE, page_range.end + 1)
+                        chunk = backup_stream.read(chunk_end - chunk_start)
+                        read_length += len(chunk)
+                        # the backup may have been truncated since the check
+                        if len(chunk) < chunk_end - chunk_start:
+                            raise ValueError(_ERROR_TRUNCATED_PAGE_BLOB_BACKUP.format(read_length, expected_length))
+                        stream.write(chunk)
+
+        return backup
+
+    def _get_page_ranges_in_segments(
+            self, container_name, blob_name, blob_size, max_connections, snapshot=None,
+            previous_snapshot=None, lease_id=None, if_match=None, timeout=None):
+        '''
+        Lists the page ranges of a blob, or the ranges that differ from a previous
+        snapshot, in segments of self.MAX_PAGE_RANGES_SEGMENT_SIZE. Ranges that
+        span a segment boundary are returned split at the boundary.
+        '''
+        segments = []
+        for segment_start in range(0, blob_size, self.MAX_PAGE_RANGES_SEGMENT_SIZE):
+            segment_end = min(segment_start + self.MAX_PAGE_RANGES_SEGMENT_SIZE, blob_size) - 1
+            segments.append((segment_start, segment_end))
+
+        def get_segment_page_ranges(segment):
+            if previous_snapshot is not None:
+                page_ranges = self.get_page_ranges_diff(
+                    container_name, blob_name, previous_snapshot, snapshot=snapshot,
+                    start_range=segment[0], end_range=segment[1], lease_id=lease_id,
+                    if_match=if_match, timeout=timeout)
+            else:
+                page_ranges = self.get_page_ranges(
+                    container_name, blob_name, snapshot=snapshot,
+                    start_range=segment[0], end_range=segment[1], lease_id=lease_id,
+                    if_match=if_match, timeout=timeout)
+
+            # clip the ranges to the segment in case the service returned them whole
+            return [PageRange(max(page_range.start, segment[0]), min(page_range.end, segment[1]),
+                              page_range.is_cleared)
+                    for page_range in page_ranges]
+
+        if max_connections > 1 and len(segments) > 1:
+            segment_page_ranges = self._run_transfer(
+                _ScheduledTransfer(get_segment_page_ranges, segments, max_connections))
+        else:
+            segment_page_ranges = [get_segment_page_ranges(segment) for segment in segments]
+
+        return [page_range for page_ranges in segment_page_ranges for page_range in page_ranges]
+
     def set_sequence_number(
             self, container_name, blob_name, sequence_number_action, sequence_number=None,
             lease_id=None, if_modified_since=None, if_unmodified_since=None,
@@ -797,7 +1126,9 @@ class PageBlobService(BaseBlobService):
         '''
         Creates a new blob from a file path, or updates the content of an
         existing blob, with automatic chunking and progress notifications.
-        Empty chunks are skipped, while non-emtpy ones(even if only partly filled) are uploaded.
+        Empty pages are skipped, while non-empty ones are uploaded. If the file is
+        sparse and the platform supports SEEK_DATA and SEEK_HOLE, its holes are
+        skipped without being read.
 
         :param str container_name:
             Name of existing container.
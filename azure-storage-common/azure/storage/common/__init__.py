@@ -26,7 +26,12 @@ from .models import (
     GeoReplication,
     LocationMode,
     RetryContext,
+    CopyOperation,
+    DirectoryTransferResult,
+    PriorityMetrics,
+    RequestPriority,
 )
+from ._scheduler import RequestScheduler
 from .retry import (
     ExponentialRetry,
     LinearRetry,
@@ -0,0 +1,75 @@
+# -------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+# --------------------------------------------------------------------------
+import json
+import os
+from threading import Lock
+
+
+class _DownloadCheckpoint(object):
+    '''
+    Persists which chunks of a download are complete, so that an interrupted
+    download can be resumed. The checkpoint file holds a line with the identity
+    of the download, which includes the etag of the source, followed by a bitmap
+    with a bit per chunk. A bit is only set once the chunk is flushed to the
+    destination, and is written in place so each update is a single byte.
+    '''
+
+    def __init__(self, checkpoint_path, identity, chunk_count):
+        self.checkpoint_path = checkpoint_path
+        self.header = (json.dumps(identity, sort_keys=True) + '\n').encode('utf-8')
+        self.bitmap = bytearray((chunk_count + 7) // 8)
+        self.lock = Lock()
+        self.stream = None
+
+    def open(self, resume=True):
+        '''
+        Opens the checkpoint, loading the completed chunks of a previous attempt of
+        the same download if resume is set. A checkpoint of another download, or of
+        a source which changed since, is discarded.
+
+        :return: True if the download is resumed from the checkpoint.
+        '''
+        resumed = resume and self._load()
+        if not resumed:
+            self.bitmap = bytearray(len(self.bitmap))
+            with open(self.checkpoint_path, 'wb') as stream:
+                stream.write(self.header)
+                stream.write(bytes(self.bitmap))
+
+        self.stream = open(self.checkpoint_path, 'r+b')
+        return resumed
+
+    def _load(self):
+        try:
+            with open(self.checkpoint_path, 'rb') as stream:
+                content = stream.read()
+        except (IOError, OSError):
+            return False
+
+        if not content.startswith(self.header) or len(content) != len(self.header) + len(self.bitmap):
+            return False
+
+        self.bitmap = bytearray(content[len(self.header):])
+        return True
+
+    def is_chunk_complete(self, index):
+        return bool(self.bitmap[index // 8] & (1 << (index % 8)))
+
+    def set_chunk_complete(self, index):
+        with self.lock:
+            self.bitmap[index // 8] |= 1 << (index % 8)
+            self.stream.seek(len(self.header) + index // 8)
+            self.stream.write(bytes(self.bitmap[index // 8:index // 8 + 1]))
+            self.stream.flush()
+
+    def close(self):
+        if self.stream is not None:
+            self.stream.close()
+            self.stream = None
+
+    def delete(self):
+        self.close()
+        os.remove(self.checkpoint_path)
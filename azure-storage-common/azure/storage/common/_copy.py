@@ -0,0 +1,179 @@
+# -------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+# --------------------------------------------------------------------------
+import heapq
+import time
+from collections import deque
+
+from .models import CopyOperation
+
+
+class _CopyScheduler(object):
+    '''
+    Runs many asynchronous service side copies. At most max_pending_copies are
+    started at once, and all the pending copies are polled from a single loop at
+    intervals adapted to the progress they report, so a copy close to completion
+    is checked sooner than one which just started. Failed, aborted and stalled
+    copies are started again until max_attempts is reached. A copy which cannot
+    be polled max_attempts times in a row, or for stall_timeout, is failed. A
+    copy replaced by another copy to the same destination is superseded, and is
+    never started again so that the other copy is not overwritten.
+
+    start_copy, get_copy_properties and abort_copy are called with a
+    :class:`~azure.storage.common.models.CopyOperation` and wrap the copy
+    operations of a service.
+    '''
+
+    MIN_POLL_INTERVAL = 1
+    MAX_POLL_INTERVAL = 60
+
+    def __init__(self, start_copy, get_copy_properties, abort_copy, max_pending_copies,
+                 max_connections, max_attempts, stall_timeout):
+        self.start_copy = start_copy
+        self.get_copy_properties = get_copy_properties
+        self.abort_copy = abort_copy
+        self.max_pending_copies = max_pending_copies
+        self.max_connections = max_connections
+        self.max_attempts = max_attempts
+        self.stall_timeout = stall_timeout
+
+    def run(self, copies):
+        '''
+        Runs the copies, each given as a (copy_source, destination...) tuple, and
+        yields a CopyOperation every time the state of a copy changes.
+        '''
+        import concurrent.futures
+        executor = concurrent.futures.ThreadPoolExecutor(self.max_connections)
+
+        copies = iter(copies)
+        exhausted = False
+        restarts = deque()
+
+        # heap of (next poll time, sequence number, operation), the sequence
+        # number orders the copies due at the same time
+        pending = []
+        sequence = 0
+
+        try:
+            while True:
+                # top up the pending copies, restarting the failed ones first
+                to_start = []
+                while len(pending) + len(to_start) < self.max_pending_copies:
+                    if restarts:
+                        to_start.append(restarts.popleft())
+                    elif not exhausted:
+                        try:
+                            copy = next(copies)
+                            to_start.append(CopyOperation(copy[0], tuple(copy[1:])))
+                        except StopIteration:
+                            exhausted = True
+                    else:
+                        break
+
+                due = list(executor.map(self._start, to_start))
+
+                if pending:
+                    # sleep until the first copy is due, then poll all the due copies together
+                    time.sleep(max(pending[0][0] - time.time(), 0))
+                    now = time.time()
+                    to_poll = []
+                    while pending and pending[0][0] <= now:
+                        to_poll.append(heapq.heappop(pending)[2])
+                    due.extend(executor.map(self._poll, to_poll))
+                elif not due:
+                    break
+
+                for operation, changed in due:
+                    if operation.status == 'superseded':
+                        operation.done = True
+                    elif operation.status == 'pending':
+                        sequence += 1
+                        heapq.heappush(pending, (time.time() + operation._poll_interval, sequence, operation))
+                    elif operation.status != 'success' and operation.attempts < self.max_attempts:
+                        restarts.append(operation)
+                    else:
+                        operation.done = True
+
+                    if changed or operation.done:
+                        yield operation
+        finally:
+            executor.shutdown(wait=True)
+
+    def _start(self, operation):
+        operation.attempts += 1
+        operation.error = None
+        operation._poll_interval = self.MIN_POLL_INTERVAL
+        operation._last_progress = (0, time.time())
+        operation._poll_failures = 0
+        try:
+            operation.copy = self.start_copy(operation)
+            operation.status = operation.copy.status
+        except Exception as ex:
+            # a copy failing to start does not stop the other copies
+            operation.error = ex
+            operation.status = 'failed'
+        return operation, True
+
+    def _poll(self, operation):
+        try:
+            copy = self.get_copy_properties(operation)
+        except Exception as ex:
+            # a failure to poll is not a failure of the copy, poll again later
+            # unless the copy cannot be polled for long
+            operation.error = ex
+            operation._poll_failures += 1
+            if operation._poll_failures >= self.max_attempts or (
+                    self.stall_timeout is not None and
+                    time.time() - operation._last_progress[1] > self.stall_timeout):
+                operation.status = 'failed'
+                return operation, True
+            operation._poll_interval = min(operation._poll_interval * 2, self.MAX_POLL_INTERVAL)
+            return operation, False
+
+        operation._poll_failures = 0
+
+        # another copy was started to the same destination, which must not be overwritten
+        if copy.id != operation.copy.id:
+            operation.copy = copy
+            operation.status = 'superseded'
+            operation.error = None
+            return operation, True
+
+        changed = copy.status != operation.status or copy.progress != operation.copy.progress
+        operation.copy = copy
+        operation.status = copy.status
+        operation.error = None
+
+        if operation.status == 'pending':
+            self._update_poll_interval(operation)
+
+        if operation.status == 'pending' and self.stall_timeout is not None and \
+                time.time() - operation._last_progress[1] > self.stall_timeout:
+            try:
+                self.abort_copy(operation)
+            except Exception as ex:
+                operation.error = ex
+            operation.status = 'aborted'
+            changed = True
+
+        return operation, changed
+
+    def _update_poll_interval(self, operation):
+        try:
+            copied, total = [int(value) for value in operation.copy.progress.split('/')]
+        except (AttributeError, ValueError):
+            copied, total = 0, 0
+
+        now = time.time()
+        last_copied, last_time = operation._last_progress
+        if copied > last_copied:
+            # poll again about halfway through the estimated remaining time
+            rate = (copied - last_copied) / max(now - last_time, 0.001)
+            interval = (total - copied) / rate / 2
+            operation._last_progress = (copied, now)
+        else:
+            interval = operation._poll_interval * 2
+
+        operation._poll_interval = min(max(interval, self.MIN_POLL_INTERVAL), self.MAX_POLL_INTERVAL)
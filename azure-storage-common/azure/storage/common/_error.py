@@ -55,6 +55,10 @@ _ERROR_RANGE_TOO_LARGE_FOR_MD5 = \
     'is not supported.'
 _ERROR_MD5_MISMATCH = \
     'MD5 mismatch. Expected value is \'{0}\', computed value is \'{1}\'.'
+_ERROR_SOURCE_MODIFIED = \
+    'The source was modified during the download. Expected ETag is \'{0}\', received ETag is \'{1}\'.'
+_ERROR_PATH_OUTSIDE_DIRECTORY = \
+    'The name \'{0}\' resolves to a path outside of the destination directory.'
 _ERROR_TOO_MANY_ACCESS_POLICIES = \
     'Too many access policies provided. The server does not support setting more than 5 access policies on a single resource.'
 _ERROR_OBJECT_INVALID = \
@@ -0,0 +1,364 @@
+# -------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+# --------------------------------------------------------------------------
+import copy
+import threading
+import time
+
+from .models import (
+    PriorityMetrics,
+    RequestPriority,
+)
+
+# the rank of each priority, lower ranks are served first
+_PRIORITY_RANKS = {
+    RequestPriority.INTERACTIVE: 0,
+    RequestPriority.NORMAL: 1,
+    RequestPriority.BULK: 2,
+}
+
+
+class _ScheduledTransfer(object):
+    '''
+    The chunks of a transfer run by a _TransferScheduler. The chunks are pulled
+    from the items iterator one at a time, when a worker is about to process
+    them, so at most max_connections chunks are buffered, and an iterator reading
+    the chunks from a stream is never advanced by two workers at once.
+    '''
+
+    def __init__(self, process, items, max_connections, priority=RequestPriority.NORMAL):
+        self.process = process
+        self.items = iter(items)
+        self.max_connections = max_connections
+        self.priority = priority
+
+        # when the transfer last started waiting for a worker
+        self.waiting_since = time.time()
+
+        # guards the items iterator
+        self.lock = threading.Lock()
+        self.next_index = 0
+        self.exhausted = False
+
+        # updated by the scheduler, under its condition
+        self.in_flight = 0
+        self.results = {}
+        self.error = None
+        self.done = threading.Event()
+
+    def is_runnable(self):
+        return not self.exhausted and self.error is None and self.in_flight < self.max_connections
+
+    def next_item(self):
+        '''
+        Gets the (index, item) of the next chunk, or None once there are no more.
+        '''
+        with self.lock:
+            if self.exhausted or self.error is not None:
+                return None
+            try:
+                item = next(self.items)
+            except StopIteration:
+                self.exhausted = True
+                return None
+            index = self.next_index
+            self.next_index += 1
+            return index, item
+
+    def on_complete(self, item):
+        '''
+        Called by the worker which processed item, before the next chunk is picked.
+        '''
+        pass
+
+
+def _get_deadline(priority, waiting_since, aging_interval):
+    # a request or transfer waiting for aging_interval seconds is served before
+    # those of the class above it which just started waiting, so waiting lowers
+    # the rank and no class starves, and the order only changes on arrival
+    return waiting_since + _PRIORITY_RANKS.get(priority, 1) * aging_interval
+
+
+class _DelayMetrics(object):
+    '''
+    Accumulates the queueing delays of each priority class.
+    '''
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.metrics = dict((priority, PriorityMetrics(priority)) for priority in _PRIORITY_RANKS)
+
+    def record_request(self, priority, delay):
+        with self.lock:
+            metrics = self.metrics[priority]
+            metrics.requests += 1
+            metrics.total_request_delay += delay
+            metrics.max_request_delay = max(metrics.max_request_delay, delay)
+
+    def record_chunk(self, priority, delay):
+        with self.lock:
+            metrics = self.metrics[priority]
+            metrics.chunks += 1
+            metrics.total_chunk_delay += delay
+            metrics.max_chunk_delay = max(metrics.max_chunk_delay, delay)
+
+    def update_waiting(self, priority, change):
+        with self.lock:
+            self.metrics[priority].waiting_requests += change
+
+    def get_metrics(self):
+        with self.lock:
+            return dict((priority, copy.copy(metrics)) for priority, metrics in self.metrics.items())
+
+
+class _TransferScheduler(object):
+    '''
+    Runs the chunks of all the concurrent transfers of a service on a single pool
+    of worker threads, instead of a new pool per transfer. At most max_workers
+    chunks are in flight over all the transfers, and at most max_connections of
+    each transfer. The workers take turns between the transfers which can run
+    another chunk, so concurrent transfers of a priority get an even share of the
+    workers whatever the order they started in. Transfers of a higher priority
+    are served first, unless a transfer of a lower priority has waited for a
+    worker for longer than aging_interval seconds per class between them.
+
+    Workers are started as the transfers need them, and exit after IDLE_TIMEOUT
+    seconds without work. A transfer run from a worker, which could otherwise
+    wait on workers which are all waiting on it, has its chunks processed by the
+    calling worker, helped by the workers which are free.
+    '''
+
+    IDLE_TIMEOUT = 60
+
+    def __init__(self, aging_interval=1, metrics=None):
+        self.aging_interval = aging_interval
+        self.metrics = metrics
+        self.condition = threading.Condition()
+        self.transfers = []
+        self.max_workers = 1
+        self.workers = 0
+        self.idle_workers = 0
+        self.in_flight = 0
+        self.local = threading.local()
+
+    def run(self, transfer, max_workers):
+        '''
+        Runs the chunks of a _ScheduledTransfer, and returns their results in order.
+        The first error raised by a chunk is raised once the chunks in flight are
+        done, and no more chunks are started after it.
+        '''
+        is_worker = getattr(self.local, 'is_worker', False)
+        with self.condition:
+            self.max_workers = max_workers
+            transfer.waiting_since = time.time()
+            self.transfers.append(transfer)
+            # a calling worker processes chunks itself
+            new_workers = min(transfer.max_connections - (1 if is_worker else 0) - self.idle_workers,
+                              max_workers - self.workers)
+            for _ in range(max(new_workers, 0)):
+                self._start_worker()
+            self.condition.notify_all()
+
+        if is_worker:
+            self._work_on(transfer)
+        transfer.done.wait()
+        if transfer.error is not None:
+            raise transfer.error
+        return [transfer.results[index] for index in range(len(transfer.results))]
+
+    def _work_on(self, transfer):
+        '''
+        Processes the chunks of a transfer on the calling worker until none are
+        left, then waits for those in flight on the other workers.
+        '''
+        self.condition.acquire()
+        try:
+            while not transfer.exhausted and transfer.error is None:
+                if transfer.in_flight >= transfer.max_connections:
+                    # the other workers hold all the connections of the transfer
+                    self.condition.wait()
+                    continue
+
+                transfer.in_flight += 1
+                self.condition.release()
+                try:
+                    self._process_next(transfer)
+                finally:
+                    self.condition.acquire()
+                    transfer.in_flight -= 1
+                    self.condition.notify_all()
+        finally:
+            while transfer.in_flight > 0:
+                self.condition.wait()
+            if not transfer.done.is_set():
+                self.transfers.remove(transfer)
+                transfer.done.set()
+            self.condition.release()
+
+    def _start_worker(self):
+        self.workers += 1
+        worker = threading.Thread(target=self._work)
+        worker.daemon = True
+        worker.start()
+
+    def _next_transfer(self):
+        # the transfer served waits again from now, so the transfers of a priority
+        # are served round robin
+        if self.in_flight >= self.max_workers:
+            return None
+        runnable = [transfer for transfer in self.transfers if transfer.is_runnable()]
+        if not runnable:
+            return None
+
+        transfer = min(runnable, key=lambda transfer: _get_deadline(
+            transfer.priority, transfer.waiting_since, self.aging_interval))
+        now = time.time()
+        if self.metrics is not None:
+            self.metrics.record_chunk(transfer.priority, now - transfer.waiting_since)
+        transfer.waiting_since = now
+        return transfer
+
+    def _work(self):
+        self.local.is_worker = True
+        self.condition.acquire()
+        try:
+            idle_since = time.time()
+            while self.workers <= self.max_workers:
+                transfer = self._next_transfer()
+                if transfer is None:
+                    if time.time() - idle_since >= self.IDLE_TIMEOUT:
+                        break
+                    self.idle_workers += 1
+                    self.condition.wait(self.IDLE_TIMEOUT)
+                    self.idle_workers -= 1
+                    continue
+
+                transfer.in_flight += 1
+                self.in_flight += 1
+                self.condition.release()
+                try:
+                    self._process_next(transfer)
+                finally:
+                    self.condition.acquire()
+                    if transfer.in_flight >= transfer.max_connections:
+                        # the transfer could not run another chunk until now
+                        transfer.waiting_since = time.time()
+                    transfer.in_flight -= 1
+                    self.in_flight -= 1
+                    if (transfer.exhausted or transfer.error is not None) and transfer.in_flight == 0 and \
+                            not transfer.done.is_set():
+                        self.transfers.remove(transfer)
+                        transfer.done.set()
+                    elif self.idle_workers == 0 and self.workers < self.max_workers and \
+                            transfer.in_flight + 1 < transfer.max_connections:
+                        # the transfer was allowed more connections than it started with
+                        self._start_worker()
+                    self.condition.notify_all()
+                idle_since = time.time()
+        finally:
+            self.workers -= 1
+            self.condition.release()
+
+    def _process_next(self, transfer):
+        try:
+            next_item = transfer.next_item()
+            if next_item is not None:
+                index, item = next_item
+                result = transfer.process(item)
+                transfer.on_complete(item)
+                with self.condition:
+                    transfer.results[index] = result
+        except BaseException as ex:
+            # the error is recorded before anything else can be raised, so that the
+            # transfer is concluded even if this worker exits
+            with self.condition:
+                if transfer.error is None:
+                    transfer.error = ex
+            if not isinstance(ex, Exception):
+                raise
+
+
+class RequestScheduler(object):
+    '''
+    Schedules the requests and chunked transfers of the service objects it is set
+    on as their request_scheduler, by the priority of each service object, so
+    that interactive requests are not held up behind bulk transfers run from the
+    same process. Service objects sharing a request scheduler share its limits,
+    and may share the same request_session.
+
+    At most max_requests requests are sent at once. Requests waiting to be sent
+    are sent highest priority first, and within a priority in the order they
+    arrived. So that a lower priority is not starved, a request which has waited
+    for AGING_INTERVAL seconds is sent before those of the priority just above
+    it which arrived since, and similarly for each class between them.
+
+    The chunks of the parallel transfers of these service objects run on a pool
+    of at most max_transfer_connections threads shared by the service objects,
+    instead of the pool of each service object, and the threads are assigned to
+    the transfers by priority in the same way.
+
+    :ivar int max_requests:
+        The maximum number of requests sent at once.
+    :ivar int max_transfer_connections:
+        The maximum number of chunks of parallel transfers in flight at once.
+    '''
+
+    AGING_INTERVAL = 1
+
+    def __init__(self, max_requests=32, max_transfer_connections=64):
+        '''
+        :param int max_requests:
+            The maximum number of requests sent at once.
+        :param int max_transfer_connections:
+            The maximum number of chunks of parallel transfers in flight at once.
+        '''
+        self.max_requests = max_requests
+        self.max_transfer_connections = max_transfer_connections
+        self._metrics = _DelayMetrics()
+        self._condition = threading.Condition()
+        self._waiting = []
+        self._in_flight = 0
+        self._sequence = 0
+        self._transfer_scheduler = _TransferScheduler(self.AGING_INTERVAL, self._metrics)
+
+    def get_metrics(self):
+        '''
+        Gets the number of requests and transfer chunks of each priority, and how
+        long they waited before being sent.
+
+        :return: The metrics of each priority, by priority.
+        :rtype: dict(str, :class:`~azure.storage.common.models.PriorityMetrics`)
+        '''
+        metrics = self._metrics.get_metrics()
+        for priority_metrics in metrics.values():
+            if priority_metrics.requests:
+                priority_metrics.mean_request_delay = priority_metrics.total_request_delay / priority_metrics.requests
+            if priority_metrics.chunks:
+                priority_metrics.mean_chunk_delay = priority_metrics.total_chunk_delay / priority_metrics.chunks
+        return metrics
+
+    def _acquire(self, priority):
+        arrival = time.time()
+        with self._condition:
+            self._sequence += 1
+            entry = (_get_deadline(priority, arrival, self.AGING_INTERVAL), self._sequence)
+            self._waiting.append(entry)
+            self._metrics.update_waiting(priority, 1)
+            try:
+                while self._in_flight >= self.max_requests or min(self._waiting) != entry:
+                    self._condition.wait()
+            finally:
+                self._waiting.remove(entry)
+                self._metrics.update_waiting(priority, -1)
+                # the next request in line may be able to go
+                self._condition.notify_all()
+            self._in_flight += 1
+
+        self._metrics.record_request(priority, time.time() - arrival)
+
+    def _release(self):
+        with self._condition:
+            self._in_flight -= 1
+            self._condition.notify_all()
@@ -0,0 +1,240 @@
+# -------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+# --------------------------------------------------------------------------
+import calendar
+import os
+import sys
+import time
+from threading import (
+    Condition,
+    Lock,
+    Thread,
+    local,
+)
+
+if sys.version_info >= (3,):
+    from queue import Queue
+else:
+    from Queue import Queue
+
+from ._error import _ERROR_PATH_OUTSIDE_DIRECTORY
+from .models import DirectoryTransferResult
+
+# the _TransferPool of the directory transfer the current thread belongs to, if any
+_pool_local = local()
+
+
+def _walk_files(directory_path):
+    '''
+    Lazily yields the (file_path, relative_path) of the files under directory_path,
+    the relative path using '/' as separator whatever the platform.
+    '''
+    for root, _, file_names in os.walk(directory_path):
+        relative_root = os.path.relpath(root, directory_path)
+        for file_name in sorted(file_names):
+            relative_path = file_name if relative_root == os.curdir else os.path.join(relative_root, file_name)
+            yield os.path.join(root, file_name), relative_path.replace(os.sep, '/')
+
+
+def _get_local_path(directory_path, relative_path):
+    '''
+    Gets the local path of a file named relative_path, using '/' as separator,
+    making sure that a name such as '../file' cannot escape directory_path.
+    '''
+    directory_path = os.path.abspath(directory_path)
+    file_path = os.path.abspath(os.path.join(directory_path, *relative_path.split('/')))
+    if not file_path.startswith(os.path.join(directory_path, '')):
+        raise ValueError(_ERROR_PATH_OUTSIDE_DIRECTORY.format(relative_path))
+    return file_path
+
+
+def _make_parent_directories(file_path):
+    _make_directories(os.path.dirname(file_path))
+
+
+def _make_directories(directory_path):
+    try:
+        os.makedirs(directory_path)
+    except OSError:
+        # another thread may have created the directory in the meantime
+        if not os.path.isdir(directory_path):
+            raise
+
+
+def _is_local_file_unchanged(file_path, size, last_modified, padding_block_size=None):
+    '''
+    Whether the local file has the given size and its modification time matches
+    the last modified datetime of the remote resource, as set by _set_local_file_time.
+    If padding_block_size is given, size is that of the remote content, which is
+    the local content padded with PKCS7 to a multiple of padding_block_size, as for
+    a client side encrypted blob.
+    '''
+    try:
+        local_size = os.path.getsize(file_path)
+        if padding_block_size is not None:
+            local_size += padding_block_size - local_size % padding_block_size
+        return local_size == size and \
+            int(os.path.getmtime(file_path)) == calendar.timegm(last_modified.utctimetuple())
+    except OSError:
+        return False
+
+
+def _set_local_file_time(file_path, last_modified):
+    timestamp = calendar.timegm(last_modified.utctimetuple())
+    os.utime(file_path, (timestamp, timestamp))
+
+
+def _prefetch(iterable, max_items):
+    '''
+    Iterates over iterable from a separate thread, keeping up to max_items ahead of
+    the consumer, so that for instance the next page of a listing is fetched while
+    the items of the current page are processed. An error raised by the iteration
+    is raised again to the consumer.
+    '''
+    items = Queue(max_items)
+    end = object()
+
+    def produce():
+        try:
+            for item in iterable:
+                items.put((item, None))
+            items.put((end, None))
+        except Exception as ex:
+            items.put((end, ex))
+
+    producer = Thread(target=produce)
+    producer.daemon = True
+    producer.start()
+
+    while True:
+        item, error = items.get()
+        if error is not None:
+            raise error
+        if item is end:
+            return
+        yield item
+
+
+def _get_transfer_pool():
+    '''
+    Gets the _TransferPool of the directory transfer running on the current thread,
+    on which the parallel transfers of the large files of the directory are run.
+    '''
+    return getattr(_pool_local, 'pool', None)
+
+
+class _TransferPool(object):
+    '''
+    The threads of a directory transfer, which transfer a file each and also run
+    the chunks of the large files. The thread transferring a large file processes
+    its chunks itself, and the threads which become idle help with them, so a
+    large file is transferred in parallel while the whole directory never has
+    more than max_connections requests in flight.
+    '''
+
+    def __init__(self, max_connections):
+        import concurrent.futures
+        self.max_connections = max_connections
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_connections)
+        self.condition = Condition()
+
+    def run(self, transfer):
+        '''
+        Runs the chunks of a _ScheduledTransfer, and returns their results in order.
+        The first error raised by a chunk is raised once the chunks in flight are done.
+        '''
+        for _ in range(min(transfer.max_connections, self.max_connections) - 1):
+            self.executor.submit(self._process_chunks, transfer)
+        self._process_chunks(transfer)
+
+        # wait for the chunks the other threads are still processing
+        with self.condition:
+            while transfer.in_flight:
+                self.condition.wait()
+
+        if transfer.error is not None:
+            raise transfer.error
+        return [transfer.results[index] for index in range(len(transfer.results))]
+
+    def _process_chunks(self, transfer):
+        # a thread which helps once the chunks are exhausted finds none left and returns
+        while True:
+            with self.condition:
+                transfer.in_flight += 1
+            try:
+                next_item = transfer.next_item()
+                if next_item is None:
+                    return
+                index, item = next_item
+                result = transfer.process(item)
+                transfer.on_complete(item)
+                with self.condition:
+                    transfer.results[index] = result
+            except Exception as ex:
+                with self.condition:
+                    if transfer.error is None:
+                        transfer.error = ex
+            finally:
+                with self.condition:
+                    transfer.in_flight -= 1
+                    self.condition.notify_all()
+
+
+def _transfer_files(transfer, tasks, max_connections, progress_callback):
+    '''
+    Runs transfer(task) for each (name, task) of tasks on a _TransferPool of
+    max_connections threads. The tasks are consumed lazily, so that at most a few
+    tasks per thread are pending at any time, which lets the tasks be produced
+    while the transfers run, for instance by listing or walking a tree.
+
+    transfer returns the number of bytes transferred, or None if the task was
+    skipped. An error does not stop the other transfers, it is recorded with the
+    name of the task in the returned DirectoryTransferResult.
+    '''
+    import concurrent.futures
+    pool = _TransferPool(max_connections)
+    executor = pool.executor
+
+    result = DirectoryTransferResult()
+    result_lock = Lock()
+    start_time = time.time()
+
+    def run(name, task):
+        _pool_local.pool = pool
+        try:
+            count = transfer(task)
+            error = None
+        except Exception as ex:
+            count, error = None, ex
+
+        with result_lock:
+            if error is not None:
+                result.failures.append((name, error))
+            elif count is None:
+                result.skipped_files += 1
+            else:
+                result.files += 1
+                result.bytes += count
+            _update_elapsed(result, start_time)
+            if progress_callback is not None:
+                progress_callback(result)
+
+    futures = set()
+    try:
+        for name, task in tasks:
+            if len(futures) >= 2 * max_connections:
+                _, futures = concurrent.futures.wait(futures, return_when=concurrent.futures.FIRST_COMPLETED)
+            futures.add(executor.submit(run, name, task))
+        concurrent.futures.wait(futures)
+    finally:
+        executor.shutdown(wait=True)
+
+    _update_elapsed(result, start_time)
+    return result
+
+
+def _update_elapsed(result, start_time):
+    result.elapsed = time.time() - start_time
+    result.throughput = result.bytes / result.elapsed if result.elapsed else 0.0
@@ -0,0 +1,188 @@
+# -------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+# --------------------------------------------------------------------------
+import time
+from collections import deque
+from threading import (
+    Condition,
+    Lock,
+)
+
+from ._scheduler import _ScheduledTransfer
+
+
+class _TransferTuner(object):
+    '''
+    Picks the chunk size and the number of connections of chunked transfers from
+    the throughput and latency measured on the requests of the chunks, so that
+    the tuning carries over from a transfer to the next one of the same service.
+
+    The chunk size is chosen so that a request lasts TARGET_REQUEST_TIME seconds,
+    or LATENCY_RATIO times the latency of the requests if that is longer, which
+    keeps the latency under a ninth of the time of each request, so the bandwidth
+    delay product of the connections is filled. The number of connections is
+    adjusted by hill climbing on the throughput of the whole transfer.
+    '''
+
+    TARGET_REQUEST_TIME = 1
+    LATENCY_RATIO = 8
+    ALIGNMENT = 256 * 1024
+    MAX_CHUNK_SIZE = 100 * 1024 * 1024
+    MAX_SAMPLES = 32
+
+    def __init__(self):
+        self.lock = Lock()
+        self.samples = deque(maxlen=self.MAX_SAMPLES)
+
+        # the number of connections the last transfer ended with
+        self.connections = None
+
+    def record(self, size, elapsed):
+        '''
+        Records the size and duration of a chunk request.
+        '''
+        if size > 0 and elapsed > 0:
+            with self.lock:
+                self.samples.append((size, elapsed))
+
+    def get_estimates(self):
+        '''
+        Estimates the bandwidth of a connection, in bytes per second, and the
+        latency of a request, in seconds, or returns None without measurements.
+        The fastest request is assumed to be the least slowed down by latency, and
+        the latency is the median of the time each request took beyond the time
+        that bandwidth implies.
+        '''
+        with self.lock:
+            samples = list(self.samples)
+        if not samples:
+            return None
+
+        bandwidth = max(size / elapsed for size, elapsed in samples)
+        latencies = sorted(elapsed - size / bandwidth for size, elapsed in samples)
+        return bandwidth, latencies[len(latencies) // 2]
+
+    def get_chunk_size(self, chunk_size, min_chunk_size=None, max_chunk_size=None):
+        '''
+        Gets the size of the next chunk, chunk_size until requests are measured,
+        and a multiple of ALIGNMENT after. The size is always at least
+        min_chunk_size and at most max_chunk_size, which defaults to MAX_CHUNK_SIZE.
+        '''
+        estimates = self.get_estimates()
+        if estimates is not None:
+            bandwidth, latency = estimates
+            request_time = max(self.TARGET_REQUEST_TIME, self.LATENCY_RATIO * latency)
+            chunk_size = max(int(bandwidth * request_time) // self.ALIGNMENT, 1) * self.ALIGNMENT
+
+        return min(max(chunk_size, min_chunk_size or 0), max_chunk_size or self.MAX_CHUNK_SIZE)
+
+
+class _TunedTransfer(_ScheduledTransfer):
+    '''
+    The chunks of a transfer run by a _TransferScheduler with as many chunks in
+    flight as the current number of connections. The chunks are pulled lazily, so
+    a chunk generator can size each chunk from the measurements of the chunks
+    before it. The number of connections starts where the previous transfer
+    ended, or at max_connections, and every time as many chunks as connections
+    complete, is raised by one while that raises the throughput of the transfer,
+    and lowered when it does not. It never exceeds max_connections.
+    '''
+
+    def __init__(self, process, chunks, get_size, max_connections, tuner):
+        self.tuner = tuner
+        self.get_size = get_size
+        self.connection_limit = max_connections
+        super(_TunedTransfer, self).__init__(
+            process, chunks, min(tuner.connections or max_connections, self.connection_limit))
+
+        self.tuning_lock = Lock()
+        self.step = 1
+        self.previous_throughput = None
+        self.interval_start = time.time()
+        self.interval_bytes = 0
+        self.interval_chunks = 0
+
+    def on_complete(self, chunk):
+        with self.tuning_lock:
+            self.interval_bytes += self.get_size(chunk)
+            self.interval_chunks += 1
+            if self.interval_chunks < self.max_connections:
+                return
+
+            now = time.time()
+            throughput = self.interval_bytes / max(now - self.interval_start, 0.001)
+            if self.previous_throughput is not None and throughput < self.previous_throughput:
+                # the last change did not help, undo it and try the other direction next
+                self.step = -self.step
+            self.max_connections = min(max(self.max_connections + self.step, 1), self.connection_limit)
+            self.tuner.connections = self.max_connections
+
+            self.previous_throughput = throughput
+            self.interval_start = now
+            self.interval_bytes = 0
+            self.interval_chunks = 0
+
+
+def _timed(tuner, size, request):
+    '''
+    Calls request, recording its duration for size bytes with the tuner if any.
+    '''
+    if tuner is None:
+        return request()
+
+    start = time.time()
+    result = request()
+    tuner.record(size, time.time() - start)
+    return result
+
+
+class _AdaptiveConcurrency(object):
+    '''
+    Bounds the number of requests in flight, for requests which may be rejected
+    because the service is busy. The bound starts at max_concurrency, is halved
+    when a request is rejected, and raised by one every time as many requests as
+    the bound succeed, up to max_concurrency. Only the first rejection of the
+    requests started under the same bound lowers it, as the requests in flight
+    when the service became busy are all likely to be rejected.
+    '''
+
+    def __init__(self, max_concurrency):
+        self.max_concurrency = max_concurrency
+        self.limit = max_concurrency
+        self.in_flight = 0
+        self.successes = 0
+        self.generation = 0
+        self.condition = Condition()
+
+    def acquire(self):
+        '''
+        Waits until a request can be sent, and returns the generation of the bound
+        it was sent under, to pass to release.
+        '''
+        with self.condition:
+            while self.in_flight >= self.limit:
+                self.condition.wait()
+            self.in_flight += 1
+            return self.generation
+
+    def release(self, generation, busy=False):
+        '''
+        Records the end of a request, and whether it was rejected as the service
+        was busy.
+        '''
+        with self.condition:
+            self.in_flight -= 1
+            if busy:
+                if generation == self.generation:
+                    self.limit = max(self.limit // 2, 1)
+                    self.successes = 0
+                    self.generation += 1
+            else:
+                self.successes += 1
+                if self.successes >= self.limit and self.limit < self.max_concurrency:
+                    self.limit += 1
+                    self.successes = 0
+                    self.generation += 1
+            self.condition.notify_all()
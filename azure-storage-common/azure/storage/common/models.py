@@ -135,6 +135,131 @@ class RetryContext(object):
         self.body_position = None
 
 
+class CopyOperation(object):
+    '''
+    The state of one of the copies run by copy_blobs or copy_files. The same
+    object is updated in place and yielded again every time the copy changes.
+
+    :ivar str copy_source:
+        The URL of the source of the copy.
+    :ivar tuple destination:
+        The names identifying the destination, such as (container_name, blob_name)
+        for a blob or (share_name, directory_name, file_name) for a file.
+    :ivar str status:
+        The state of the copy: pending, success, aborted, failed or superseded. A
+        copy which could not be started or polled is failed. A copy is superseded
+        when another copy to the same destination replaced it, and is then not
+        attempted again.
+    :ivar copy:
+        The copy properties reported by the service for the last attempt, or None
+        if the copy could not be started.
+    :vartype copy: :class:`~azure.storage.blob.models.CopyProperties` or
+        :class:`~azure.storage.file.models.CopyProperties`
+    :ivar int attempts:
+        The number of times the copy was started.
+    :ivar Exception error:
+        The error raised by the last request for this copy, if any.
+    :ivar bool done:
+        Whether the copy is concluded. A concluded copy which did not succeed
+        will not be attempted again.
+    '''
+
+    def __init__(self, copy_source=None, destination=None):
+        self.copy_source = copy_source
+        self.destination = destination
+        self.status = None
+        self.copy = None
+        self.attempts = 0
+        self.error = None
+        self.done = False
+
+
+class DirectoryTransferResult(object):
+    '''
+    The outcome of a transfer of many files, such as upload_directory. A file
+    which fails does not stop the transfer, its error is reported in failures.
+
+    :ivar int files:
+        The number of files transferred.
+    :ivar int bytes:
+        The number of bytes transferred.
+    :ivar int skipped_files:
+        The number of files which did not need to be transferred.
+    :ivar failures:
+        The files which could not be transferred, with the error raised.
+    :vartype failures: list(tuple(str, Exception))
+    :ivar float elapsed:
+        The duration of the transfer so far, in seconds.
+    :ivar float throughput:
+        The average number of bytes transferred per second.
+    '''
+
+    def __init__(self):
+        self.files = 0
+        self.bytes = 0
+        self.skipped_files = 0
+        self.failures = []
+        self.elapsed = 0.0
+        self.throughput = 0.0
+
+
+class PriorityMetrics(object):
+    '''
+    How long the requests and transfer chunks of a priority waited before being
+    sent, as reported by a :class:`~azure.storage.common.RequestScheduler`.
+
+    :ivar str priority:
+        The priority, one of :class:`~azure.storage.common.models.RequestPriority`.
+    :ivar int requests:
+        The number of requests sent.
+    :ivar int waiting_requests:
+        The number of requests waiting to be sent.
+    :ivar float total_request_delay:
+        The time the requests sent waited for, in seconds.
+    :ivar float mean_request_delay:
+        The average time a request waited for, in seconds.
+    :ivar float max_request_delay:
+        The longest time a request waited for, in seconds.
+    :ivar int chunks:
+        The number of chunks of parallel transfers started.
+    :ivar float total_chunk_delay:
+        The time transfers waited for a thread to start these chunks, in seconds.
+    :ivar float mean_chunk_delay:
+        The average time a transfer waited for a thread to start a chunk, in seconds.
+    :ivar float max_chunk_delay:
+        The longest time a transfer waited for a thread to start a chunk, in seconds.
+    '''
+
+    def __init__(self, priority=None):
+        self.priority = priority
+        self.requests = 0
+        self.waiting_requests = 0
+        self.total_request_delay = 0.0
+        self.mean_request_delay = 0.0
+        self.max_request_delay = 0.0
+        self.chunks = 0
+        self.total_chunk_delay = 0.0
+        self.mean_chunk_delay = 0.0
+        self.max_chunk_delay = 0.0
+
+
+class RequestPriority(object):
+    '''
+    Specifies the priority of the requests of a service object, which only
+    applies if a :class:`~azure.storage.common.RequestScheduler` is set as its
+    request_scheduler.
+    '''
+
+    INTERACTIVE = 'interactive'
+    ''' Requests a user is waiting on, sent first. '''
+
+    NORMAL = 'normal'
+    ''' The default priority. '''
+
+    BULK = 'bulk'
+    ''' Background requests such as large transfers, sent last. '''
+
+
 class LocationMode(object):
     '''
     Specifies the location the request should be sent to. This mode only applies 
@@ -37,6 +37,7 @@ from ._serialization import (
 from .models import (
     RetryContext,
     LocationMode,
+    RequestPriority,
     _OperationContext,
 )
 from .retry import ExponentialRetry
@@ -95,6 +96,13 @@ class StorageClient(object):
         A function called immediately after retry evaluation is performed. This 
         function takes as a parameter the retry context object and returns nothing. 
         It may be used to detect retries and log context information.
+    :ivar ~azure.storage.common.RequestScheduler request_scheduler:
+        The scheduler which limits the requests sent at once by this and the other
+        service objects it is set on, sending the requests of a higher priority
+        first. Defaults to None, in which case requests are sent right away.
+    :ivar ~azure.storage.common.models.RequestPriority priority:
+        The priority of the requests and parallel transfers of this service object
+        when a request_scheduler is set. Defaults to RequestPriority.NORMAL.
     '''
 
     __metaclass__ = ABCMeta
@@ -127,6 +135,8 @@ class StorageClient(object):
         self.request_callback = None
         self.response_callback = None
         self.retry_callback = None
+        self.request_scheduler = None
+        self.priority = RequestPriority.NORMAL
         self._X_MS_VERSION = DEFAULT_X_MS_VERSION
         self._USER_AGENT_STRING = DEFAULT_USER_AGENT_STRING
 
@@ -265,8 +275,15 @@ class StorageClient(object):
                                 request.query,
                                 str(request.headers).replace('\n', ''))
 
-                    # Perform the request
-                    response = self._httpclient.perform_request(request)
+                    # Perform the request, once the request scheduler lets it go if there is one
+                    request_scheduler = self.request_scheduler
+                    if request_scheduler is not None:
+                        request_scheduler._acquire(self.priority)
+                    try:
+                        response = self._httpclient.perform_request(request)
+                    finally:
+                        if request_scheduler is not None:
+                            request_scheduler._release()
 
                     # Execute the response callback
                     if self.response_callback:
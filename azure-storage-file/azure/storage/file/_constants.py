@@ -9,3 +9,6 @@ __version__ = '1.3.1'
 
 # x-ms-version for storage service.
 X_MS_VERSION = '2018-03-28'
+
+# internal configurations, should not be changed
+_MAX_RANGE_MD5_SIZE = 4 * 1024 * 1024
@@ -5,13 +5,28 @@
 # --------------------------------------------------------------------------
 import threading
 
+from azure.common import AzureException
+
+from azure.storage.common._error import _ERROR_SOURCE_MODIFIED
+from azure.storage.common._scheduler import _ScheduledTransfer
+from azure.storage.common._tuning import (
+    _TunedTransfer,
+    _timed,
+)
+from ._constants import _MAX_RANGE_MD5_SIZE
+
 
 def _download_file_chunks(file_service, share_name, directory_name, file_name,
                           download_size, block_size, progress, start_range, end_range,
                           stream, max_connections, progress_callback, validate_content,
-                          timeout, operation_context, snapshot):
+                          timeout, operation_context, snapshot, checkpoint=None, etag=None, tuner=None):
 
-    downloader_class = _ParallelFileChunkDownloader if max_connections > 1 else _SequentialFileChunkDownloader
+    # a checkpointed download writes each chunk at its offset of the stream
+    # even with a single connection, as the completed chunks are skipped
+    if max_connections > 1 or checkpoint is not None:
+        downloader_class = _ParallelFileChunkDownloader
+    else:
+        downloader_class = _SequentialFileChunkDownloader
 
     downloader = downloader_class(
         file_service,
@@ -31,13 +46,26 @@ def _download_file_chunks(file_service, share_name, directory_name, file_name,
         snapshot,
     )
 
+    downloader.checkpoint = checkpoint
+    downloader.etag = etag
+
+    # the chunks of a checkpointed download must keep the size they are recorded with
+    if tuner is not None and checkpoint is None:
+        downloader.tuner = tuner
+        process, chunks = downloader.process_range, downloader.get_tuned_chunk_ranges()
+    else:
+        process, chunks = downloader.process_chunk, downloader.get_chunk_offsets()
+
     if max_connections > 1:
-        import concurrent.futures
-        executor = concurrent.futures.ThreadPoolExecutor(max_connections)
-        list(executor.map(downloader.process_chunk, downloader.get_chunk_offsets()))
+        if downloader.tuner is not None:
+            transfer = _TunedTransfer(process, chunks, lambda chunk_range: chunk_range[1] - chunk_range[0],
+                                      max_connections, tuner)
+        else:
+            transfer = _ScheduledTransfer(process, chunks, max_connections)
+        file_service._run_transfer(transfer)
     else:
-        for chunk in downloader.get_chunk_offsets():
-            downloader.process_chunk(chunk)
+        for chunk in chunks:
+            process(chunk)
 
 
 class _FileChunkDownloader(object):
@@ -69,24 +97,58 @@ class _FileChunkDownloader(object):
         self.operation_context = operation_context
         self.snapshot = snapshot
 
+        # the chunks completed so far, only set for checkpointed downloads
+        self.checkpoint = None
+
+        # the etag every chunk must match, the file service does not support If-Match
+        self.etag = None
+
+        # sizes the chunks from the measured requests, only set for tuned downloads
+        self.tuner = None
+
     def get_chunk_offsets(self):
         index = self.start_index
         while index < self.file_end:
-            yield index
+            if self.checkpoint is not None and self.checkpoint.is_chunk_complete(self._get_chunk_index(index)):
+                self._update_progress(min(self.chunk_size, self.file_end - index))
+            else:
+                yield index
             index += self.chunk_size
 
+    def _get_chunk_index(self, chunk_start):
+        return (chunk_start - self.start_index) // self.chunk_size
+
+    def get_tuned_chunk_ranges(self):
+        # each chunk is sized when it is about to be downloaded, from the chunks before it,
+        # and kept within the largest range the service returns a transactional MD5 for
+        max_chunk_size = _MAX_RANGE_MD5_SIZE if self.validate_content else None
+        index = self.start_index
+        while index < self.file_end:
+            chunk_end = min(index + self.tuner.get_chunk_size(self.chunk_size, max_chunk_size=max_chunk_size),
+                            self.file_end)
+            yield index, chunk_end
+            index = chunk_end
+
     def process_chunk(self, chunk_start):
         if chunk_start + self.chunk_size > self.file_end:
             chunk_end = self.file_end
         else:
             chunk_end = chunk_start + self.chunk_size
 
+        self.process_range((chunk_start, chunk_end))
+
+    def process_range(self, chunk_range):
+        chunk_start, chunk_end = chunk_range
+
         chunk_data = self._download_chunk(chunk_start, chunk_end).content
         length = chunk_end - chunk_start
         if length > 0:
             self._write_to_stream(chunk_data, chunk_start)
             self._update_progress(length)
 
+        if self.checkpoint is not None:
+            self.checkpoint.set_chunk_complete(self._get_chunk_index(chunk_start))
+
     # should be provided by the subclass
     def _update_progress(self, length):
         pass
@@ -96,7 +158,7 @@ class _FileChunkDownloader(object):
         pass
 
     def _download_chunk(self, chunk_start, chunk_end):
-        return self.file_service._get_file(
+        response = _timed(self.tuner, chunk_end - chunk_start, lambda: self.file_service._get_file(
             self.share_name,
             self.directory_name,
             self.file_name,
@@ -106,7 +168,11 @@ class _FileChunkDownloader(object):
             timeout=self.timeout,
             _context=self.operation_context,
             snapshot=self.snapshot
-        )
+        ))
+
+        if self.etag is not None and response.properties.etag != self.etag:
+            raise AzureException(_ERROR_SOURCE_MODIFIED.format(self.etag, response.properties.etag))
+        return response
 
 
 class _ParallelFileChunkDownloader(_FileChunkDownloader):
@@ -139,6 +205,10 @@ class _ParallelFileChunkDownloader(_FileChunkDownloader):
             self.stream.seek(self.stream_start + (chunk_start - self.start_index))
             self.stream.write(chunk_data)
 
+            # the chunk must reach the file before it is marked as complete
+            if self.checkpoint is not None:
+                self.stream.flush()
+
 
 class _SequentialFileChunkDownloader(_FileChunkDownloader):
     def __init__(self, file_service, share_name, directory_name, file_name, download_size, chunk_size, progress,
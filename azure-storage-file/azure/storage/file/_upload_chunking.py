@@ -5,10 +5,16 @@
 # --------------------------------------------------------------------------
 import threading
 
+from azure.storage.common._scheduler import _ScheduledTransfer
+from azure.storage.common._tuning import (
+    _TunedTransfer,
+    _timed,
+)
+
 
 def _upload_file_chunks(file_service, share_name, directory_name, file_name,
                         file_size, block_size, stream, max_connections,
-                        progress_callback, validate_content, timeout):
+                        progress_callback, validate_content, timeout, tuner=None):
     uploader = _FileChunkUploader(
         file_service,
         share_name,
@@ -26,10 +32,18 @@ def _upload_file_chunks(file_service, share_name, directory_name, file_name,
     if progress_callback is not None:
         progress_callback(0, file_size)
 
-    if max_connections > 1:
-        import concurrent.futures
-        executor = concurrent.futures.ThreadPoolExecutor(max_connections)
-        range_ids = list(executor.map(uploader.process_chunk, uploader.get_chunk_offsets()))
+    # the ranges of a stream of unknown size are read one at a time, at the chunk size
+    if tuner is not None and file_size is not None:
+        uploader.tuner = tuner
+        if max_connections > 1:
+            transfer = _TunedTransfer(uploader.process_range, uploader.get_tuned_chunk_ranges(),
+                                      lambda chunk_range: chunk_range[1] - chunk_range[0], max_connections, tuner)
+            range_ids = file_service._run_transfer(transfer)
+        else:
+            range_ids = [uploader.process_range(chunk_range) for chunk_range in uploader.get_tuned_chunk_ranges()]
+    elif max_connections > 1:
+        transfer = _ScheduledTransfer(uploader.process_chunk, uploader.get_chunk_offsets(), max_connections)
+        range_ids = file_service._run_transfer(transfer)
     else:
         if file_size is not None:
             range_ids = [uploader.process_chunk(start) for start in uploader.get_chunk_offsets()]
@@ -58,6 +72,9 @@ class _FileChunkUploader(object):
         self.validate_content = validate_content
         self.timeout = timeout
 
+        # sizes the chunks from the measured requests, only set for tuned uploads
+        self.tuner = None
+
     def get_chunk_offsets(self):
         index = 0
         if self.file_size is None:
@@ -74,6 +91,16 @@ class _FileChunkUploader(object):
                 yield index
                 index += self.chunk_size
 
+    def get_tuned_chunk_ranges(self):
+        # each chunk is sized when it is about to be read, from the chunks before it,
+        # and never over chunk_size, the largest range the service accepts
+        index = 0
+        while index < self.file_size:
+            chunk_end = min(index + self.tuner.get_chunk_size(self.chunk_size, max_chunk_size=self.chunk_size),
+                            self.file_size)
+            yield index, chunk_end
+            index = chunk_end
+
     def process_chunk(self, chunk_offset):
         size = self.chunk_size
         if self.file_size is not None:
@@ -81,6 +108,11 @@ class _FileChunkUploader(object):
         chunk_data = self._read_from_stream(chunk_offset, size)
         return self._upload_chunk_with_progress(chunk_offset, chunk_data)
 
+    def process_range(self, chunk_range):
+        chunk_start, chunk_end = chunk_range
+        chunk_data = self._read_from_stream(chunk_start, chunk_end - chunk_start)
+        return self._upload_chunk_with_progress(chunk_start, chunk_data)
+
     def process_all_unknown_size(self):
         assert self.stream_lock is None
         range_ids = []
@@ -118,7 +150,7 @@ class _FileChunkUploader(object):
 
     def _upload_chunk_with_progress(self, chunk_start, chunk_data):
         chunk_end = chunk_start + len(chunk_data) - 1
-        self.file_service.update_range(
+        _timed(self.tuner, len(chunk_data), lambda: self.file_service.update_range(
             self.share_name,
             self.directory_name,
             self.file_name,
@@ -127,7 +159,7 @@ class _FileChunkUploader(object):
             chunk_end,
             self.validate_content,
             timeout=self.timeout
-        )
+        ))
         range_id = 'bytes={0}-{1}'.format(chunk_start, chunk_end)
         self._update_progress(len(chunk_data))
         return range_id
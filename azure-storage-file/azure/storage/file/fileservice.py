@@ -3,8 +3,14 @@
 # Licensed under the MIT License. See License.txt in the project root for
 # license information.
 # --------------------------------------------------------------------------
+import copy
 import sys
+from collections import deque
 from os import path
+from threading import (
+    Event,
+    Lock,
+)
 
 from azure.common import AzureHttpError
 
@@ -17,7 +23,9 @@ from azure.storage.common._common_conversion import (
     _to_str,
     _get_content_md5,
 )
+from azure.storage.common._checkpoint import _DownloadCheckpoint
 from azure.storage.common._connection import _ServiceParameters
+from azure.storage.common._copy import _CopyScheduler
 from azure.storage.common._constants import (
     SERVICE_HOST_BASE,
     DEFAULT_PROTOCOL,
@@ -42,6 +50,15 @@ from azure.storage.common._error import (
     _validate_access_policies,
 )
 from azure.storage.common._http import HTTPRequest
+from azure.storage.common._transfer import (
+    _get_local_path,
+    _get_transfer_pool,
+    _make_directories,
+    _transfer_files,
+    _walk_files,
+)
+from azure.storage.common._scheduler import _TransferScheduler
+from azure.storage.common._tuning import _TransferTuner
 from azure.storage.common._serialization import (
     _get_request_body,
     _get_data_bytes_only,
@@ -75,6 +92,8 @@ from ._serialization import (
 )
 from ._upload_chunking import _upload_file_chunks
 from .models import (
+    Directory,
+    File,
     FileProperties,
 )
 
@@ -121,10 +140,33 @@ class FileService(StorageClient):
         The size of the ranges put by create_file_from_* methods. Smaller ranges
         may be put if there is less data provided. The maximum range size the service
         supports is 4MB.
+    :ivar int MAX_PROBE_GET_SIZE:
+        If set, the size of the initial get performed by get_file_to_* methods if
+        max_connections is greater than 1 and no file_hint with the size of the
+        file is given, instead of MAX_SINGLE_GET_SIZE. A small probe gets the size
+        of the file sooner, so the rest of a large file starts downloading in
+        parallel sooner, at the cost of an extra request for files smaller than
+        MAX_SINGLE_GET_SIZE.
+    :ivar bool AUTO_TUNE_TRANSFERS:
+        If true, the chunked transfers of get_file_to_* and create_file_from_*
+        methods size each chunk from the throughput and latency measured on the
+        previous chunk requests of this service, instead of MAX_CHUNK_GET_SIZE and
+        MAX_RANGE_SIZE, and adjust the number of connections during the transfer,
+        starting from max_connections. Ranges put are never larger than
+        MAX_RANGE_SIZE, and checkpointed downloads keep fixed chunk sizes.
+    :ivar int MAX_TRANSFER_CONNECTIONS:
+        The maximum number of chunk requests in flight over all the parallel
+        chunked transfers of this service object. The chunks are run on a pool of
+        threads shared by the transfers, which take turns on the threads, and each
+        transfer still has at most max_connections chunk requests in flight. If a
+        request_scheduler is set, its pool and limit are used instead.
     '''
     MAX_SINGLE_GET_SIZE = 32 * 1024 * 1024
     MAX_CHUNK_GET_SIZE = 8 * 1024 * 1024
     MAX_RANGE_SIZE = 4 * 1024 * 1024
+    MAX_PROBE_GET_SIZE = None
+    AUTO_TUNE_TRANSFERS = False
+    MAX_TRANSFER_CONNECTIONS = 64
 
     def __init__(self, account_name=None, account_key=None, sas_token=None,
                  protocol=DEFAULT_PROTOCOL, endpoint_suffix=SERVICE_HOST_BASE,
@@ -182,6 +224,8 @@ class FileService(StorageClient):
             self.authentication = _StorageSASAuthentication(self.sas_token)
         else:
             raise ValueError(_ERROR_STORAGE_MISSING_INFO)
+        self._transfer_tuner = _TransferTuner()
+        self._transfer_scheduler = _TransferScheduler()
         self._X_MS_VERSION = X_MS_VERSION
         self._update_user_agent_string(package_version)
 
@@ -1228,6 +1272,64 @@ class FileService(StorageClient):
         return self._perform_request(request, _convert_xml_to_directories_and_files,
                                      operation_context=_context)
 
+    def walk_share(self, share_name, directory_name=None, snapshot=None, max_connections=8, timeout=None):
+        '''
+        Walks the directory tree of a share, like os.walk, yielding a
+        (directory_name, directories, files) tuple for each directory of the tree.
+
+        The directories are listed breadth first by a pool of max_connections
+        threads, each listing a whole directory, following the continuation markers.
+        The tuples are yielded in the order the listings complete, and the
+        subdirectories of a directory are queued as soon as it is listed, so any
+        idle thread picks up the next directory to list.
+
+        :param str share_name:
+            Name of existing share.
+        :param str directory_name:
+            The path to the directory to walk from. The share root if not specified.
+        :param str snapshot:
+            A string that represents the snapshot version, if applicable.
+        :param int max_connections:
+            Maximum number of directories listed in parallel.
+        :param int timeout:
+            The timeout parameter is expressed in seconds, and applies to each
+            request individually.
+        :return: A generator of (directory_name, directories, files) tuples, with
+            directory_name the path of the directory from the share root, or None for
+            the root, and the directories and files it contains.
+        :rtype: iterable(tuple(str, list(:class:`~azure.storage.file.models.Directory`),
+            list(:class:`~azure.storage.file.models.File`)))
+        '''
+        _validate_not_none('share_name', share_name)
+
+        def list_directory(directory_name):
+            directories, files = [], []
+            for item in self.list_directories_and_files(share_name, directory_name, timeout=timeout,
+                                                        snapshot=snapshot):
+                (directories if isinstance(item, Directory) else files).append(item)
+            return directory_name, directories, files
+
+        import concurrent.futures
+        executor = concurrent.futures.ThreadPoolExecutor(max_connections)
+
+        # the directories left to list, listed in the order they are found
+        to_list = deque([directory_name])
+        futures = set()
+        try:
+            while to_list or futures:
+                while to_list and len(futures) < max_connections:
+                    futures.add(executor.submit(list_directory, to_list.popleft()))
+
+                done, futures = concurrent.futures.wait(futures, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    listed_directory_name, directories, files = future.result()
+                    for directory in directories:
+                        to_list.append(directory.name if listed_directory_name is None else
+                                       listed_directory_name + '/' + directory.name)
+                    yield listed_directory_name, directories, files
+        finally:
+            executor.shutdown(wait=True)
+
     def get_file_properties(self, share_name, directory_name, file_name, timeout=None, snapshot=None):
         '''
         Returns all user-defined metadata, standard HTTP properties, and
@@ -1527,6 +1629,59 @@ class FileService(StorageClient):
 
         self._perform_request(request)
 
+    def copy_files(self, copies, max_pending_copies=100, max_attempts=3, stall_timeout=None,
+                   max_connections=4, timeout=None):
+        '''
+        Runs many asynchronous copy_file operations and tracks them until they
+        conclude, yielding a :class:`~azure.storage.common.models.CopyOperation`
+        every time the status or progress of one of the copies changes.
+
+        The copies are only run as the returned generator is iterated. At most
+        max_pending_copies copies are started at once, and all the pending copies
+        are polled from the same loop, at intervals estimated from the progress they
+        report so that copies close to completion are checked sooner. Copies which
+        fail, are aborted, or cannot be started are started again until max_attempts
+        is reached. A copy which cannot be polled max_attempts times in a row, or
+        for stall_timeout, is failed. A copy replaced by another copy to the same
+        destination is superseded and is not started again.
+
+        :param copies:
+            The copies to run, as (copy_source, share_name, directory_name, file_name)
+            tuples. See copy_file for the copy_source format.
+        :type copies: iterable(tuple(str, str, str, str))
+        :param int max_pending_copies:
+            Maximum number of copies pending on the service at once.
+        :param int max_attempts:
+            Maximum number of times a copy is started.
+        :param int stall_timeout:
+            If specified, a pending copy which reports no progress for this number
+            of seconds is aborted and started again.
+        :param int max_connections:
+            Maximum number of parallel requests used to start and poll the copies.
+        :param int timeout:
+            The timeout parameter is expressed in seconds, and applies to each
+            request individually.
+        :return: A generator of the copy operations whose state changed.
+        :rtype: iterable(:class:`~azure.storage.common.models.CopyOperation`)
+        '''
+        _validate_not_none('copies', copies)
+
+        def start_copy(operation):
+            share_name, directory_name, file_name = operation.destination
+            return self.copy_file(share_name, directory_name, file_name, operation.copy_source, timeout=timeout)
+
+        def get_copy_properties(operation):
+            share_name, directory_name, file_name = operation.destination
+            return self.get_file_properties(share_name, directory_name, file_name, timeout=timeout).properties.copy
+
+        def abort_copy(operation):
+            share_name, directory_name, file_name = operation.destination
+            self.abort_copy_file(share_name, directory_name, file_name, operation.copy.id, timeout=timeout)
+
+        scheduler = _CopyScheduler(start_copy, get_copy_properties, abort_copy, max_pending_copies,
+                                   max_connections, max_attempts, stall_timeout)
+        return scheduler.run(copies)
+
     def delete_file(self, share_name, directory_name, file_name, timeout=None):
         '''
         Marks the specified file for deletion. The file is later
@@ -1832,9 +1987,107 @@ class FileService(StorageClient):
             max_connections,
             progress_callback,
             validate_content,
-            timeout
+            timeout,
+            tuner=self._transfer_tuner if self.AUTO_TUNE_TRANSFERS else None
         )
 
+    def upload_directory_to_share(
+            self, share_name, directory_path, directory_name=None, content_settings=None,
+            metadata=None, validate_content=False, progress_callback=None, max_connections=8,
+            timeout=None):
+        '''
+        Uploads the files of a local directory tree to a share, under the given
+        directory, creating the directories which contain them as needed. The tree
+        is walked lazily while the files are uploaded by a single pool of
+        max_connections threads, so the upload never has more than max_connections
+        requests in flight.
+
+        Each directory is created once, by the first file which needs it, while the
+        other files of the directory wait for it; existing directories are kept.
+        Files up to MAX_RANGE_SIZE bytes are uploaded with a single range. Larger
+        files are uploaded in ranges of MAX_RANGE_SIZE bytes by the thread which
+        uploads the file, helped by the threads of the pool which have no file left
+        to upload. A file which fails to upload does not stop the upload of the
+        others, and is reported in the result.
+
+        :param str share_name:
+            Name of existing share.
+        :param str directory_path:
+            Path of the local directory to upload.
+        :param str directory_name:
+            The path to the directory of the share to upload to. The share root if
+            not specified. It is created if it does not exist.
+        :param ~azure.storage.file.models.ContentSettings content_settings:
+            ContentSettings object used to set the properties of every file.
+        :param metadata:
+            Name-value pairs associated with every file as metadata.
+        :type metadata: dict(str, str)
+        :param bool validate_content:
+            If true, calculates an MD5 hash for each range of the files. The storage
+            service checks the hash of the content that has arrived with the hash
+            that was sent.
+        :param progress_callback:
+            Callback with signature function(result), called every time a file is
+            uploaded or fails with the DirectoryTransferResult of the upload so far.
+        :type progress_callback: func(:class:`~azure.storage.common.models.DirectoryTransferResult`)
+        :param int max_connections:
+            Maximum number of files, and ranges of large files, uploaded in parallel.
+        :param int timeout:
+            The timeout parameter is expressed in seconds. This method may make
+            multiple calls to the Azure service and the timeout will apply to
+            each call individually.
+        :return: The number of files and bytes uploaded, the throughput and the failures.
+        :rtype: :class:`~azure.storage.common.models.DirectoryTransferResult`
+        '''
+        _validate_not_none('share_name', share_name)
+        _validate_not_none('directory_path', directory_path)
+
+        # the state of each directory created, an event set once the creation is
+        # attempted and the error raised, if any
+        directories = {}
+        directories_lock = Lock()
+
+        def ensure_directory(name):
+            if not name:
+                return
+
+            with directories_lock:
+                state = directories.get(name)
+                owner = state is None
+                if owner:
+                    state = directories[name] = [Event(), None]
+
+            if owner:
+                try:
+                    ensure_directory(name.rpartition('/')[0])
+                    self.create_directory(share_name, name, timeout=timeout)
+                except Exception as ex:
+                    state[1] = ex
+                finally:
+                    state[0].set()
+            else:
+                state[0].wait()
+
+            if state[1] is not None:
+                raise state[1]
+
+        def upload_file(task):
+            file_path, relative_path = task
+            parent_name, _, file_name = relative_path.rpartition('/')
+            parent_name = '/'.join(name for name in (directory_name, parent_name) if name) or None
+            ensure_directory(parent_name)
+
+            # the ranges are put on the threads of the directory upload, see _run_transfer
+            self.create_file_from_path(share_name, parent_name, file_name, file_path,
+                                       content_settings=content_settings, metadata=metadata,
+                                       validate_content=validate_content, max_connections=max_connections,
+                                       timeout=timeout)
+            return path.getsize(file_path)
+
+        tasks = ((file_path, (file_path, relative_path))
+                 for file_path, relative_path in _walk_files(directory_path))
+        return _transfer_files(upload_file, tasks, max_connections, progress_callback)
+
     def _get_file(self, share_name, directory_name, file_name,
                  start_range=None, end_range=None, validate_content=False,
                  timeout=None, _context=None, snapshot=None):
@@ -1895,7 +2148,8 @@ class FileService(StorageClient):
     def get_file_to_path(self, share_name, directory_name, file_name, file_path,
                          open_mode='wb', start_range=None, end_range=None,
                          validate_content=False, progress_callback=None,
-                         max_connections=2, timeout=None, snapshot=None):
+                         max_connections=2, timeout=None, snapshot=None, checkpoint_path=None,
+                         file_hint=None):
         '''
         Downloads a file to a file path, with automatic chunking and progress
         notifications. Returns an instance of File with properties and metadata.
@@ -1957,6 +2211,23 @@ class FileService(StorageClient):
             each call individually.
         :param str snapshot:
             A string that represents the snapshot version, if applicable.
+        :param str checkpoint_path:
+            If specified, the download is resumable. The file is downloaded in chunks
+            of self.MAX_CHUNK_GET_SIZE, which are written at their offset of the local
+            file, and the completed chunks are recorded with the etag of the file in a
+            checkpoint at this path. If the download fails, calling this method again
+            with the same checkpoint path only downloads the missing chunks, provided
+            the file did not change in between, in which case the download restarts
+            from the beginning. The download fails if the etag of any chunk does not
+            match the recorded etag, and the checkpoint is deleted once the download
+            completes. open_mode is ignored when a checkpoint is used.
+        :param ~azure.storage.file.models.File file_hint:
+            The file as returned by get_file_properties or listed by
+            list_directories_and_files, if already known. If max_connections is
+            greater than 1 and the hint has a content length, all the chunks are
+            downloaded in parallel right away instead of after a first get. If the
+            hint also has an etag, every chunk must match it. The properties and
+            metadata returned are then those of the hint.
         :return: A File with properties and metadata.
         :rtype: :class:`~azure.storage.file.models.File`
         '''
@@ -1965,6 +2236,12 @@ class FileService(StorageClient):
         _validate_not_none('file_path', file_path)
         _validate_not_none('open_mode', open_mode)
 
+        if checkpoint_path is not None:
+            return self._get_file_to_path_checkpointed(
+                share_name, directory_name, file_name, file_path, checkpoint_path,
+                start_range, end_range, validate_content,
+                progress_callback, max_connections, timeout, snapshot)
+
         if max_connections > 1 and 'a' in open_mode:
             raise ValueError(_ERROR_PARALLEL_NOT_SEEKABLE)
 
@@ -1972,14 +2249,86 @@ class FileService(StorageClient):
             file = self.get_file_to_stream(
                 share_name, directory_name, file_name, stream,
                 start_range, end_range, validate_content,
-                progress_callback, max_connections, timeout, snapshot)
+                progress_callback, max_connections, timeout, snapshot,
+                file_hint=file_hint)
+
+        return file
+
+    def _get_file_to_path_checkpointed(
+            self, share_name, directory_name, file_name, file_path, checkpoint_path,
+            start_range=None, end_range=None, validate_content=False,
+            progress_callback=None, max_connections=2, timeout=None, snapshot=None):
+        '''
+        See get_file_to_path for more details. Downloads the chunks of the file
+        which are not recorded as complete in the checkpoint.
+        '''
+        if end_range is not None:
+            _validate_not_none("start_range", start_range)
+
+        file = self.get_file_properties(share_name, directory_name, file_name, timeout=timeout, snapshot=snapshot)
+
+        file_size = file.properties.content_length
+        download_start = start_range if start_range is not None else 0
+        download_end = file_size if end_range is None else min(file_size, end_range + 1)
+        download_size = max(download_end - download_start, 0)
+
+        checkpoint = _DownloadCheckpoint(checkpoint_path, {
+            'Share': share_name,
+            'Directory': directory_name,
+            'File': file_name,
+            'Snapshot': snapshot,
+            'StartRange': start_range,
+            'EndRange': end_range,
+            'ChunkSize': self.MAX_CHUNK_GET_SIZE,
+            'ETag': file.properties.etag,
+            'Size': file_size,
+        }, -(-download_size // self.MAX_CHUNK_GET_SIZE))
+
+        # the chunks already written can only be kept if the local file is still there
+        resumed = checkpoint.open(resume=path.isfile(file_path))
+        try:
+            with open(file_path, 'r+b' if resumed else 'wb') as stream:
+                if progress_callback:
+                    progress_callback(0, download_size)
+
+                # Send a context object to make sure we always retry to the initial location
+                operation_context = _OperationContext(location_lock=True)
+                _download_file_chunks(
+                    self,
+                    share_name,
+                    directory_name,
+                    file_name,
+                    download_size,
+                    self.MAX_CHUNK_GET_SIZE,
+                    0,
+                    download_start,
+                    download_end,
+                    stream,
+                    max_connections,
+                    progress_callback,
+                    validate_content,
+                    timeout,
+                    operation_context,
+                    snapshot,
+                    checkpoint,
+                    file.properties.etag,
+                )
+        finally:
+            checkpoint.close()
+
+        checkpoint.delete()
+
+        file.properties.content_length = download_size
+        if start_range is not None:
+            file.properties.content_range = 'bytes {0}-{1}/{2}'.format(start_range, end_range, file_size)
 
         return file
 
     def get_file_to_stream(
         self, share_name, directory_name, file_name, stream,
         start_range=None, end_range=None, validate_content=False,
-        progress_callback=None, max_connections=2, timeout=None, snapshot=None):
+        progress_callback=None, max_connections=2, timeout=None, snapshot=None,
+        file_hint=None):
         '''
         Downloads a file to a stream, with automatic chunking and progress
         notifications. Returns an instance of :class:`~azure.storage.file.models.File` with properties
@@ -2038,6 +2387,13 @@ class FileService(StorageClient):
             each call individually.
         :param str snapshot:
             A string that represents the snapshot version, if applicable.
+        :param ~azure.storage.file.models.File file_hint:
+            The file as returned by get_file_properties or listed by
+            list_directories_and_files, if already known. If max_connections is
+            greater than 1 and the hint has a content length, all the chunks are
+            downloaded in parallel right away instead of after a first get. If the
+            hint also has an etag, every chunk must match it. The properties and
+            metadata returned are then those of the hint.
         :return: A File with properties and metadata.
         :rtype: :class:`~azure.storage.file.models.File`
         '''
@@ -2058,10 +2414,21 @@ class FileService(StorageClient):
                 except (NotImplementedError, AttributeError):
                     raise ValueError(_ERROR_PARALLEL_NOT_SEEKABLE)
 
+            # With the size known, there is no need for a first get
+            if self._can_plan_download(file_hint, start_range, end_range):
+                return self._get_file_to_stream_planned(
+                    share_name, directory_name, file_name, stream, file_hint, start_range, end_range,
+                    validate_content, progress_callback, max_connections, timeout, snapshot)
+
         # The service only provides transactional MD5s for chunks under 4MB.
         # If validate_content is on, get only self.MAX_CHUNK_GET_SIZE for the first
-        # chunk so a transactional MD5 can be retrieved.
-        first_get_size = self.MAX_SINGLE_GET_SIZE if not validate_content else self.MAX_CHUNK_GET_SIZE
+        # chunk so a transactional MD5 can be retrieved. A parallel download may
+        # start with a smaller probe, so that the rest starts in parallel sooner.
+        first_get_size = self.MAX_SINGLE_GET_SIZE
+        if max_connections > 1 and self.MAX_PROBE_GET_SIZE is not None:
+            first_get_size = self.MAX_PROBE_GET_SIZE
+        if validate_content:
+            first_get_size = min(first_get_size, self.MAX_CHUNK_GET_SIZE)
 
         initial_request_start = start_range if start_range is not None else 0
 
@@ -2149,7 +2516,8 @@ class FileService(StorageClient):
                 validate_content,
                 timeout,
                 operation_context,
-                snapshot
+                snapshot,
+                tuner=self._transfer_tuner if self.AUTO_TUNE_TRANSFERS else None
             )
 
             # Set the content length to the download size instead of the size of 
@@ -2166,9 +2534,70 @@ class FileService(StorageClient):
 
         return file
 
+    def _can_plan_download(self, file_hint, start_range, end_range):
+        '''
+        Whether a download can skip the first get, using the size of file_hint.
+        '''
+        if file_hint is None or file_hint.properties.content_length is None:
+            return False
+
+        # an empty range takes a request anyway, which checks the file exists
+        download_start = start_range if start_range is not None else 0
+        download_end = file_hint.properties.content_length if end_range is None else \
+            min(file_hint.properties.content_length, end_range + 1)
+        return download_end > download_start
+
+    def _get_file_to_stream_planned(
+            self, share_name, directory_name, file_name, stream, file_hint, start_range,
+            end_range, validate_content, progress_callback, max_connections, timeout, snapshot):
+        '''
+        See get_file_to_stream for more details. Downloads all the chunks in
+        parallel from the start, planned from the size of file_hint.
+        '''
+        file_size = file_hint.properties.content_length
+        download_start = start_range if start_range is not None else 0
+        download_end = file_size if end_range is None else min(file_size, end_range + 1)
+        download_size = download_end - download_start
+
+        if progress_callback:
+            progress_callback(0, download_size)
+
+        # The file service does not support If-Match, so each chunk is checked
+        # against the etag of the hint instead, if it has one.
+        # Send a context object to make sure we always retry to the initial location
+        operation_context = _OperationContext(location_lock=True)
+        _download_file_chunks(
+            self,
+            share_name,
+            directory_name,
+            file_name,
+            download_size,
+            self.MAX_CHUNK_GET_SIZE,
+            0,
+            download_start,
+            download_end,
+            stream,
+            max_connections,
+            progress_callback,
+            validate_content,
+            timeout,
+            operation_context,
+            snapshot,
+            etag=file_hint.properties.etag,
+            tuner=self._transfer_tuner if self.AUTO_TUNE_TRANSFERS else None
+        )
+
+        properties = copy.copy(file_hint.properties)
+        properties.content_length = download_size
+        properties.content_md5 = None
+        if start_range is not None:
+            properties.content_range = 'bytes {0}-{1}/{2}'.format(start_range, end_range, file_size)
+        return File(file_name, None, properties, file_hint.metadata)
+
     def get_file_to_bytes(self, share_name, directory_name, file_name,
                           start_range=None, end_range=None, validate_content=False,
-                          progress_callback=None, max_connections=2, timeout=None, snapshot=None):
+                          progress_callback=None, max_connections=2, timeout=None, snapshot=None,
+                          file_hint=None):
         '''
         Downloads a file as an array of bytes, with automatic chunking and
         progress notifications. Returns an instance of :class:`~azure.storage.file.models.File` with
@@ -2225,6 +2654,13 @@ class FileService(StorageClient):
             each call individually.
         :param str snapshot:
             A string that represents the snapshot version, if applicable.
+        :param ~azure.storage.file.models.File file_hint:
+            The file as returned by get_file_properties or listed by
+            list_directories_and_files, if already known. If max_connections is
+            greater than 1 and the hint has a content length, all the chunks are
+            downloaded in parallel right away instead of after a first get. If the
+            hint also has an etag, every chunk must match it. The properties and
+            metadata returned are then those of the hint.
         :return: A File with properties, content, and metadata.
         :rtype: :class:`~azure.storage.file.models.File`
         '''
@@ -2243,7 +2679,8 @@ class FileService(StorageClient):
             progress_callback,
             max_connections,
             timeout,
-            snapshot)
+            snapshot,
+            file_hint=file_hint)
 
         file.content = stream.getvalue()
         return file
@@ -2251,7 +2688,8 @@ class FileService(StorageClient):
     def get_file_to_text(
         self, share_name, directory_name, file_name, encoding='utf-8',
         start_range=None, end_range=None, validate_content=False,
-        progress_callback=None, max_connections=2, timeout=None, snapshot=None):
+        progress_callback=None, max_connections=2, timeout=None, snapshot=None,
+        file_hint=None):
         '''
         Downloads a file as unicode text, with automatic chunking and progress
         notifications. Returns an instance of :class:`~azure.storage.file.models.File` with properties,
@@ -2310,6 +2748,13 @@ class FileService(StorageClient):
             each call individually.
         :param str snapshot:
             A string that represents the snapshot version, if applicable.
+        :param ~azure.storage.file.models.File file_hint:
+            The file as returned by get_file_properties or listed by
+            list_directories_and_files, if already known. If max_connections is
+            greater than 1 and the hint has a content length, all the chunks are
+            downloaded in parallel right away instead of after a first get. If the
+            hint also has an etag, every chunk must match it. The properties and
+            metadata returned are then those of the hint.
         :return: A File with properties, content, and metadata.
         :rtype: :class:`~azure.storage.file.models.File`
         '''
@@ -2327,11 +2772,84 @@ class FileService(StorageClient):
             progress_callback,
             max_connections,
             timeout,
-            snapshot)
+            snapshot,
+            file_hint=file_hint)
 
         file.content = file.content.decode(encoding)
         return file
 
+    def download_directory_from_share(
+            self, share_name, directory_name, directory_path, snapshot=None,
+            progress_callback=None, max_connections=8, timeout=None):
+        '''
+        Downloads the directory tree of a share to a local directory. The tree is
+        walked with walk_share while the files already found are downloaded, both by
+        pools of max_connections threads. Reading from a share snapshot gives a
+        consistent copy of a share which is being modified, such as for a backup.
+
+        Files smaller than MAX_SINGLE_GET_SIZE are downloaded with a single get of
+        the whole file. Larger files are downloaded in chunks of MAX_CHUNK_GET_SIZE
+        bytes by the thread which downloads the file, helped by the threads of the
+        pool which have no file left to download. A file which fails to download
+        does not stop the download of the others, and is reported in the result.
+
+        :param str share_name:
+            Name of existing share.
+        :param str directory_name:
+            The path to the directory of the share to download. The share root if
+            None.
+        :param str directory_path:
+            Path of the local directory to download to.
+        :param str snapshot:
+            A string that represents the snapshot version of the share to read from,
+            if applicable.
+        :param progress_callback:
+            Callback with signature function(result), called every time a file is
+            downloaded or fails with the DirectoryTransferResult of the download so far.
+        :type progress_callback: func(:class:`~azure.storage.common.models.DirectoryTransferResult`)
+        :param int max_connections:
+            Maximum number of files, or chunks of large files, downloaded, and of directories listed, in parallel.
+        :param int timeout:
+            The timeout parameter is expressed in seconds. This method may make
+            multiple calls to the Azure service and the timeout will apply to
+            each call individually.
+        :return: The number of files and bytes downloaded, the throughput and the failures.
+        :rtype: :class:`~azure.storage.common.models.DirectoryTransferResult`
+        '''
+        _validate_not_none('share_name', share_name)
+        _validate_not_none('directory_path', directory_path)
+
+        def download_file(task):
+            file_directory_name, file, file_path = task
+
+            if file.properties.content_length <= self.MAX_SINGLE_GET_SIZE:
+                content = self._get_file(share_name, file_directory_name, file.name, timeout=timeout,
+                                         snapshot=snapshot).content
+                with open(file_path, 'wb') as stream:
+                    stream.write(content)
+                return len(content)
+
+            # the chunks are downloaded on the threads of the directory download, see _run_transfer
+            self.get_file_to_path(share_name, file_directory_name, file.name, file_path,
+                                  max_connections=max_connections, timeout=timeout, snapshot=snapshot)
+            return file.properties.content_length
+
+        def get_tasks():
+            for walked_directory_name, _, files in self.walk_share(share_name, directory_name, snapshot=snapshot,
+                                                                    max_connections=max_connections,
+                                                                    timeout=timeout):
+                # the directory is created before its files are downloaded, even if it is empty
+                relative_directory = (walked_directory_name or '')[len(directory_name or ''):].lstrip('/')
+                local_directory = _get_local_path(directory_path, relative_directory) if relative_directory \
+                    else directory_path
+                _make_directories(local_directory)
+
+                for file in files:
+                    relative_path = '/'.join(name for name in (relative_directory, file.name) if name)
+                    yield relative_path, (walked_directory_name, file, path.join(local_directory, file.name))
+
+        return _transfer_files(download_file, get_tasks(), max_connections, progress_callback)
+
     def update_range(self, share_name, directory_name, file_name, data,
                      start_range, end_range, validate_content=False, timeout=None):
         '''
@@ -2479,3 +2997,19 @@ class FileService(StorageClient):
                 end_range_required=False)
 
         return self._perform_request(request, _convert_xml_to_ranges)
+
+    def _run_transfer(self, transfer):
+        '''
+        Runs the chunks of a parallel transfer on the threads of the directory
+        transfer it is part of, if any, else on the threads of the request
+        scheduler, if any, or else on those of this service object.
+        '''
+        pool = _get_transfer_pool()
+        if pool is not None:
+            return pool.run(transfer)
+
+        transfer.priority = self.priority
+        if self.request_scheduler is not None:
+            return self.request_scheduler._transfer_scheduler.run(
+                transfer, self.request_scheduler.max_transfer_connections)
+        return self._transfer_scheduler.run(transfer, self.MAX_TRANSFER_CONNECTIONS)
@@ -4,6 +4,7 @@
 # license information.
 # --------------------------------------------------------------------------
 from .models import (
+    PutMessagesResult,
     Queue,
     QueueMessage,
     QueuePermissions,
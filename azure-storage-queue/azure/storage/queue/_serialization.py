@@ -13,6 +13,8 @@ else:
     except:
         from StringIO import StringIO as BytesIO
 
+from xml.sax.saxutils import escape as xml_escape
+
 try:
     from xml.etree import cElementTree as ETree
 except ImportError:
@@ -71,3 +73,24 @@ def _convert_queue_message_xml(message_text, encode_function, key_encryption_key
         stream.close()
 
     return output
+
+
+# the body of a put message request, as serialized by _convert_queue_message_xml
+_QUEUE_MESSAGE_XML_START = b"<?xml version='1.0' encoding='utf-8'?>\n<QueueMessage><MessageText>"
+_QUEUE_MESSAGE_XML_END = b'</MessageText></QueueMessage>'
+
+
+def _get_queue_message_xml(message_text, encode_function, key_encryption_key):
+    '''
+    Serializes a message the same way as _convert_queue_message_xml, by escaping
+    the message text into a template instead of building an element tree, which
+    is much cheaper for the many small messages of put_messages.
+    '''
+    message_text = encode_function(message_text)
+    if key_encryption_key is not None:
+        message_text = _encrypt_queue_message(message_text, key_encryption_key)
+
+    message_text = xml_escape(message_text)
+    if not isinstance(message_text, bytes):
+        message_text = message_text.encode('utf-8')
+    return _QUEUE_MESSAGE_XML_START + message_text + _QUEUE_MESSAGE_XML_END
@@ -75,6 +75,26 @@ class QueueMessage(object):
         self.time_next_visible = None
 
 
+class PutMessagesResult(object):
+    '''
+    The outcome of put_messages. A message which fails does not stop the others,
+    its error is reported in failures.
+
+    :ivar messages:
+        The messages put, in the order of their content, with None in place of
+        the messages which could not be put.
+    :vartype messages: list(:class:`~azure.storage.queue.models.QueueMessage`)
+    :ivar failures:
+        The messages which could not be put, as the index of their content with
+        the error raised, in the order of their content.
+    :vartype failures: list(tuple(int, Exception))
+    '''
+
+    def __init__(self):
+        self.messages = []
+        self.failures = []
+
+
 class QueueMessageFormat:
     ''' 
     Encoding and decoding methods which can be used to modify how the queue service 
@@ -55,6 +55,7 @@ from azure.storage.common.models import (
 from .sharedaccesssignature import (
     QueueSharedAccessSignature,
 )
+from azure.storage.common._tuning import _AdaptiveConcurrency
 from azure.storage.common.storageclient import StorageClient
 from ._deserialization import (
     _convert_xml_to_queues,
@@ -65,8 +66,10 @@ from ._deserialization import (
 from ._serialization import (
     _convert_queue_message_xml,
     _get_path,
+    _get_queue_message_xml,
 )
 from .models import (
+    PutMessagesResult,
     QueueMessageFormat,
 )
 from ._constants import (
@@ -775,6 +778,98 @@ class QueueService(StorageClient):
 
         _validate_not_none('queue_name', queue_name)
         _validate_not_none('content', content)
+        return self._put_message(queue_name, content, visibility_timeout, time_to_live, timeout)
+
+    def put_messages(self, queue_name, contents, visibility_timeout=None,
+                     time_to_live=None, max_connections=8, timeout=None):
+        '''
+        Adds many messages to the back of the message queue, sending up to
+        max_connections of them at once instead of one after the other. The
+        contents are consumed as the messages are sent, so a generator of
+        contents is not loaded in memory at once.
+
+        A message which fails does not stop the others, its error is reported
+        in the failures of the result. When the service rejects a message as it
+        is busy, even after the retries of the retry policy, the number of
+        messages sent at once is halved and the message is sent again, unless
+        it was sent alone. The number of messages sent at once
+        then grows back by one each time as many messages are put.
+
+        If the key-encryption-key field is set on the local service object, this
+        method will encrypt the content before uploading.
+
+        :param str queue_name:
+            The name of the queue to put the messages into.
+        :param contents:
+            The content of each message. Allowed type is determined by the
+            encode_function set on the service. Default is str. Each encoded
+            message can be up to 64KB in size.
+        :type contents: Iterable[obj]
+        :param int visibility_timeout:
+            If not specified, the default value is 0. Specifies the
+            new visibility timeout value, in seconds, relative to server time.
+            The value must be larger than or equal to 0, and cannot be
+            larger than 7 days. The visibility timeout of a message cannot be
+            set to a value later than the expiry time. visibility_timeout
+            should be set to a value smaller than the time-to-live value.
+        :param int time_to_live:
+            Specifies the time-to-live interval for the messages, in
+            seconds. The time-to-live may be any positive number or -1 for infinity. If this
+            parameter is omitted, the default time-to-live is 7 days.
+        :param int max_connections:
+            Maximum number of messages sent at once.
+        :param int timeout:
+            The server timeout, expressed in seconds.
+        :return:
+            The messages put, in the order of their contents, and the failures.
+        :rtype: :class:`~azure.storage.queue.models.PutMessagesResult`
+        '''
+        _validate_encryption_required(self.require_encryption, self.key_encryption_key)
+
+        _validate_not_none('queue_name', queue_name)
+        _validate_not_none('contents', contents)
+
+        import concurrent.futures
+        executor = concurrent.futures.ThreadPoolExecutor(max_connections)
+        concurrency = _AdaptiveConcurrency(max_connections)
+        result = PutMessagesResult()
+        failures = {}
+
+        def put(index, content, generation):
+            while True:
+                # a message sent alone under a bound of one is not rejected because
+                # of the other messages, and is not sent again
+                alone = concurrency.limit == 1 and concurrency.in_flight == 1
+                try:
+                    result.messages[index] = self._put_message(queue_name, content, visibility_timeout,
+                                                               time_to_live, timeout)
+                    concurrency.release(generation)
+                    return
+                except AzureHttpError as ex:
+                    if ex.status_code != 503 or alone:
+                        failures[index] = ex
+                        concurrency.release(generation)
+                        return
+                    # the queue is busy, wait for fewer messages to be in flight and try again
+                    concurrency.release(generation, busy=True)
+                    generation = concurrency.acquire()
+                except Exception as ex:
+                    failures[index] = ex
+                    concurrency.release(generation)
+                    return
+
+        try:
+            for index, content in enumerate(contents):
+                generation = concurrency.acquire()
+                result.messages.append(None)
+                executor.submit(put, index, content, generation)
+        finally:
+            executor.shutdown(wait=True)
+
+        result.failures = sorted(failures.items(), key=lambda failure: failure[0])
+        return result
+
+    def _put_message(self, queue_name, content, visibility_timeout, time_to_live, timeout):
         request = HTTPRequest()
         request.method = 'POST'
         request.host_locations = self._get_host_locations()
@@ -785,8 +880,7 @@ class QueueService(StorageClient):
             'timeout': _int_to_str(timeout)
         }
 
-        request.body = _get_request_body(_convert_queue_message_xml(content, self.encode_function,
-                                                                    self.key_encryption_key))
+        request.body = _get_queue_message_xml(content, self.encode_function, self.key_encryption_key)
 
         message_list = self._perform_request(request, _convert_xml_to_queue_messages,
                                              [self.decode_function, False,
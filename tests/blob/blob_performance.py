@@ -12,6 +12,7 @@ from azure.storage.blob import (
     PageBlobService,
     AppendBlobService,
 )
+from tests.encryption_test_helper import KeyWrapper
 import tests.settings_real as settings
 
 # Warning:
@@ -40,6 +41,13 @@ LOCAL_APPEND_BLOB_FILES = [
     ('APPD-2500M+000B', 2500, 0),
 ]
 
+# Client side encrypted block blobs, to measure the throughput of the
+# decryption done by the parallel download threads
+LOCAL_ENCRYPTED_BLOCK_BLOB_FILES = [
+    ('ENCR-0080M+013B', 80, 13),
+    ('ENCR-0500M+000B', 500, 0),
+]
+
 CONNECTION_COUNTS = [1, 2, 5, 10, 50]
 
 CONTAINER_NAME = 'performance'
@@ -135,11 +143,14 @@ def main():
     bbs = BlockBlobService(settings.STORAGE_ACCOUNT_NAME, settings.STORAGE_ACCOUNT_KEY)
     pbs = PageBlobService(settings.STORAGE_ACCOUNT_NAME, settings.STORAGE_ACCOUNT_KEY)
     abs = AppendBlobService(settings.STORAGE_ACCOUNT_NAME, settings.STORAGE_ACCOUNT_KEY)
+    ebbs = BlockBlobService(settings.STORAGE_ACCOUNT_NAME, settings.STORAGE_ACCOUNT_KEY)
+    ebbs.key_encryption_key = KeyWrapper('key1')
     service.create_container(CONTAINER_NAME)
 
     process(bbs, LOCAL_BLOCK_BLOB_FILES, CONNECTION_COUNTS)
     process(pbs, LOCAL_PAGE_BLOB_FILES, CONNECTION_COUNTS)
     process(abs, LOCAL_APPEND_BLOB_FILES, CONNECTION_COUNTS)
+    process(ebbs, LOCAL_ENCRYPTED_BLOCK_BLOB_FILES, CONNECTION_COUNTS)
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,193 @@
+# -------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+# --------------------------------------------------------------------------
+import threading
+import time
+
+from azure.common import (
+    AzureHttpError,
+    AzureMissingResourceHttpError,
+)
+from azure.storage.blob import (
+    AppendBlobService,
+    BlockBlobService,
+)
+from azure.storage.blob.models import (
+    AppendBlockProperties,
+    Blob,
+    BlobBlock,
+    BlobBlockList,
+    BlobBlockState,
+    BlobProperties,
+    ContentSettings,
+    ResourceProperties,
+)
+
+
+class FakeBlockBlobService(BlockBlobService):
+    '''
+    Keeps the blocks of a single block blob in memory, recording the uploaded blocks.
+    '''
+
+    def __init__(self):
+        super(FakeBlockBlobService, self).__init__('account', 'a2V5')
+        self.blocks = {}
+        self.committed_block_ids = None
+        self.uploaded_block_ids = []
+        self.fail_after_blocks = None
+        self.sources = {}
+        self.copied_ranges = []
+        self.committed_settings = None
+        self.put_blobs = {}
+        self.failing_blob_names = set()
+        self.block_delay = None
+        self.gate = None
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def _put_blob(self, container_name, blob_name, blob, **kwargs):
+        if blob_name in self.failing_blob_names:
+            raise AzureHttpError('Server Busy', 503)
+        self.put_blobs[blob_name] = blob
+        return ResourceProperties()
+
+    def get_block_list(self, container_name, blob_name, snapshot=None, block_list_type=None,
+                       lease_id=None, timeout=None):
+        if self.committed_block_ids is None and not self.blocks:
+            raise AzureMissingResourceHttpError('Not Found', 404)
+        block_list = BlobBlockList()
+        block_list.committed_blocks = [BlobBlock(block_id, BlobBlockState.Committed)
+                                       for block_id in self.committed_block_ids or []]
+        for block_id, block in self.blocks.items():
+            if block_id not in (self.committed_block_ids or []):
+                uncommitted_block = BlobBlock(block_id, BlobBlockState.Uncommitted)
+                uncommitted_block._set_size(len(block))
+                block_list.uncommitted_blocks.append(uncommitted_block)
+        return block_list
+
+    def _put_block(self, container_name, blob_name, block, block_id, **kwargs):
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            if self.gate is not None:
+                self.gate.wait()
+            if self.block_delay is not None:
+                time.sleep(self.block_delay)
+            with self.lock:
+                if self.fail_after_blocks is not None and len(self.uploaded_block_ids) >= self.fail_after_blocks:
+                    raise AzureHttpError('Server Busy', 503)
+                self.uploaded_block_ids.append(block_id)
+                self.blocks[block_id] = block.read() if hasattr(block, 'read') else block
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+    def _put_block_list(self, container_name, blob_name, block_list, **kwargs):
+        for block in block_list:
+            if block.state == BlobBlockState.Committed:
+                assert block.id in self.committed_block_ids
+            else:
+                assert block.id in self.blocks
+        self.committed_block_ids = [block.id for block in block_list]
+        self.committed_settings = (kwargs.get('content_settings'), kwargs.get('metadata'))
+        props = ResourceProperties()
+        props.etag = 'etag'
+        return props
+
+    def get_content(self):
+        '''
+        Returns the content of the committed blob, or None if nothing was committed.
+        '''
+        if self.committed_block_ids is None:
+            return None
+        return b''.join(self.blocks[block_id] for block_id in self.committed_block_ids)
+
+    def _get_copy_source_properties(self, copy_source_url, timeout=None):
+        props = BlobProperties()
+        props.content_length = len(self.sources[copy_source_url])
+        props.etag = 'etag'
+        props.content_settings = ContentSettings(content_type='text/csv')
+        return Blob(copy_source_url, None, None, props, {'source': copy_source_url})
+
+    def put_block_from_url(self, container_name, blob_name, copy_source_url, source_range_start,
+                           source_range_end, block_id, source_content_md5=None, lease_id=None, timeout=None):
+        self.copied_ranges.append((copy_source_url, source_range_start, source_range_end))
+        self.blocks[block_id] = self.sources[copy_source_url][source_range_start:source_range_end + 1]
+
+
+class FakeAppendBlobService(AppendBlobService):
+    '''
+    Keeps the append blobs of a container in memory, with their blocks.
+    '''
+
+    def __init__(self):
+        super(FakeAppendBlobService, self).__init__('account', 'a2V5')
+        self.blobs = {}
+        self.lock = threading.Lock()
+        self.lose_next_response = False
+        self.get_requests = []
+
+    def create_blob(self, container_name, blob_name, if_none_match=None, **kwargs):
+        with self.lock:
+            if if_none_match == '*' and blob_name in self.blobs:
+                raise AzureHttpError('Blob Already Exists', 409)
+            self.blobs[blob_name] = []
+
+    def list_blobs(self, container_name, prefix=None, **kwargs):
+        for name in sorted(self.blobs):
+            if name.startswith(prefix or ''):
+                yield Blob(name, None, None, self._get_properties(name), {})
+
+    def get_blob_properties(self, container_name, blob_name, **kwargs):
+        return Blob(blob_name, None, None, self._get_properties(blob_name), {})
+
+    def append_block(self, container_name, blob_name, block, appendpos_condition=None, **kwargs):
+        with self.lock:
+            blocks = self.blobs[blob_name]
+            length = sum(len(existing) for existing in blocks)
+            if appendpos_condition is not None and appendpos_condition != length:
+                raise AzureHttpError('Append Position Condition Not Met', 412)
+            blocks.append(block)
+            if self.lose_next_response:
+                # the response is lost, and the retry fails the position condition
+                self.lose_next_response = False
+                raise AzureHttpError('Append Position Condition Not Met', 412)
+
+        props = AppendBlockProperties()
+        props.append_offset = length
+        props.committed_block_count = len(blocks)
+        return props
+
+    def exists(self, container_name, blob_name=None, **kwargs):
+        return blob_name in self.blobs
+
+    def _get_blob(self, container_name, blob_name, start_range=None, end_range=None, if_match=None,
+                  if_none_match=None, **kwargs):
+        # the data already appended never changes, so it is read without an etag
+        assert if_match is None
+        with self.lock:
+            self.get_requests.append((blob_name, start_range, if_none_match))
+            if blob_name not in self.blobs:
+                raise AzureMissingResourceHttpError('Not Found', 404)
+            props = self._get_properties(blob_name)
+            if if_none_match == props.etag:
+                raise AzureHttpError('Not Modified', 304)
+            content = self.get_content(blob_name)
+            if start_range >= len(content):
+                raise AzureHttpError('Range Not Satisfiable', 416)
+        return Blob(blob_name, None, content[start_range:end_range + 1], props, {})
+
+    def get_content(self, blob_name):
+        return b''.join(self.blobs[blob_name])
+
+    def _get_properties(self, blob_name):
+        props = BlobProperties()
+        props.blob_type = 'AppendBlob'
+        props.etag = 'etag{0}'.format(len(self.blobs[blob_name]))
+        props.content_length = len(self.get_content(blob_name))
+        props.append_blob_committed_block_count = len(self.blobs[blob_name])
+        return props
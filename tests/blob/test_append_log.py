@@ -0,0 +1,247 @@
+# coding: utf-8
+
+# -------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+# --------------------------------------------------------------------------
+import os
+import threading
+import time
+
+from azure.common import AzureHttpError
+from azure.storage.blob import (
+    AppendBlobLogWriter,
+    LogRecord,
+    ShardedLogWriter,
+)
+from azure.storage.blob._blob_io import _pack_log_record
+from tests.blob.fake_service_helper import FakeAppendBlobService
+from tests.testcase import (
+    StorageTestCase,
+)
+
+# ------------------------------------------------------------------------------
+
+
+class StorageAppendLogTest(StorageTestCase):
+
+    def setUp(self):
+        super(StorageAppendLogTest, self).setUp()
+        self.service = FakeAppendBlobService()
+        self.service.MAX_BLOCK_SIZE = 1024
+
+    def test_log_writer_coalesces_small_writes(self):
+        records = [os.urandom(10) for _ in range(1000)]
+
+        with self.service.open_log_writer('container', 'app.log', flush_interval=60) as writer:
+            self.assertIsInstance(writer, AppendBlobLogWriter)
+            for record in records:
+                writer.write(record)
+
+        self.assertEqual(['app.log.000000'], writer.segments)
+        self.assertEqual(b''.join(records), self.service.get_content('app.log.000000'))
+        self.assertEqual(10, len(self.service.blobs['app.log.000000']))
+
+    def test_log_writer_flushes_after_interval(self):
+        writer = self.service.open_log_writer('container', 'app.log', flush_interval=0.05)
+        try:
+            writer.write(b'record')
+            time.sleep(0.5)
+            self.assertEqual(b'record', self.service.get_content('app.log.000000'))
+        finally:
+            writer.close()
+
+    def test_log_writer_rolls_over_segments(self):
+        content = os.urandom(10 * 1024)
+
+        with self.service.open_log_writer('container', 'app.log', max_segment_blocks=3) as writer:
+            writer.write(content)
+
+        self.assertEqual(['app.log.000000', 'app.log.000001', 'app.log.000002', 'app.log.000003'],
+                         writer.segments)
+        self.assertEqual([3, 3, 3, 1], [len(self.service.blobs[name]) for name in writer.segments])
+        self.assertEqual(content, b''.join(self.service.get_content(name) for name in writer.segments))
+
+    def test_log_writer_continues_last_segment(self):
+        self.service.blobs['app.log.000000'] = [b'a'] * 3
+        self.service.blobs['app.log.000001'] = [b'b']
+
+        with self.service.open_log_writer('container', 'app.log', max_segment_blocks=3) as writer:
+            writer.write(b'c' * 3 * 1024)
+
+        self.assertEqual(['app.log.000001', 'app.log.000002'], writer.segments)
+        self.assertEqual(b'b' + b'c' * 2 * 1024, self.service.get_content('app.log.000001'))
+        self.assertEqual(b'c' * 1024, self.service.get_content('app.log.000002'))
+
+    def test_log_writer_appends_retried_block_once(self):
+        with self.service.open_log_writer('container', 'app.log') as writer:
+            writer.write(b'a' * 1024)
+            writer.flush()
+            self.service.lose_next_response = True
+            writer.write(b'b' * 1024)
+            writer.write(b'c' * 1024)
+
+        self.assertEqual(b'a' * 1024 + b'b' * 1024 + b'c' * 1024, self.service.get_content('app.log.000000'))
+
+    def test_log_writer_fails_if_segment_appended_to(self):
+        writer = self.service.open_log_writer('container', 'app.log')
+        writer.write(b'a' * 1024)
+        writer.flush()
+        self.service.blobs['app.log.000000'].append(b'other writer')
+        writer.write(b'b' * 1024)
+
+        with self.assertRaises(AzureHttpError):
+            writer.close()
+
+    def test_sharded_log_reads_records_in_write_order(self):
+        records = [os.urandom(i % 50) for i in range(500)]
+
+        with self.service.open_sharded_log_writer('container', 'app.log', 4, max_segment_blocks=2) as writer:
+            self.assertIsInstance(writer, ShardedLogWriter)
+            sequences = [writer.write_record(record) for record in records]
+
+        self.assertEqual(sorted(sequences), sequences)
+        for shard in range(4):
+            # every shard got a quarter of the records and rolled over segments
+            self.assertTrue(self.service.blobs['app.log.{0:03d}.000001'.format(shard)])
+        read = list(self.service.read_sharded_log('container', 'app.log'))
+        self.assertTrue(all(isinstance(record, LogRecord) for record in read))
+        self.assertEqual(records, [record.data for record in read])
+        self.assertEqual(sequences, [record.sequence for record in read])
+        self.assertEqual([i % 4 for i in range(500)], [record.shard for record in read])
+
+    def test_sharded_log_writes_records_of_key_to_one_shard(self):
+        with self.service.open_sharded_log_writer('container', 'app.log', 3) as writer:
+            for i in range(30):
+                writer.write_record(b'record', key='key{0}'.format(i % 5))
+            writer.write_record(b'bytes key', key=b'key0')
+
+        read = list(self.service.read_sharded_log('container', 'app.log'))
+        shards = {}
+        for i, record in enumerate(read[:30]):
+            shards.setdefault(i % 5, set()).add(record.shard)
+        self.assertTrue(all(len(shard) == 1 for shard in shards.values()))
+        self.assertEqual(shards[0], {read[30].shard})
+
+    def test_sharded_log_writers_write_in_parallel(self):
+        threads = []
+        with self.service.open_sharded_log_writer('container', 'app.log', 4) as writer:
+            for thread_index in range(4):
+                def write_records(thread_index=thread_index):
+                    for i in range(100):
+                        writer.write_record(u'{0}-{1}'.format(thread_index, i).encode('utf-8'))
+                threads.append(threading.Thread(target=write_records))
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        read = [record.data.decode('utf-8') for record in self.service.read_sharded_log('container', 'app.log')]
+        self.assertEqual(400, len(read))
+        for thread_index in range(4):
+            # the records of each thread are read in the order they were written
+            self.assertEqual([u'{0}-{1}'.format(thread_index, i) for i in range(100)],
+                             [data for data in read if data.startswith(u'{0}-'.format(thread_index))])
+
+    def test_read_sharded_log_skips_record_being_written(self):
+        with self.service.open_sharded_log_writer('container', 'app.log', 1) as writer:
+            writer.write_record(b'first')
+            writer.write_record(b'second')
+        # half of a record, appended by a writer still running
+        self.service.blobs['app.log.000.000000'].append(b'\x00' * 6)
+
+        read = list(self.service.read_sharded_log('container', 'app.log'))
+
+        self.assertEqual([b'first', b'second'], [record.data for record in read])
+
+    def test_read_sharded_log_skips_records_of_stopped_writers(self):
+        records = []
+        # the first writer stops in the data of a record, the second in the header of one
+        for data, truncated_length in [(b'a' * 100, 50), (b'b' * 100, 10)]:
+            with self.service.open_sharded_log_writer('container', 'app.log', 1) as writer:
+                for i in range(3):
+                    records.append(u'record {0}'.format(len(records)).encode('utf-8'))
+                    writer.write_record(records[-1])
+            self.service.blobs['app.log.000.000000'].append(
+                _pack_log_record(writer._sequence + 1, data)[:truncated_length])
+        with self.service.open_sharded_log_writer('container', 'app.log', 1) as writer:
+            records.append(b'last record')
+            writer.write_record(records[-1])
+
+        read = list(self.service.read_sharded_log('container', 'app.log'))
+
+        self.assertEqual(records, [record.data for record in read])
+
+    def test_tail_reads_only_appended_data(self):
+        self.service.blobs['app.log'] = [b'abc']
+        tail = self.service.tail_append_blob('container', 'app.log', min_poll_interval=0.01, idle_timeout=0.2)
+
+        self.assertEqual(b'abc', next(tail))
+        self.service.blobs['app.log'].append(b'def')
+        self.assertEqual(b'def', next(tail))
+        self.assertEqual([], list(tail))
+
+        requests = self.service.get_requests
+        self.assertEqual(('app.log', 0, None), requests[0])
+        self.assertEqual(('app.log', 3, 'etag1'), requests[1])
+        # the idle polls are conditional on the etag read last
+        self.assertTrue(all(request == ('app.log', 6, 'etag2') for request in requests[3:]))
+
+    def test_tail_reads_backlog_larger_than_chunk(self):
+        self.service.MAX_CHUNK_GET_SIZE = 4
+        self.service.blobs['app.log'] = [b'0123456789']
+
+        data = self.service.tail_append_blob('container', 'app.log', min_poll_interval=0.01, idle_timeout=0.1)
+
+        self.assertEqual(b'0123456789', b''.join(data))
+        # only the polls after the backlog was read are conditional
+        requests = self.service.get_requests
+        self.assertEqual([('app.log', 0, None), ('app.log', 4, None), ('app.log', 8, None)], requests[:3])
+        self.assertTrue(all(request == ('app.log', 10, 'etag1') for request in requests[3:]))
+
+    def test_tail_polls_less_often_while_idle(self):
+        self.service.blobs['app.log'] = []
+
+        list(self.service.tail_append_blob('container', 'app.log', min_poll_interval=0.01,
+                                           max_poll_interval=0.08, idle_timeout=0.5))
+
+        # 0.01, 0.02, 0.04, then every 0.08 seconds
+        self.assertLess(len(self.service.get_requests), 12)
+
+    def test_tail_waits_for_blob_to_be_created(self):
+        tail = self.service.tail_append_blob('container', 'app.log', min_poll_interval=0.01)
+        timer = threading.Timer(0.1, lambda: self.service.blobs.update({'app.log': [b'created']}))
+        timer.start()
+
+        self.assertEqual(b'created', next(tail))
+        timer.join()
+
+    def test_tail_reads_recreated_blob_from_start(self):
+        self.service.blobs['app.log'] = [b'a' * 10]
+        tail = self.service.tail_append_blob('container', 'app.log', min_poll_interval=0.01, idle_timeout=1)
+        self.assertEqual(b'a' * 10, next(tail))
+
+        self.service.blobs['app.log'] = [b'ne', b'w']
+
+        self.assertEqual(b'new', next(tail))
+
+    def test_tail_log_follows_segments(self):
+        content = os.urandom(5 * 1024)
+        with self.service.open_log_writer('container', 'app.log', max_segment_blocks=2) as writer:
+            writer.write(content)
+
+        data = self.service.tail_log('container', 'app.log', min_poll_interval=0.01, idle_timeout=0.1)
+
+        self.assertEqual(content, b''.join(data))
+        self.assertEqual(['app.log.000000', 'app.log.000001', 'app.log.000002'],
+                         sorted(set(request[0] for request in self.service.get_requests)))
+
+    def test_tail_log_reads_segment_backlog_before_next_segment(self):
+        self.service.MAX_CHUNK_GET_SIZE = 4
+        self.service.blobs['app.log.000000'] = [b'0123456789']
+        self.service.blobs['app.log.000001'] = [b'XYZ']
+
+        data = self.service.tail_log('container', 'app.log', min_poll_interval=0.01, idle_timeout=0.1)
+
+        self.assertEqual(b'0123456789XYZ', b''.join(data))
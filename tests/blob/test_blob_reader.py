@@ -0,0 +1,138 @@
+# coding: utf-8
+
+# -------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+# --------------------------------------------------------------------------
+import io
+import os
+import zipfile
+
+from azure.common import AzureHttpError
+from azure.storage.blob import (
+    BlockBlobService,
+    Blob,
+    BlobProperties,
+    BlobReader,
+)
+from tests.testcase import (
+    StorageTestCase,
+)
+
+# ------------------------------------------------------------------------------
+
+
+class _FakeBlobService(BlockBlobService):
+    '''
+    Serves a blob from memory, recording the requests made.
+    '''
+
+    def __init__(self, content):
+        super(_FakeBlobService, self).__init__('account', 'a2V5')
+        self.content = content
+        self.etag = 'etag'
+        self.properties_requests = 0
+        self.requested_ranges = []
+
+    def get_blob_properties(self, container_name, blob_name, snapshot=None, **kwargs):
+        self.properties_requests += 1
+        props = BlobProperties()
+        props.etag = self.etag
+        props.content_length = len(self.content)
+        return Blob(blob_name, snapshot, None, props, {})
+
+    def _get_blob(self, container_name, blob_name, snapshot=None, start_range=None,
+                  end_range=None, if_match=None, **kwargs):
+        if if_match not in (None, '*', self.etag):
+            raise AzureHttpError('Precondition Failed', 412)
+        self.requested_ranges.append((start_range, end_range))
+        props = BlobProperties()
+        props.etag = self.etag
+        return Blob(blob_name, snapshot, self.content[start_range:end_range + 1], props, {})
+
+
+class StorageBlobReaderTest(StorageTestCase):
+
+    def test_read_footer_costs_one_small_request(self):
+        content = os.urandom(10 * 1024)
+        service = _FakeBlobService(content)
+
+        with service.open_blob('container', 'blob', block_size=1024) as reader:
+            self.assertIsInstance(reader, BlobReader)
+            self.assertEqual(len(content), reader.size)
+
+            # a Parquet reader reads the length of the footer, then the footer before it
+            reader.seek(-8, io.SEEK_END)
+            self.assertEqual(content[-8:], reader.read(8))
+            reader.seek(-100, io.SEEK_END)
+            self.assertEqual(content[-100:-8], reader.read(92))
+            self.assertEqual(len(content) - 8, reader.tell())
+
+        self.assertEqual(1, service.properties_requests)
+        self.assertEqual([(9 * 1024, 10 * 1024 - 1)], service.requested_ranges)
+
+    def test_sequential_reads_download_each_block_once(self):
+        content = os.urandom(10 * 1024 + 100)
+        service = _FakeBlobService(content)
+
+        with service.open_blob('container', 'blob', block_size=1024, max_connections=3,
+                               max_cached_blocks=2) as reader:
+            chunks = []
+            chunk = reader.read(300)
+            while chunk:
+                chunks.append(chunk)
+                chunk = reader.read(300)
+            cached_blocks = len(reader._cache)
+
+        self.assertEqual(content, b''.join(chunks))
+        self.assertEqual(11, len(service.requested_ranges))
+        self.assertEqual(11, len(set(service.requested_ranges)))
+        self.assertLessEqual(cached_blocks, 2)
+
+    def test_read_spanning_blocks_downloads_them_in_parallel(self):
+        content = os.urandom(4 * 1024)
+        service = _FakeBlobService(content)
+
+        with service.open_blob('container', 'blob', block_size=1024, max_connections=4) as reader:
+            reader.seek(100)
+            data = reader.read()
+
+        self.assertEqual(content[100:], data)
+        self.assertEqual([(0, 1023), (1024, 2047), (2048, 3071), (3072, 4095)],
+                         sorted(service.requested_ranges))
+
+    def test_reads_fail_if_blob_changed(self):
+        service = _FakeBlobService(os.urandom(4 * 1024))
+
+        with service.open_blob('container', 'blob', block_size=1024) as reader:
+            reader.read(10)
+            service.etag = 'etag2'
+
+            with self.assertRaises(AzureHttpError):
+                reader.read(2048)
+
+    def test_open_blob_with_hint_skips_properties_request(self):
+        content = os.urandom(2 * 1024)
+        service = _FakeBlobService(content)
+        blob_hint = service.get_blob_properties('container', 'blob')
+
+        with service.open_blob('container', 'blob', blob_hint=blob_hint) as reader:
+            self.assertEqual(content, reader.read())
+            self.assertEqual(b'', reader.read())
+
+        self.assertEqual(1, service.properties_requests)
+
+    def test_zipfile_reads_member_in_place(self):
+        stream = io.BytesIO()
+        with zipfile.ZipFile(stream, 'w') as archive:
+            archive.writestr('first.txt', os.urandom(5000))
+            archive.writestr('second.txt', b'second member')
+        service = _FakeBlobService(stream.getvalue())
+
+        with service.open_blob('container', 'blob', block_size=1024) as reader:
+            with zipfile.ZipFile(io.BufferedReader(reader)) as archive:
+                self.assertEqual(b'second member', archive.read('second.txt'))
+
+        # the first member is never downloaded
+        self.assertLess(len(service.requested_ranges), 4)
@@ -0,0 +1,172 @@
+# coding: utf-8
+
+# -------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+# --------------------------------------------------------------------------
+import gc
+import os
+import threading
+import time
+
+from azure.common import AzureHttpError
+from azure.storage.blob import (
+    BlobWriter,
+    BlockBlobService,
+)
+from azure.storage.common._common_conversion import _get_content_md5
+from tests.blob.fake_service_helper import (
+    FakeAppendBlobService,
+    FakeBlockBlobService,
+)
+from tests.testcase import (
+    StorageTestCase,
+)
+
+# ------------------------------------------------------------------------------
+
+
+class StorageBlobWriterTest(StorageTestCase):
+
+    def test_write_commits_blocks_on_close(self):
+        content = os.urandom(10 * 1024 + 100)
+        service = FakeBlockBlobService()
+
+        with service.open_blob_for_write('container', 'blob', block_size=1024, max_connections=3) as writer:
+            self.assertIsInstance(writer, BlobWriter)
+            for start in range(0, len(content), 300):
+                writer.write(content[start:start + 300])
+            self.assertEqual(len(content), writer.tell())
+            # nothing is committed before the writer is closed
+            self.assertIsNone(service.get_content())
+
+        self.assertEqual(content, service.get_content())
+        self.assertEqual(11, len(service.blocks))
+        self.assertEqual('etag', writer.properties.etag)
+
+    def test_empty_writer_creates_empty_blob(self):
+        service = FakeBlockBlobService()
+
+        service.open_blob_for_write('container', 'blob').close()
+
+        self.assertEqual(b'', service.get_content())
+
+    def test_write_waits_for_uploads_once_buffers_are_used(self):
+        service = FakeBlockBlobService()
+        service.gate = threading.Event()
+        writer = service.open_blob_for_write('container', 'blob', block_size=1024, max_connections=2)
+        written = []
+
+        def write_blocks():
+            for _ in range(10):
+                writer.write(b'a' * 1024)
+                written.append(1024)
+        thread = threading.Thread(target=write_blocks)
+        thread.start()
+        time.sleep(0.2)
+
+        # two blocks uploading and one being written, then the writer waits
+        self.assertTrue(thread.is_alive())
+        self.assertEqual(3, len(written))
+        self.assertEqual(3, writer._buffer_count)
+
+        service.gate.set()
+        thread.join()
+        writer.close()
+        self.assertEqual(b'a' * 10 * 1024, service.get_content())
+        self.assertEqual(3, writer._buffer_count)
+        self.assertLessEqual(service.max_in_flight, 2)
+
+    def test_upload_error_is_raised_by_next_write_or_close(self):
+        service = FakeBlockBlobService()
+        service.fail_after_blocks = 1
+        writer = service.open_blob_for_write('container', 'blob', block_size=1024, max_connections=1)
+
+        with self.assertRaises(AzureHttpError):
+            for _ in range(10):
+                writer.write(b'a' * 1024)
+        with self.assertRaises(AzureHttpError):
+            writer.close()
+
+        self.assertTrue(writer.closed)
+        self.assertIsNone(service.get_content())
+
+    def test_validate_content_sends_buffer_as_stream(self):
+        service = BlockBlobService('account', 'a2V5')
+        requests = []
+
+        def _perform_request(request, parser=None, parser_args=None, operation_context=None):
+            if request.query['comp'] == 'block':
+                requests.append((request.headers.get('Content-MD5'), request.body.read()))
+        service._perform_request = _perform_request
+        content = os.urandom(1500)
+
+        with service.open_blob_for_write('container', 'blob', block_size=1024, max_connections=1,
+                                         validate_content=True) as writer:
+            writer.write(content)
+
+        self.assertEqual(2, len(requests))
+        self.assertEqual((_get_content_md5(content[:1024]), content[:1024]), requests[0])
+        self.assertEqual((_get_content_md5(content[1024:]), content[1024:]), requests[1])
+
+    def test_append_writer_appends_blocks_in_order(self):
+        service = FakeAppendBlobService()
+        service.blobs['blob'] = [b'header']
+        service.MAX_BLOCK_SIZE = 1024
+        content = os.urandom(5 * 1024 + 10)
+
+        with service.open_blob_for_write('container', 'blob', max_connections=3) as writer:
+            writer.write(content[:100])
+            writer.flush()
+            self.assertEqual(b'header' + content[:100], service.get_content('blob'))
+            writer.write(content[100:])
+
+        self.assertEqual(b'header' + content, service.get_content('blob'))
+
+    def test_append_writer_fails_if_blob_appended_to(self):
+        service = FakeAppendBlobService()
+        service.blobs['blob'] = []
+        service.MAX_BLOCK_SIZE = 1024
+        writer = service.open_blob_for_write('container', 'blob')
+
+        writer.write(b'a' * 1024)
+        writer.flush()
+        service.blobs['blob'].append(b'other writer')
+        writer.write(b'b' * 1024)
+
+        with self.assertRaises(AzureHttpError):
+            writer.close()
+
+    def test_error_in_with_block_aborts_writer(self):
+        service = FakeBlockBlobService()
+
+        with self.assertRaises(RuntimeError):
+            with service.open_blob_for_write('container', 'blob', block_size=4) as writer:
+                writer.write(b'hello world')
+                raise RuntimeError()
+
+        self.assertTrue(writer.closed)
+        self.assertIsNone(service.get_content())
+
+    def test_writer_not_closed_is_not_committed(self):
+        service = FakeBlockBlobService()
+        writer = service.open_blob_for_write('container', 'blob', block_size=4)
+        writer.write(b'hello world')
+
+        del writer
+        gc.collect()
+
+        self.assertIsNone(service.get_content())
+
+    def test_write_fails_before_block_limit(self):
+        service = FakeBlockBlobService()
+        writer = service.open_blob_for_write('container', 'blob', block_size=4)
+        writer._target.max_blocks = 3
+
+        with self.assertRaises(ValueError):
+            writer.write(b'a' * 20)
+
+        writer.abort()
+        self.assertEqual(3, len(service.blocks))
+        self.assertIsNone(service.get_content())
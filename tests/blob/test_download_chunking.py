@@ -0,0 +1,571 @@
+# coding: utf-8
+
+# -------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+# --------------------------------------------------------------------------
+import os
+import shutil
+from datetime import datetime
+from io import BytesIO
+
+from azure.common import AzureHttpError
+from azure.storage.blob import (
+    BlockBlobService,
+    PageBlobService,
+)
+from azure.storage.blob._download_chunking import _download_blob_chunks
+from azure.storage.blob._encryption import (
+    _encrypt_blob,
+    _get_blob_decryption_key,
+)
+from azure.storage.blob.models import (
+    Blob,
+    BlobProperties,
+    PageRange,
+)
+from azure.storage.common._scheduler import _TransferScheduler
+from azure.storage.common._transfer import _set_local_file_time
+from azure.storage.common._tuning import _TransferTuner
+from tests.encryption_test_helper import KeyWrapper
+from tests.testcase import (
+    StorageTestCase,
+)
+
+# ------------------------------------------------------------------------------
+
+
+class _FakeBlobService(object):
+    '''
+    Serves ranged gets of a block blob from memory, recording the requested ranges.
+    '''
+
+    def __init__(self, content):
+        self.content = content
+        self.requested_ranges = []
+        self._transfer_scheduler = _TransferScheduler()
+
+    def _run_transfer(self, transfer):
+        return self._transfer_scheduler.run(transfer, 64)
+
+    def _get_blob(self, container_name, blob_name, snapshot=None, start_range=None,
+                  end_range=None, validate_content=False, lease_id=None, if_modified_since=None,
+                  if_unmodified_since=None, if_match=None, if_none_match=None, timeout=None,
+                  _context=None, _decrypt=True):
+        self.requested_ranges.append((start_range, end_range))
+        props = BlobProperties()
+        props.blob_type = 'BlockBlob'
+        props.etag = 'etag'
+        props.content_range = 'bytes {0}-{1}/{2}'.format(start_range, end_range, len(self.content))
+        return Blob(blob_name, snapshot, self.content[start_range:end_range + 1], props, {})
+
+
+class _FakePageBlobService(PageBlobService):
+    '''
+    Serves a page blob from memory, reporting the non-zero pages as valid page ranges.
+    '''
+
+    def __init__(self, content):
+        super(_FakePageBlobService, self).__init__('account', 'a2V5')
+        self.content = content
+        self.requested_ranges = []
+        self.listed_segments = []
+        self.snapshots = {}
+        self.etag = 'etag'
+        self.fail_after_requests = None
+        self.metadata = {}
+
+    def get_blob_properties(self, container_name, blob_name, snapshot=None, **kwargs):
+        props = BlobProperties()
+        props.blob_type = 'PageBlob'
+        props.etag = self.etag
+        props.content_length = len(self.snapshots[snapshot] if snapshot else self.content)
+        return Blob(blob_name, snapshot, None, props, self.metadata)
+
+    def snapshot_blob(self, container_name, blob_name, **kwargs):
+        snapshot = 'snapshot{0}'.format(len(self.snapshots))
+        self.snapshots[snapshot] = self.content
+        return Blob(blob_name, snapshot)
+
+    def get_page_ranges(self, container_name, blob_name, snapshot=None, start_range=None,
+                        end_range=None, **kwargs):
+        self.listed_segments.append((start_range, end_range))
+        content = self.snapshots[snapshot] if snapshot else self.content
+        page_ranges = []
+        for page_start in range(start_range, end_range + 1, 512):
+            if content[page_start:page_start + 512] != b'\x00' * 512:
+                page_ranges.append(PageRange(page_start, page_start + 511))
+        return page_ranges
+
+    def get_page_ranges_diff(self, container_name, blob_name, previous_snapshot, snapshot=None,
+                             start_range=None, end_range=None, **kwargs):
+        previous_content = self.snapshots[previous_snapshot]
+        content = self.snapshots[snapshot]
+        page_ranges = []
+        for page_start in range(start_range, end_range + 1, 512):
+            page = content[page_start:page_start + 512]
+            if page != previous_content[page_start:page_start + 512]:
+                page_ranges.append(PageRange(page_start, page_start + 511, page == b'\x00' * 512))
+        return page_ranges
+
+    def _get_blob(self, container_name, blob_name, snapshot=None, start_range=None,
+                  end_range=None, if_match=None, **kwargs):
+        if self.fail_after_requests is not None and len(self.requested_ranges) >= self.fail_after_requests:
+            raise AzureHttpError('Server Busy', 503)
+        if if_match not in (None, '*', self.etag):
+            raise AzureHttpError('Precondition Failed', 412)
+        self.requested_ranges.append((start_range, end_range))
+        content = self.snapshots[snapshot] if snapshot else self.content
+        props = BlobProperties()
+        props.etag = self.etag
+        props.content_length = len(content[start_range:end_range + 1])
+        props.content_range = 'bytes {0}-{1}/{2}'.format(start_range, end_range, len(content))
+        return Blob(blob_name, snapshot, content[start_range:end_range + 1], props, {})
+
+
+class _FakeContainerService(BlockBlobService):
+    '''
+    Serves the blobs of a single container from memory, recording the requested ranges.
+    '''
+
+    def __init__(self, blobs):
+        super(_FakeContainerService, self).__init__('account', 'a2V5')
+        self.blobs = blobs
+        self.metadata = {}
+        self.requests = []
+
+    def list_blobs(self, container_name, prefix=None, include=None, **kwargs):
+        for name in sorted(self.blobs):
+            if name.startswith(prefix or ''):
+                props = BlobProperties()
+                props.content_length = len(self.blobs[name])
+                props.etag = 'etag'
+                props.last_modified = datetime(2018, 1, 1, 12, 30)
+                metadata = self.metadata.get(name, {}) if include is not None and include.metadata else {}
+                yield Blob(name, None, None, props, metadata)
+
+    def _get_blob(self, container_name, blob_name, snapshot=None, start_range=None,
+                  end_range=None, if_match=None, **kwargs):
+        if 'failing' in blob_name:
+            raise AzureHttpError('Server Busy', 503)
+        assert if_match == 'etag'
+        self.requests.append((blob_name, start_range, end_range))
+        content = self.blobs[blob_name]
+        props = BlobProperties()
+        props.etag = 'etag'
+        if start_range is None:
+            return Blob(blob_name, snapshot, content, props, {})
+        props.content_range = 'bytes {0}-{1}/{2}'.format(start_range, end_range, len(content))
+        return Blob(blob_name, snapshot, content[start_range:end_range + 1], props, {})
+
+
+class StorageBlobDownloadChunkingTest(StorageTestCase):
+
+    def _download_encrypted(self, data, start_range, end_range, max_connections):
+        kek = KeyWrapper('key1')
+        encryption_data, encrypted_data = _encrypt_blob(data, kek)
+        service = _FakeBlobService(encrypted_data)
+        cek, iv = _get_blob_decryption_key(True, kek, None, {'encryptiondata': encryption_data})
+
+        stream = BytesIO()
+        _download_blob_chunks(service, 'container', 'blob', None, end_range - start_range, 1024, 0,
+                              start_range, end_range, stream, max_connections, None, False, None,
+                              None, None, None, None, None, None, cek, iv)
+        return service, stream.getvalue()
+
+    def test_parallel_download_decrypts_chunks(self):
+        data = os.urandom(10 * 1024 + 7)
+
+        # the encrypted blob is padded to 10 * 1024 + 16 bytes
+        _, downloaded = self._download_encrypted(data, 0, 10 * 1024 + 16, 4)
+
+        self.assertEqual(data, downloaded)
+
+    def test_sequential_download_decrypts_unaligned_range(self):
+        data = os.urandom(10 * 1024)
+
+        service, downloaded = self._download_encrypted(data, 1000, 5001, 1)
+
+        self.assertEqual(data[1000:5001], downloaded)
+        # every request is expanded to whole cipher blocks plus the IV block
+        for start, end in service.requested_ranges:
+            self.assertEqual(0, start % 16)
+            self.assertEqual(15, end % 16)
+
+    def test_tuned_download_sizes_chunks_from_measured_requests(self):
+        data = os.urandom(1024 * 1024 + 7)
+        service = _FakeBlobService(data)
+        tuner = _TransferTuner()
+
+        # a previous transfer measured 256KB/s
+        tuner.record(256 * 1024, 1)
+
+        stream = BytesIO()
+        _download_blob_chunks(service, 'container', 'blob', None, len(data), 1024, 0,
+                              0, len(data), stream, 2, None, False, None,
+                              None, None, None, None, None, None, tuner=tuner)
+
+        self.assertEqual(data, stream.getvalue())
+        self.assertEqual((0, 256 * 1024 - 1), sorted(service.requested_ranges)[0])
+
+    def test_tuned_download_keeps_chunks_within_md5_limit(self):
+        data = os.urandom(9 * 1024 * 1024)
+        service = _FakeBlobService(data)
+        tuner = _TransferTuner()
+
+        # a previous transfer measured 100MB/s, which would size chunks far beyond 4MB
+        tuner.record(100 * 1024 * 1024, 1)
+
+        stream = BytesIO()
+        _download_blob_chunks(service, 'container', 'blob', None, len(data), 1024 * 1024, 0,
+                              0, len(data), stream, 2, None, True, None,
+                              None, None, None, None, None, None, tuner=tuner)
+
+        self.assertEqual(data, stream.getvalue())
+        for start, end in service.requested_ranges:
+            self.assertLessEqual(end + 1 - start, 4 * 1024 * 1024)
+
+    def test_restore_truncated_backup_fails_without_changing_image(self):
+        page = os.urandom(512)
+        service = _FakePageBlobService(page * 4)
+        name = self.get_resource_name('backup')
+        backup_path, image_path = [name + suffix + '.temp.dat' for suffix in ('full', 'image')]
+
+        try:
+            service.backup_blob('container', 'blob', backup_path)
+            with open(backup_path, 'r+b') as stream:
+                stream.truncate(os.path.getsize(backup_path) - 100)
+            with open(image_path, 'wb') as stream:
+                stream.write(b'image')
+
+            with self.assertRaises(ValueError):
+                service.restore_blob_backup(image_path, backup_path)
+            with open(image_path, 'rb') as stream:
+                image = stream.read()
+        finally:
+            for file_path in (backup_path, image_path):
+                if os.path.isfile(file_path):
+                    os.remove(file_path)
+
+        self.assertEqual(b'image', image)
+
+    def test_get_blob_decryption_key_unencrypted_blob(self):
+        cek, iv = _get_blob_decryption_key(False, KeyWrapper('key1'), None, {})
+
+        self.assertIsNone(cek)
+        self.assertIsNone(iv)
+
+        with self.assertRaises(ValueError):
+            _get_blob_decryption_key(True, KeyWrapper('key1'), None, {})
+
+    def test_get_blob_decryption_key_unwraps_cek(self):
+        kek = KeyWrapper('key1')
+        encryption_data, _ = _encrypt_blob(b'content', kek)
+
+        cek, iv = _get_blob_decryption_key(True, kek, None, {'EncryptionData': encryption_data})
+
+        self.assertEqual(32, len(cek))
+        self.assertEqual(16, len(iv))
+
+    def test_get_blob_to_sparse_path_downloads_valid_ranges_only(self):
+        page = os.urandom(512)
+        empty_page = b'\x00' * 512
+        content = page + empty_page * 3 + page * 2 + empty_page * 2
+        service = _FakePageBlobService(content)
+        service.MAX_PAGE_RANGES_SEGMENT_SIZE = 1024
+        service.MAX_CHUNK_GET_SIZE = 1024
+        file_path = self.get_resource_name('sparse') + '.temp.dat'
+
+        try:
+            blob = service.get_blob_to_sparse_path('container', 'blob', file_path, max_connections=2)
+            with open(file_path, 'rb') as stream:
+                downloaded = stream.read()
+        finally:
+            if os.path.isfile(file_path):
+                os.remove(file_path)
+
+        self.assertEqual(len(content), blob.properties.content_length)
+        self.assertEqual(content, downloaded)
+        self.assertEqual(service.listed_segments, [(0, 1023), (1024, 2047), (2048, 3071), (3072, 4095)])
+        # the two adjacent valid pages are fetched with a single request
+        self.assertEqual(sorted(service.requested_ranges), [(0, 511), (2048, 3071)])
+
+    def test_incremental_backup_and_restore(self):
+        page = os.urandom(512)
+        empty_page = b'\x00' * 512
+        service = _FakePageBlobService(page * 2 + empty_page * 2)
+        service.MAX_PAGE_SIZE = 1024
+        name = self.get_resource_name('backup')
+        full_backup_path, incremental_backup_path, image_path = [
+            name + suffix + '.temp.dat' for suffix in ('full', 'incremental', 'image')]
+
+        try:
+            full_backup = service.backup_blob('container', 'blob', full_backup_path)
+
+            # change one page, clear another and grow the blob
+            service.content = empty_page + page * 2 + empty_page + page
+            service.requested_ranges = []
+            incremental_backup = service.backup_blob(
+                'container', 'blob', incremental_backup_path, previous_snapshot=full_backup.snapshot)
+
+            service.restore_blob_backup(image_path, full_backup_path)
+            restored_backup = service.restore_blob_backup(image_path, incremental_backup_path)
+            with open(image_path, 'rb') as stream:
+                restored = stream.read()
+        finally:
+            for file_path in (full_backup_path, incremental_backup_path, image_path):
+                if os.path.isfile(file_path):
+                    os.remove(file_path)
+
+        self.assertEqual(service.content, restored)
+        self.assertIsNone(full_backup.previous_snapshot)
+        self.assertEqual(full_backup.snapshot, restored_backup.previous_snapshot)
+        self.assertEqual(incremental_backup.snapshot, restored_backup.snapshot)
+        self.assertEqual([(0, 511)], [(r.start, r.end) for r in restored_backup.cleared_ranges])
+        # only the changed pages are downloaded
+        self.assertEqual(sorted(service.requested_ranges), [(1024, 1535), (2048, 2559)])
+
+    def test_download_with_blob_hint_skips_first_get(self):
+        content = os.urandom(10 * 1024 + 100)
+        service = _FakePageBlobService(content)
+        service.MAX_CHUNK_GET_SIZE = 1024
+        blob_hint = service.get_blob_properties('container', 'blob')
+        stream = BytesIO()
+        progress = []
+
+        blob = service.get_blob_to_stream('container', 'blob', stream, max_connections=3, blob_hint=blob_hint,
+                                          progress_callback=lambda current, total: progress.append(current))
+
+        self.assertEqual(content, stream.getvalue())
+        self.assertEqual(len(content), blob.properties.content_length)
+        self.assertEqual('etag', blob.properties.etag)
+        self.assertEqual(len(content), progress[-1])
+        # every request is a chunk, with no first get to find out the size
+        self.assertEqual([(start, min(start + 1023, len(content) - 1)) for start in range(0, len(content), 1024)],
+                         sorted(service.requested_ranges))
+
+    def test_download_range_with_blob_hint(self):
+        content = os.urandom(4 * 1024)
+        service = _FakePageBlobService(content)
+        service.MAX_CHUNK_GET_SIZE = 1024
+        blob_hint = service.get_blob_properties('container', 'blob')
+
+        blob = service.get_blob_to_bytes('container', 'blob', start_range=1000, end_range=2999, max_connections=2,
+                                         blob_hint=blob_hint)
+
+        self.assertEqual(content[1000:3000], blob.content)
+        self.assertEqual(2000, blob.properties.content_length)
+        self.assertEqual('bytes 1000-2999/4096', blob.properties.content_range)
+        self.assertEqual([(1000, 2023), (2024, 2999)], sorted(service.requested_ranges))
+
+    def test_download_with_blob_hint_fails_if_blob_changed(self):
+        service = _FakePageBlobService(os.urandom(4 * 1024))
+        service.MAX_CHUNK_GET_SIZE = 1024
+        blob_hint = service.get_blob_properties('container', 'blob')
+        service.etag = 'etag2'
+
+        with self.assertRaises(AzureHttpError):
+            service.get_blob_to_stream('container', 'blob', BytesIO(), max_connections=2, blob_hint=blob_hint)
+
+    def test_download_without_blob_hint_starts_with_probe(self):
+        content = os.urandom(4 * 1024)
+        service = _FakePageBlobService(content)
+        service.MAX_CHUNK_GET_SIZE = 1024
+        service.MAX_PROBE_GET_SIZE = 512
+
+        blob = service.get_blob_to_bytes('container', 'blob', max_connections=2)
+
+        self.assertEqual(content, blob.content)
+        self.assertEqual((0, 511), service.requested_ranges[0])
+        self.assertEqual([(512, 1535), (1536, 2559), (2560, 3583), (3584, 4095)],
+                         sorted(service.requested_ranges[1:]))
+
+    def test_checkpointed_download_resumes_missing_chunks(self):
+        content = os.urandom(10 * 1024 + 100)
+        service = _FakePageBlobService(content)
+        service.MAX_CHUNK_GET_SIZE = 1024
+        service.fail_after_requests = 4
+        name = self.get_resource_name('checkpoint')
+        file_path, checkpoint_path = name + '.temp.dat', name + '.checkpoint.temp.dat'
+
+        try:
+            with self.assertRaises(AzureHttpError):
+                service.get_blob_to_path('container', 'blob', file_path, max_connections=1,
+                                         checkpoint_path=checkpoint_path)
+            self.assertTrue(os.path.isfile(checkpoint_path))
+
+            service.fail_after_requests = None
+            service.requested_ranges = []
+            progress = []
+            blob = service.get_blob_to_path('container', 'blob', file_path, max_connections=3,
+                                            checkpoint_path=checkpoint_path,
+                                            progress_callback=lambda current, total: progress.append(current))
+            checkpoint_deleted = not os.path.isfile(checkpoint_path)
+            with open(file_path, 'rb') as stream:
+                downloaded = stream.read()
+        finally:
+            for path in (file_path, checkpoint_path):
+                if os.path.isfile(path):
+                    os.remove(path)
+
+        self.assertEqual(content, downloaded)
+        self.assertEqual(len(content), blob.properties.content_length)
+        self.assertTrue(checkpoint_deleted)
+        self.assertEqual(len(content), progress[-1])
+        # only the chunks missing from the checkpoint are downloaded again
+        self.assertEqual(7, len(service.requested_ranges))
+        self.assertNotIn((0, 1023), service.requested_ranges)
+
+    def test_checkpointed_download_reports_decrypted_length(self):
+        data = os.urandom(10 * 1024 + 7)
+        kek = KeyWrapper('key1')
+        encryption_data, encrypted_data = _encrypt_blob(data, kek)
+        service = _FakePageBlobService(encrypted_data)
+        service.metadata = {'encryptiondata': encryption_data}
+        service.key_encryption_key = kek
+        service.MAX_CHUNK_GET_SIZE = 1024
+        name = self.get_resource_name('checkpoint')
+        file_path, checkpoint_path = name + '.temp.dat', name + '.checkpoint.temp.dat'
+
+        try:
+            service.fail_after_requests = 4
+            with self.assertRaises(AzureHttpError):
+                service.get_blob_to_path('container', 'blob', file_path, max_connections=1,
+                                         checkpoint_path=checkpoint_path)
+            service.fail_after_requests = None
+            blob = service.get_blob_to_path('container', 'blob', file_path, max_connections=3,
+                                            checkpoint_path=checkpoint_path)
+            with open(file_path, 'rb') as stream:
+                downloaded = stream.read()
+        finally:
+            for path in (file_path, checkpoint_path):
+                if os.path.isfile(path):
+                    os.remove(path)
+
+        self.assertEqual(data, downloaded)
+        self.assertEqual(len(data), blob.properties.content_length)
+
+    def test_checkpointed_download_restarts_if_blob_changed(self):
+        service = _FakePageBlobService(os.urandom(4 * 1024))
+        service.MAX_CHUNK_GET_SIZE = 1024
+        service.fail_after_requests = 2
+        name = self.get_resource_name('checkpoint')
+        file_path, checkpoint_path = name + '.temp.dat', name + '.checkpoint.temp.dat'
+
+        try:
+            with self.assertRaises(AzureHttpError):
+                service.get_blob_to_path('container', 'blob', file_path, max_connections=1,
+                                         checkpoint_path=checkpoint_path)
+
+            service.content = os.urandom(3 * 1024)
+            service.etag = 'etag2'
+            service.fail_after_requests = None
+            service.requested_ranges = []
+            service.get_blob_to_path('container', 'blob', file_path, max_connections=1,
+                                     checkpoint_path=checkpoint_path)
+            with open(file_path, 'rb') as stream:
+                downloaded = stream.read()
+        finally:
+            for path in (file_path, checkpoint_path):
+                if os.path.isfile(path):
+                    os.remove(path)
+
+        self.assertEqual(service.content, downloaded)
+        self.assertEqual(3, len(service.requested_ranges))
+
+    def test_download_prefix_downloads_listed_blobs(self):
+        blobs = {
+            'backup/a.txt': os.urandom(100),
+            'backup/logs/b.txt': os.urandom(200),
+            'backup/large.dat': os.urandom(2 * 1024 + 10),
+            'backup/logs/': b'',
+            'backup/failing.txt': os.urandom(10),
+            'other/c.txt': os.urandom(10),
+        }
+        expected = dict(blobs)
+        service = _FakeContainerService(blobs)
+        service.MAX_SINGLE_GET_SIZE = 1024
+        service.MAX_CHUNK_GET_SIZE = 1024
+        directory_path = self.get_resource_name('directory') + '.temp'
+
+        try:
+            result = service.download_prefix('container', 'backup/', directory_path, max_connections=3)
+            downloaded = {}
+            for name in ('a.txt', 'logs/b.txt', 'large.dat'):
+                with open(os.path.join(directory_path, *name.split('/')), 'rb') as stream:
+                    downloaded[name] = stream.read()
+            downloaded_files = sorted(os.listdir(directory_path))
+
+            # the second download skips the files which did not change
+            service.requests = []
+            blobs['backup/a.txt'] = os.urandom(101)
+            second_result = service.download_prefix('container', 'backup/', directory_path, skip_unchanged=True)
+        finally:
+            shutil.rmtree(directory_path, ignore_errors=True)
+
+        for name, content in downloaded.items():
+            self.assertEqual(expected['backup/' + name], content)
+        self.assertEqual(['a.txt', 'large.dat', 'logs'], downloaded_files)
+        self.assertEqual(3, result.files)
+        self.assertEqual(1, len(result.failures))
+        self.assertEqual('backup/failing.txt', result.failures[0][0])
+        # the small blobs are downloaded with a single get of the whole blob
+        self.assertIn(('backup/a.txt', None, None), service.requests)
+        self.assertEqual(1, second_result.files)
+        self.assertEqual(2, second_result.skipped_files)
+        self.assertEqual([('backup/a.txt', None, None)], service.requests)
+
+    def test_download_prefix_downloads_blob_named_as_prefix_to_file(self):
+        service = _FakeContainerService({'backup/data.csv': b'content'})
+        directory_path = self.get_resource_name('directory') + '.temp'
+
+        try:
+            result = service.download_prefix('container', 'backup/data.csv', directory_path)
+            downloaded_files = sorted(os.listdir(directory_path))
+            with open(os.path.join(directory_path, 'data.csv'), 'rb') as stream:
+                content = stream.read()
+        finally:
+            shutil.rmtree(directory_path, ignore_errors=True)
+
+        self.assertEqual(1, result.files)
+        self.assertEqual(['data.csv'], downloaded_files)
+        self.assertEqual(b'content', content)
+
+    def test_download_prefix_skips_unchanged_encrypted_blobs(self):
+        data = os.urandom(100)
+        encryption_data, encrypted_data = _encrypt_blob(data, KeyWrapper('key1'))
+        service = _FakeContainerService({'backup/a.txt': encrypted_data})
+        service.metadata['backup/a.txt'] = {'encryptiondata': encryption_data}
+        service.key_encryption_key = KeyWrapper('key1')
+        directory_path = self.get_resource_name('directory') + '.temp'
+
+        try:
+            # the file of a previous download holds the decrypted content, without the padding
+            os.makedirs(directory_path)
+            file_path = os.path.join(directory_path, 'a.txt')
+            with open(file_path, 'wb') as stream:
+                stream.write(data)
+            _set_local_file_time(file_path, datetime(2018, 1, 1, 12, 30))
+
+            result = service.download_prefix('container', 'backup/', directory_path, skip_unchanged=True)
+        finally:
+            shutil.rmtree(directory_path, ignore_errors=True)
+
+        self.assertEqual(112, len(encrypted_data))
+        self.assertEqual(1, result.skipped_files)
+        self.assertEqual([], service.requests)
+
+    def test_download_prefix_rejects_names_outside_of_directory(self):
+        service = _FakeContainerService({'../escaped.txt': b'content'})
+        directory_path = self.get_resource_name('directory') + '.temp'
+
+        try:
+            result = service.download_container('container', directory_path)
+        finally:
+            shutil.rmtree(directory_path, ignore_errors=True)
+
+        self.assertEqual(0, result.files)
+        self.assertIsInstance(result.failures[0][1], ValueError)
+        self.assertFalse(os.path.exists(os.path.join(os.path.dirname(os.path.abspath(directory_path)),
+                                                     'escaped.txt')))
@@ -6,11 +6,25 @@
 # license information.
 # --------------------------------------------------------------------------
 import os
+import shutil
+import time
 
-from azure.storage.blob._upload_chunking import _SubStream
+from azure.common import AzureHttpError
+from azure.storage.blob import BlockBlobService
+from azure.storage.blob._upload_chunking import (
+    _BlockBlobDeltaChunkUploader,
+    _SubStream,
+    _PageBlobChunkUploader,
+)
+from azure.storage.blob.models import ResourceProperties
+from azure.storage.common import (
+    RequestPriority,
+    RequestScheduler,
+)
 from threading import Lock
 from io import (BytesIO, SEEK_SET)
 
+from tests.blob.fake_service_helper import FakeBlockBlobService
 from tests.testcase import (
     StorageTestCase,
 )
@@ -109,3 +123,338 @@ class StorageBlobUploadChunkingTest(StorageTestCase):
         finally:
             wrapped_stream.close()
             substream.close()
+
+    # this is a white box test that's designed to make sure only the non-empty pages
+    # of a chunk are uploaded, with nearby non-empty pages coalesced into one call
+    def test_page_blob_chunk_uploads_only_non_empty_pages(self):
+        class _FakePageBlobService(object):
+            def __init__(self):
+                self.updated_ranges = []
+
+            def _update_page(self, container_name, blob_name, page, start_range, end_range, **kwargs):
+                self.updated_ranges.append((start_range, end_range, page))
+                return ResourceProperties()
+
+        page = b'\x01' * 512
+        empty_page = b'\x00' * 512
+        gap = empty_page * 128
+        chunk = page + page + empty_page + empty_page + page + gap + page + empty_page
+        service = _FakePageBlobService()
+        uploader = _PageBlobChunkUploader(service, 'container', 'blob', len(chunk) * 2, len(chunk),
+                                          BytesIO(), False, None, False, None, None, None, None)
+        uploader.if_match = None
+
+        uploader.process_chunk((len(chunk), chunk))
+        uploader.process_chunk((0, empty_page * 6))
+
+        # the small gap is uploaded as zeros, the 64KB one is skipped
+        self.assertEqual(service.updated_ranges, [
+            (len(chunk), len(chunk) + 2559, page + page + empty_page + empty_page + page),
+            (len(chunk) + 2560 + len(gap), len(chunk) + 3071 + len(gap), page),
+        ])
+
+    # this is a white box test that's designed to make sure the holes of a sparse file
+    # are skipped without being read, if the file system supports it
+    def test_page_blob_chunks_skip_holes_of_sparse_file(self):
+        file_path = self.get_resource_name('sparse') + '.temp.dat'
+        data = os.urandom(1000)
+        with open(file_path, 'wb') as stream:
+            stream.truncate(64 * 1024 * 1024)
+            stream.seek(32 * 1024 * 1024 + 100)
+            stream.write(data)
+
+        progress = []
+        try:
+            with open(file_path, 'rb') as stream:
+                uploader = _PageBlobChunkUploader(None, 'container', 'blob', 64 * 1024 * 1024, 4 * 1024 * 1024,
+                                                  stream, False, lambda current, total: progress.append(current),
+                                                  False, None, None, None, None)
+                chunks = list(uploader.get_chunk_streams())
+                supports_holes = os.lseek(stream.fileno(), 0, os.SEEK_DATA) > 0
+        finally:
+            os.remove(file_path)
+
+        # the chunks report their progress once uploaded, the holes as they are skipped
+        self.assertEqual(64 * 1024 * 1024, progress[-1] + sum(len(chunk[1]) for chunk in chunks))
+        if supports_holes:
+            self.assertEqual(1, len(chunks))
+            chunk_start, chunk_data = chunks[0]
+            self.assertLess(len(chunk_data), 4 * 1024 * 1024)
+            data_start = 32 * 1024 * 1024 + 100 - chunk_start
+            self.assertEqual(data, chunk_data[data_start:data_start + len(data)])
+
+    def test_sync_blob_uploads_only_changed_blocks(self):
+        data = os.urandom(256 * 1024)
+        service = FakeBlockBlobService()
+        service.DELTA_SYNC_BLOCK_SIZE = 4 * 1024
+
+        service.sync_blob_from_stream('container', 'blob', BytesIO(data), max_connections=2)
+        first_upload_ids = list(service.uploaded_block_ids)
+
+        # the blocks are content defined, so they are bounded but not all of the same size
+        block_sizes = [len(service.blocks[block_id]) for block_id in service.committed_block_ids]
+        self.assertEqual(data, service.get_content())
+        self.assertEqual(len(first_upload_ids), len(service.committed_block_ids))
+        self.assertTrue(all(1024 <= size <= 16 * 1024 for size in block_sizes[:-1]))
+        self.assertTrue(len(set(block_sizes)) > 1)
+
+        # insert a few bytes in the middle of the content, which shifts all the following offsets
+        data = data[:100 * 1024] + b'inserted' + data[100 * 1024:]
+        service.uploaded_block_ids = []
+        progress = []
+        service.sync_blob_from_stream('container', 'blob', BytesIO(data), count=len(data), max_connections=1,
+                                      progress_callback=lambda current, total: progress.append((current, total)))
+
+        self.assertEqual(data, service.get_content())
+        self.assertEqual((len(data), len(data)), progress[-1])
+        # only the blocks around the edit are uploaded again
+        self.assertTrue(0 < len(service.uploaded_block_ids) <= 3)
+        self.assertTrue(sum(len(service.blocks[block_id]) for block_id in service.uploaded_block_ids) <= 48 * 1024)
+
+    def test_resumable_upload_reuses_journaled_blocks(self):
+        data = os.urandom(10 * 1024 + 100)
+        service = FakeBlockBlobService()
+        service.MAX_BLOCK_SIZE = 1024
+        service.fail_after_blocks = 6
+        name = self.get_resource_name('resumable')
+        file_path, journal_path = name + '.temp.dat', name + '.journal.temp.dat'
+
+        try:
+            with open(file_path, 'wb') as stream:
+                stream.write(data)
+
+            with self.assertRaises(AzureHttpError):
+                service.create_blob_from_path('container', 'blob', file_path, max_connections=1,
+                                              journal_path=journal_path)
+            self.assertTrue(os.path.isfile(journal_path))
+            self.assertIsNone(service.committed_block_ids)
+
+            # a block whose uncommitted copy was lost on the service is uploaded again
+            del service.blocks[service.uploaded_block_ids[2]]
+            lost_block_id = service.uploaded_block_ids[2]
+            service.fail_after_blocks = None
+            service.uploaded_block_ids = []
+            progress = []
+            service.create_blob_from_path('container', 'blob', file_path, max_connections=2,
+                                          journal_path=journal_path, validate_content=True,
+                                          progress_callback=lambda current, total: progress.append(current))
+            journal_deleted = not os.path.isfile(journal_path)
+        finally:
+            for path in (file_path, journal_path):
+                if os.path.isfile(path):
+                    os.remove(path)
+
+        self.assertEqual(data, service.get_content())
+        self.assertTrue(journal_deleted)
+        self.assertEqual(len(data), progress[-1])
+        self.assertEqual(6, len(service.uploaded_block_ids))
+        self.assertIn(lost_block_id, service.uploaded_block_ids)
+
+    def test_block_size_fits_blob_in_block_limit(self):
+        service = FakeBlockBlobService()
+        megabyte = 1024 * 1024
+
+        self.assertEqual(service.MAX_BLOCK_SIZE, service._get_block_size(None))
+        self.assertEqual(service.MAX_BLOCK_SIZE, service._get_block_size(50000 * service.MAX_BLOCK_SIZE))
+        self.assertEqual(5 * megabyte, service._get_block_size(50000 * service.MAX_BLOCK_SIZE + 1))
+        self.assertEqual(20 * megabyte, service._get_block_size(1000000 * megabyte))
+        self.assertEqual(21 * megabyte, service._get_block_size(1000000 * megabyte + 1))
+
+    def test_auto_tuned_upload_sizes_blocks_from_measured_requests(self):
+        data = os.urandom(3 * 1024 * 1024 + 100)
+        service = FakeBlockBlobService()
+        service.AUTO_TUNE_TRANSFERS = True
+        service.MAX_SINGLE_PUT_SIZE = 1024
+        service.MAX_BLOCK_SIZE = 1024 * 1024
+
+        # a previous transfer measured 512KB/s
+        service._transfer_tuner.record(512 * 1024, 1)
+
+        service.create_blob_from_bytes('container', 'blob', data, max_connections=2)
+
+        self.assertEqual(data, service.get_content())
+        self.assertEqual(512 * 1024, len(service.blocks[service.committed_block_ids[0]]))
+
+    def test_copy_blob_from_url_puts_blocks_from_source_ranges(self):
+        source_url = 'https://source.blob.core.windows.net/container/blob?sig=signature'
+        service = FakeBlockBlobService()
+        service.sources[source_url] = os.urandom(10 * 1024 + 100)
+        service.MAX_COPY_BLOCK_SIZE = 1024
+
+        service.copy_blob_from_url('container', 'blob', source_url, max_connections=3)
+
+        self.assertEqual(service.sources[source_url], service.get_content())
+        self.assertEqual(11, len(service.copied_ranges))
+        self.assertIn((source_url, 10 * 1024, 10 * 1024 + 99), service.copied_ranges)
+        # the content settings and metadata of the source are preserved
+        content_settings, metadata = service.committed_settings
+        self.assertEqual('text/csv', content_settings.content_type)
+        self.assertEqual({'source': source_url}, metadata)
+
+    def test_compose_blob_concatenates_sources(self):
+        source_urls = ['https://source.blob.core.windows.net/container/part{0}?sig=signature'.format(i)
+                       for i in range(3)]
+        service = FakeBlockBlobService()
+        for i, source_url in enumerate(source_urls):
+            service.sources[source_url] = os.urandom(1000 * i + 500)
+        service.MAX_COPY_BLOCK_SIZE = 1024
+
+        service.compose_blob('container', 'blob', [source_urls[0], (source_urls[2], 100, 2099), source_urls[1]],
+                             metadata={'composed': 'true'}, max_connections=3)
+
+        expected = service.sources[source_urls[0]] + service.sources[source_urls[2]][100:2100] + \
+            service.sources[source_urls[1]]
+        self.assertEqual(expected, service.get_content())
+        # the sources larger than a block are split
+        self.assertEqual(5, len(service.copied_ranges))
+        self.assertIn((source_urls[2], 1124, 2099), service.copied_ranges)
+        self.assertEqual((None, {'composed': 'true'}), service.committed_settings)
+
+    def test_copy_source_service_parses_account_urls(self):
+        service = BlockBlobService('account', 'a2V5')
+
+        source_service, container_name, blob_name, snapshot = service._get_copy_source_service(
+            'https://source.blob.core.windows.net/container/dir/blob%201?snapshot=2018-01-01&sig=signature')
+        self.assertEqual(('container', 'dir/blob 1', '2018-01-01'), (container_name, blob_name, snapshot))
+        self.assertEqual('source', source_service.account_name)
+        self.assertEqual('source.blob.core.windows.net', source_service.primary_endpoint)
+        self.assertEqual('sig=signature', source_service.sas_token)
+
+    def test_copy_source_service_parses_path_style_urls(self):
+        service = BlockBlobService(is_emulated=True)
+
+        # a blob of the emulator account of the service
+        source_service, container_name, blob_name, _ = service._get_copy_source_service(
+            'http://127.0.0.1:10000/devstoreaccount1/container/blob')
+        self.assertEqual(('container', 'blob'), (container_name, blob_name))
+        self.assertEqual('devstoreaccount1', source_service.account_name)
+        self.assertEqual('127.0.0.1:10000/devstoreaccount1', source_service.primary_endpoint)
+
+        # a blob of another account addressed by path
+        source_service, container_name, blob_name, _ = BlockBlobService('account', 'a2V5')._get_copy_source_service(
+            'http://localhost:10000/other/container/dir/blob')
+        self.assertEqual(('container', 'dir/blob'), (container_name, blob_name))
+        self.assertEqual('other', source_service.account_name)
+        self.assertEqual('localhost:10000/other', source_service.primary_endpoint)
+
+    def test_copy_source_service_shares_client_settings(self):
+        service = BlockBlobService('account', 'a2V5', socket_timeout=(5, 50))
+        service.request_scheduler = RequestScheduler(max_requests=4)
+        service.priority = RequestPriority.BULK
+        service.set_proxy('127.0.0.1', 8888, 'user', 'password')
+
+        source_service, _, _, _ = service._get_copy_source_service(
+            'https://source.blob.core.windows.net/container/blob?sig=signature')
+        self.assertIs(service.request_scheduler, source_service.request_scheduler)
+        self.assertEqual(RequestPriority.BULK, source_service.priority)
+        self.assertEqual((5, 50), source_service.socket_timeout)
+        self.assertEqual(service._httpclient.proxies, source_service._httpclient.proxies)
+        self.assertIs(service.request_session, source_service.request_session)
+        self.assertEqual(service.retry, source_service.retry)
+
+    def test_compose_blob_rejects_too_many_blocks(self):
+        source_url = 'https://source.blob.core.windows.net/container/blob?sig=signature'
+        service = FakeBlockBlobService()
+        service.MAX_COPY_BLOCK_SIZE = 1
+
+        with self.assertRaises(ValueError):
+            service.compose_blob('container', 'blob', [(source_url, 0, 50000)])
+
+        self.assertEqual([], service.copied_ranges)
+
+    def test_upload_directory_puts_small_files_and_chunks_large_files(self):
+        directory_path = self.get_resource_name('directory') + '.temp'
+        files = {
+            'a.txt': os.urandom(100),
+            'logs/b.txt': os.urandom(200),
+            'logs/old/c.txt': os.urandom(300),
+            'large.dat': os.urandom(2 * 1024 + 10),
+            'failing.txt': os.urandom(10),
+        }
+        service = FakeBlockBlobService()
+        service.MAX_SINGLE_PUT_SIZE = 1024
+        service.MAX_BLOCK_SIZE = 512
+        service.failing_blob_names.add('backup/failing.txt')
+        progress = []
+
+        try:
+            for relative_path, data in files.items():
+                file_path = os.path.join(directory_path, *relative_path.split('/'))
+                if not os.path.isdir(os.path.dirname(file_path)):
+                    os.makedirs(os.path.dirname(file_path))
+                with open(file_path, 'wb') as stream:
+                    stream.write(data)
+
+            result = service.upload_directory('container', directory_path, blob_prefix='backup/',
+                                              max_connections=3, progress_callback=progress.append)
+        finally:
+            shutil.rmtree(directory_path, ignore_errors=True)
+
+        # the small files are put at once, the large one in blocks
+        self.assertEqual(dict(('backup/' + name, files[name]) for name in ('a.txt', 'logs/b.txt', 'logs/old/c.txt')),
+                         service.put_blobs)
+        self.assertEqual(files['large.dat'], service.get_content())
+        self.assertEqual(5, len(service.uploaded_block_ids))
+        self.assertEqual(4, result.files)
+        self.assertEqual(sum(len(files[name]) for name in files if name != 'failing.txt'), result.bytes)
+        self.assertEqual(1, len(result.failures))
+        self.assertTrue(result.failures[0][0].endswith('failing.txt'))
+        self.assertIsInstance(result.failures[0][1], AzureHttpError)
+        self.assertEqual(5, len(progress))
+
+    def test_upload_directory_puts_blocks_of_large_file_in_parallel(self):
+        directory_path = self.get_resource_name('directory') + '.temp'
+        data = os.urandom(8 * 512)
+        service = FakeBlockBlobService()
+        service.MAX_SINGLE_PUT_SIZE = 1024
+        service.MAX_BLOCK_SIZE = 512
+        service.block_delay = 0.05
+
+        try:
+            os.makedirs(directory_path)
+            with open(os.path.join(directory_path, 'large.dat'), 'wb') as stream:
+                stream.write(data)
+
+            result = service.upload_directory('container', directory_path, max_connections=3)
+        finally:
+            shutil.rmtree(directory_path, ignore_errors=True)
+
+        self.assertEqual(1, result.files)
+        self.assertEqual(data, service.get_content())
+        # the idle threads of the directory upload help with the blocks of the file
+        self.assertGreater(service.max_in_flight, 1)
+        self.assertLessEqual(service.max_in_flight, 3)
+
+    def test_delta_sync_block_size_fits_blob_in_block_limit(self):
+        service = FakeBlockBlobService()
+        megabyte = 1024 * 1024
+
+        self.assertEqual(service.DELTA_SYNC_BLOCK_SIZE, service._get_delta_sync_block_size(None))
+        self.assertEqual(service.DELTA_SYNC_BLOCK_SIZE, service._get_delta_sync_block_size(25000 * megabyte))
+        self.assertEqual(2 * megabyte, service._get_delta_sync_block_size(50000 * megabyte))
+        self.assertEqual(3 * megabyte, service._get_delta_sync_block_size(50000 * megabyte + 1))
+
+    def test_delta_sync_fails_before_block_limit(self):
+        service = FakeBlockBlobService()
+        service.DELTA_SYNC_BLOCK_SIZE = 64
+
+        with self.assertRaises(ValueError):
+            service.sync_blob_from_stream('container', 'blob', BytesIO(os.urandom(51000 * 64)),
+                                          max_connections=1)
+        self.assertIsNone(service.committed_block_ids)
+
+    def test_delta_chunker_hashes_quickly(self):
+        data = os.urandom(8 * 1024 * 1024)
+        service = FakeBlockBlobService()
+        uploader = _BlockBlobDeltaChunkUploader(service, 'container', 'blob', None, 1024 * 1024, BytesIO(data),
+                                                False, None, False, None, None, None, None)
+        uploader.min_block_size = None
+
+        start = time.time()
+        chunks = list(uploader.get_chunk_streams())
+        elapsed = time.time() - start
+
+        self.assertEqual(data, b''.join(chunk for _, chunk in chunks))
+        self.assertTrue(all(256 * 1024 <= len(chunk) <= 4 * 1024 * 1024 for _, chunk in chunks[:-1]))
+        # a byte at a time, this took over a second
+        self.assertLess(elapsed, 1)
@@ -0,0 +1,167 @@
+# coding: utf-8
+
+# -------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+# --------------------------------------------------------------------------
+import copy
+import threading
+
+from azure.common import (
+    AzureException,
+    AzureHttpError,
+    AzureMissingResourceHttpError,
+)
+from azure.storage.blob.models import CopyProperties
+from azure.storage.common._copy import _CopyScheduler
+from tests.testcase import (
+    StorageTestCase,
+)
+
+# ------------------------------------------------------------------------------
+
+
+class _FakeCopies(object):
+    '''
+    Simulates service side copies which progress by half of the source at every poll.
+    '''
+
+    def __init__(self, failing_sources=(), unstartable_sources=(), stalled_sources=(),
+                 unreachable_sources=(), replaced_sources=(), unpollable_sources=()):
+        self.failing_sources = set(failing_sources)
+        self.replaced_sources = set(replaced_sources)
+        self.unpollable_sources = set(unpollable_sources)
+        self.unstartable_sources = set(unstartable_sources)
+        self.unreachable_sources = set(unreachable_sources)
+        self.stalled_sources = set(stalled_sources)
+        self.copies = {}
+        self.aborted = []
+        self.max_pending = 0
+        self.lock = threading.Lock()
+
+    def _copy_properties(self, copy_id, status, copied):
+        copy = CopyProperties()
+        copy.id = copy_id
+        copy.status = status
+        copy.progress = '{0}/100'.format(copied)
+        return copy
+
+    def start_copy(self, operation):
+        if operation.copy_source in self.unstartable_sources:
+            raise AzureHttpError('Server Busy', 503)
+        if operation.copy_source in self.unreachable_sources:
+            raise AzureException('Connection reset')
+        with self.lock:
+            copy_id = '{0}-{1}'.format(operation.copy_source, operation.attempts)
+            self.copies[operation.destination] = [copy_id, 'pending', 0]
+            self.max_pending = max(self.max_pending,
+                                   len([c for c in self.copies.values() if c[1] == 'pending']))
+        return self._copy_properties(copy_id, 'pending', 0)
+
+    def get_copy_properties(self, operation):
+        with self.lock:
+            if operation.copy_source in self.unpollable_sources:
+                # the destination was deleted
+                raise AzureMissingResourceHttpError('Not Found', 404)
+            copy = self.copies[operation.destination]
+            if operation.copy_source in self.replaced_sources:
+                # another copy was started to the destination
+                copy[0] = 'other'
+            if copy[1] == 'pending' and operation.copy_source not in self.stalled_sources:
+                copy[2] += 50
+                if copy[2] == 100:
+                    copy[1] = 'success'
+                if operation.copy_source in self.failing_sources and operation.attempts == 1:
+                    copy[1] = 'failed'
+            return self._copy_properties(*copy)
+
+    def abort_copy(self, operation):
+        with self.lock:
+            self.copies[operation.destination][1] = 'aborted'
+            self.aborted.append(operation.copy.id)
+
+
+class _FastCopyScheduler(_CopyScheduler):
+    MIN_POLL_INTERVAL = 0
+    MAX_POLL_INTERVAL = 0.01
+
+
+class StorageCopySchedulerTest(StorageTestCase):
+
+    def _run(self, fake, copies, max_attempts=3, stall_timeout=None):
+        scheduler = _FastCopyScheduler(fake.start_copy, fake.get_copy_properties, fake.abort_copy,
+                                       2, 2, max_attempts, stall_timeout)
+        # the same operation is yielded as it changes, so record its state at every event
+        return [copy.copy(event) for event in scheduler.run(copies)]
+
+    def test_copies_run_with_bounded_concurrency(self):
+        fake = _FakeCopies()
+        copies = [('source{0}'.format(i), 'container', 'blob{0}'.format(i)) for i in range(5)]
+
+        events = self._run(fake, iter(copies))
+
+        done = [event for event in events if event.done]
+        self.assertEqual(5, len(done))
+        self.assertTrue(all(event.status == 'success' and event.attempts == 1 for event in done))
+        self.assertEqual(set(('container', 'blob{0}'.format(i)) for i in range(5)),
+                         set(event.destination for event in done))
+        self.assertEqual(2, fake.max_pending)
+        # the progress of each copy is reported as it changes
+        self.assertTrue(any(event.copy.progress == '50/100' for event in events))
+
+    def test_failed_copies_are_retried(self):
+        fake = _FakeCopies(failing_sources=['source0'], unstartable_sources=['source1'])
+
+        events = self._run(fake, [('source0', 'container', 'blob0'), ('source1', 'container', 'blob1')])
+
+        done = dict((event.copy_source, event) for event in events if event.done)
+        self.assertEqual('success', done['source0'].status)
+        self.assertEqual(2, done['source0'].attempts)
+        self.assertEqual('failed', done['source1'].status)
+        self.assertEqual(3, done['source1'].attempts)
+        self.assertIsInstance(done['source1'].error, AzureHttpError)
+
+    def test_copies_failing_without_response_do_not_stop_others(self):
+        fake = _FakeCopies(unreachable_sources=['source0'])
+
+        events = self._run(fake, [('source0', 'container', 'blob0'), ('source1', 'container', 'blob1')])
+
+        done = dict((event.copy_source, event) for event in events if event.done)
+        self.assertEqual('failed', done['source0'].status)
+        self.assertEqual(3, done['source0'].attempts)
+        self.assertIsInstance(done['source0'].error, AzureException)
+        self.assertEqual('success', done['source1'].status)
+
+    def test_stalled_copies_are_aborted(self):
+        fake = _FakeCopies(stalled_sources=['source0'])
+
+        events = self._run(fake, [('source0', 'container', 'blob0')], max_attempts=2, stall_timeout=0)
+
+        done = [event for event in events if event.done]
+        self.assertEqual(1, len(done))
+        self.assertEqual('aborted', done[0].status)
+        self.assertEqual(['source0-1', 'source0-2'], fake.aborted)
+
+    def test_superseded_copies_are_not_started_again(self):
+        fake = _FakeCopies(replaced_sources=['source0'])
+
+        events = self._run(fake, [('source0', 'container', 'blob0')])
+
+        done = [event for event in events if event.done]
+        self.assertEqual(1, len(done))
+        self.assertEqual('superseded', done[0].status)
+        self.assertEqual(1, done[0].attempts)
+        self.assertEqual('other', fake.copies[('container', 'blob0')][0])
+
+    def test_copies_which_cannot_be_polled_fail(self):
+        fake = _FakeCopies(unpollable_sources=['source0'])
+
+        events = self._run(fake, [('source0', 'container', 'blob0'), ('source1', 'container', 'blob1')],
+                           max_attempts=2)
+
+        done = dict((event.copy_source, event) for event in events if event.done)
+        self.assertEqual('failed', done['source0'].status)
+        self.assertEqual(2, done['source0'].attempts)
+        self.assertIsInstance(done['source0'].error, AzureMissingResourceHttpError)
+        self.assertEqual('success', done['source1'].status)
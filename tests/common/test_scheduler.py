@@ -0,0 +1,324 @@
+# coding: utf-8
+
+# -------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+# --------------------------------------------------------------------------
+import threading
+import time
+
+from azure.common import AzureHttpError
+from azure.storage.common import (
+    RequestPriority,
+    RequestScheduler,
+    no_retry,
+)
+from azure.storage.common._http import HTTPResponse
+from azure.storage.common._scheduler import (
+    _ScheduledTransfer,
+    _TransferScheduler,
+)
+from azure.storage.queue import QueueService
+from tests.testcase import (
+    StorageTestCase,
+)
+
+# ------------------------------------------------------------------------------
+
+
+def _map(scheduler, process, items, max_connections, max_workers, priority=RequestPriority.NORMAL):
+    return scheduler.run(_ScheduledTransfer(process, items, max_connections, priority), max_workers)
+
+
+class _ChunkRecorder(object):
+    '''
+    Processes chunks slowly, recording the most chunks in flight at once.
+    '''
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.processed = []
+
+    def process(self, chunk):
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(0.01)
+        with self.lock:
+            self.in_flight -= 1
+            self.processed.append(chunk)
+        return chunk * 2
+
+
+class StorageTransferSchedulerTest(StorageTestCase):
+
+    def test_map_returns_results_in_order(self):
+        scheduler = _TransferScheduler()
+        recorder = _ChunkRecorder()
+
+        results = _map(scheduler, recorder.process, range(20), 4, 64)
+
+        self.assertEqual([chunk * 2 for chunk in range(20)], results)
+        self.assertLessEqual(recorder.max_in_flight, 4)
+        self.assertEqual([], _map(scheduler, recorder.process, [], 4, 64))
+
+    def test_workers_are_reused_between_transfers(self):
+        scheduler = _TransferScheduler()
+
+        for _ in range(5):
+            _map(scheduler, _ChunkRecorder().process, range(8), 4, 64)
+
+        self.assertEqual(4, scheduler.workers)
+
+    def test_concurrent_transfers_share_global_limit(self):
+        scheduler = _TransferScheduler()
+        recorder = _ChunkRecorder()
+        results = {}
+
+        def transfer(name):
+            results[name] = _map(scheduler, recorder.process, range(name * 100, name * 100 + 12), 4, 6)
+
+        threads = [threading.Thread(target=transfer, args=(name,)) for name in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertLessEqual(recorder.max_in_flight, 6)
+        self.assertLessEqual(scheduler.workers, 6)
+        for name in range(4):
+            self.assertEqual([chunk * 2 for chunk in range(name * 100, name * 100 + 12)], results[name])
+
+    def test_transfers_take_turns(self):
+        scheduler = _TransferScheduler()
+        recorder = _ChunkRecorder()
+        first_started = threading.Event()
+
+        def process(chunk):
+            first_started.set()
+            return recorder.process(chunk)
+
+        # the first transfer could take all the workers by itself
+        thread = threading.Thread(target=_map, args=(scheduler, process, range(40), 2, 2))
+        thread.start()
+        first_started.wait()
+        _map(scheduler, recorder.process, range(1000, 1004), 2, 2)
+        second_done = len(recorder.processed)
+        thread.join()
+
+        self.assertLess(second_done, 20)
+
+    def test_first_error_stops_the_transfer(self):
+        scheduler = _TransferScheduler()
+        recorder = _ChunkRecorder()
+
+        def process(chunk):
+            if chunk == 2:
+                raise AzureHttpError('Server Busy', 503)
+            return recorder.process(chunk)
+
+        with self.assertRaises(AzureHttpError):
+            _map(scheduler, process, range(100), 2, 64)
+
+        self.assertLess(len(recorder.processed), 100)
+
+        # the workers survive the error
+        self.assertEqual([0, 2], _map(scheduler, recorder.process, range(2), 2, 64))
+
+    def test_chunks_are_pulled_when_workers_are_available(self):
+        scheduler = _TransferScheduler()
+        recorder = _ChunkRecorder()
+        pulled = []
+
+        def chunks():
+            for chunk in range(20):
+                # at most a chunk per connection is buffered ahead of the processed chunks
+                assert len(pulled) - len(recorder.processed) <= 3
+                pulled.append(chunk)
+                yield chunk
+
+        _map(scheduler, recorder.process, chunks(), 3, 64)
+
+        self.assertEqual(list(range(20)), pulled)
+
+    def test_nested_transfer_runs_on_worker(self):
+        scheduler = _TransferScheduler()
+
+        def process(chunk):
+            return sum(_map(scheduler, lambda item: item, range(chunk), 4, 1))
+
+        self.assertEqual([0, 0, 1, 3], _map(scheduler, process, range(4), 2, 1))
+
+    def test_nested_transfer_is_helped_by_free_workers(self):
+        scheduler = _TransferScheduler()
+        recorder = _ChunkRecorder()
+        completed = []
+        transfers = []
+
+        class _Transfer(_ScheduledTransfer):
+            def on_complete(self, item):
+                completed.append(item)
+
+        def process(chunk):
+            transfers.append(_Transfer(recorder.process, range(20), 3))
+            return scheduler.run(transfers[-1], 4)
+
+        self.assertEqual([[chunk * 2 for chunk in range(20)]], _map(scheduler, process, [0], 1, 4))
+        # the chunks of the nested transfer ran in parallel within its own limit
+        self.assertGreater(recorder.max_in_flight, 1)
+        self.assertLessEqual(recorder.max_in_flight, 3)
+        self.assertEqual(list(range(20)), sorted(completed))
+
+    def test_nested_transfer_stops_at_first_error(self):
+        scheduler = _TransferScheduler()
+        recorder = _ChunkRecorder()
+
+        def fail_at_two(chunk):
+            if chunk == 2:
+                raise AzureHttpError('Server Busy', 503)
+            return recorder.process(chunk)
+
+        def process(chunk):
+            return _map(scheduler, fail_at_two, range(100), 2, 4)
+
+        with self.assertRaises(AzureHttpError):
+            _map(scheduler, process, [0], 1, 4)
+
+        self.assertLess(len(recorder.processed), 100)
+
+    def test_chunk_raising_base_exception_concludes_transfer(self):
+        scheduler = _TransferScheduler()
+
+        def process(chunk):
+            if chunk == 1:
+                raise KeyboardInterrupt()
+            return chunk
+
+        with self.assertRaises(KeyboardInterrupt):
+            _map(scheduler, process, range(4), 2, 4)
+
+        # the remaining workers still run transfers
+        self.assertEqual([0, 1], _map(scheduler, lambda chunk: chunk, range(2), 2, 4))
+
+    def test_higher_priority_transfer_is_served_first(self):
+        scheduler = _TransferScheduler(aging_interval=60)
+        recorder = _ChunkRecorder()
+        bulk_started = threading.Event()
+
+        def process(chunk):
+            bulk_started.set()
+            return recorder.process(chunk)
+
+        thread = threading.Thread(target=_map, args=(scheduler, process, range(40), 2, 2, RequestPriority.BULK))
+        thread.start()
+        bulk_started.wait()
+        _map(scheduler, recorder.process, range(1000, 1010), 2, 2, RequestPriority.INTERACTIVE)
+        interactive_done = len(recorder.processed)
+        thread.join()
+
+        # only the bulk chunks in flight when the interactive transfer started ran before it
+        self.assertLessEqual(interactive_done, 13)
+
+    def test_lower_priority_transfer_is_not_starved(self):
+        scheduler = _TransferScheduler(aging_interval=0.05)
+        recorder = _ChunkRecorder()
+        interactive_started = threading.Event()
+
+        def process(chunk):
+            interactive_started.set()
+            return recorder.process(chunk)
+
+        thread = threading.Thread(target=_map, args=(scheduler, process, range(60), 1, 1,
+                                                       RequestPriority.INTERACTIVE))
+        thread.start()
+        interactive_started.wait()
+        _map(scheduler, recorder.process, range(1000, 1003), 1, 1, RequestPriority.BULK)
+        bulk_done = len(recorder.processed)
+        thread.join()
+
+        # a bulk chunk ages past the interactive ones every 10 chunks or so
+        self.assertLess(bulk_done, 50)
+
+
+class _FakeHttpClient(object):
+    '''
+    Holds each request until released, recording the order the requests were sent in.
+    '''
+
+    def __init__(self):
+        self.sent = []
+        self.release = threading.Event()
+
+    def perform_request(self, request):
+        self.sent.append(request.path)
+        self.release.wait()
+        return HTTPResponse(204, 'No Content', {}, b'')
+
+
+class StorageRequestSchedulerTest(StorageTestCase):
+
+    def _get_service(self, request_scheduler, priority, http_client):
+        service = QueueService('account', 'a2V5')
+        service._httpclient = http_client
+        service.retry = no_retry
+        service.request_scheduler = request_scheduler
+        service.priority = priority
+        return service
+
+    def test_requests_are_sent_by_priority(self):
+        request_scheduler = RequestScheduler(max_requests=1)
+        http_client = _FakeHttpClient()
+        bulk_service = self._get_service(request_scheduler, RequestPriority.BULK, http_client)
+        interactive_service = self._get_service(request_scheduler, RequestPriority.INTERACTIVE, http_client)
+
+        # the first request holds the only connection while the others queue up
+        threads = [threading.Thread(target=bulk_service.clear_messages, args=('first',))]
+        threads[0].start()
+        while not http_client.sent:
+            time.sleep(0.001)
+        for service, queue_name in ((bulk_service, 'bulk1'), (bulk_service, 'bulk2'),
+                                    (interactive_service, 'interactive')):
+            threads.append(threading.Thread(target=service.clear_messages, args=(queue_name,)))
+            threads[-1].start()
+        while sum(metrics.waiting_requests for metrics in request_scheduler.get_metrics().values()) < 3:
+            time.sleep(0.001)
+        http_client.release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(['/first/messages', '/interactive/messages'], http_client.sent[:2])
+        self.assertEqual(['/bulk1/messages', '/bulk2/messages'], sorted(http_client.sent[2:]))
+        metrics = request_scheduler.get_metrics()
+        self.assertEqual(3, metrics[RequestPriority.BULK].requests)
+        self.assertEqual(1, metrics[RequestPriority.INTERACTIVE].requests)
+        self.assertEqual(0, metrics[RequestPriority.NORMAL].requests)
+        self.assertGreater(metrics[RequestPriority.BULK].max_request_delay,
+                           metrics[RequestPriority.INTERACTIVE].mean_request_delay)
+        self.assertEqual(0, metrics[RequestPriority.BULK].waiting_requests)
+
+    def test_waiting_request_ages_past_higher_priorities(self):
+        request_scheduler = RequestScheduler(max_requests=1)
+        request_scheduler.AGING_INTERVAL = 0.05
+        http_client = _FakeHttpClient()
+        bulk_service = self._get_service(request_scheduler, RequestPriority.BULK, http_client)
+        interactive_service = self._get_service(request_scheduler, RequestPriority.INTERACTIVE, http_client)
+
+        threads = [threading.Thread(target=bulk_service.clear_messages, args=('first',))]
+        threads[0].start()
+        while not http_client.sent:
+            time.sleep(0.001)
+        threads.append(threading.Thread(target=bulk_service.clear_messages, args=('bulk',)))
+        threads[-1].start()
+        time.sleep(0.2)
+        threads.append(threading.Thread(target=interactive_service.clear_messages, args=('interactive',)))
+        threads[-1].start()
+        while sum(metrics.waiting_requests for metrics in request_scheduler.get_metrics().values()) < 2:
+            time.sleep(0.001)
+        http_client.release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(['/first/messages', '/bulk/messages', '/interactive/messages'], http_client.sent)
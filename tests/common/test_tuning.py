@@ -0,0 +1,84 @@
+# coding: utf-8
+
+# -------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+# --------------------------------------------------------------------------
+import time
+from threading import Lock
+
+from azure.storage.common._scheduler import _TransferScheduler
+from azure.storage.common._tuning import (
+    _TransferTuner,
+    _TunedTransfer,
+)
+from tests.testcase import (
+    StorageTestCase,
+)
+
+# ------------------------------------------------------------------------------
+
+_MB = 1024 * 1024
+
+
+class StorageTransferTuningTest(StorageTestCase):
+
+    def test_chunk_size_is_unchanged_without_measurements(self):
+        tuner = _TransferTuner()
+
+        self.assertEqual(4 * _MB, tuner.get_chunk_size(4 * _MB))
+        self.assertEqual(8 * _MB, tuner.get_chunk_size(4 * _MB, min_chunk_size=8 * _MB))
+
+    def test_chunk_size_follows_bandwidth_and_latency(self):
+        tuner = _TransferTuner()
+
+        # 10MB/s per connection with no latency, a chunk lasts a second
+        tuner.record(10 * _MB, 1)
+        tuner.record(5 * _MB, 0.5)
+        self.assertEqual(10 * _MB, tuner.get_chunk_size(4 * _MB))
+
+        # with half a second of latency, a chunk lasts 8 times the latency
+        tuner.samples.clear()
+        for _ in range(3):
+            tuner.record(10 * _MB, 1.5)
+        tuner.record(20 * _MB, 2)
+        self.assertEqual(40 * _MB, tuner.get_chunk_size(4 * _MB))
+        self.assertEqual(16 * _MB, tuner.get_chunk_size(4 * _MB, max_chunk_size=16 * _MB))
+
+    def test_tuned_transfer_adds_connections_while_throughput_rises(self):
+        tuner = _TransferTuner()
+
+        def process(chunk):
+            # the more chunks in flight, the more throughput
+            time.sleep(0.01)
+            return chunk * 2
+
+        # the previous transfer ended with 2 connections
+        tuner.connections = 2
+        transfer = _TunedTransfer(process, range(40), lambda chunk: 1, 8, tuner)
+        results = _TransferScheduler().run(transfer, 64)
+
+        self.assertEqual([chunk * 2 for chunk in range(40)], results)
+        self.assertGreater(tuner.connections, 2)
+
+    def test_tuned_transfer_stays_within_max_connections(self):
+        tuner = _TransferTuner()
+        tuner.connections = 16
+        in_flight = [0, 0]
+        lock = Lock()
+
+        def process(chunk):
+            with lock:
+                in_flight[0] += 1
+                in_flight[1] = max(in_flight[1], in_flight[0])
+            time.sleep(0.005)
+            with lock:
+                in_flight[0] -= 1
+            return chunk
+
+        transfer = _TunedTransfer(process, range(40), lambda chunk: 1, 3, tuner)
+        _TransferScheduler().run(transfer, 64)
+
+        self.assertLessEqual(in_flight[1], 3)
+        self.assertLessEqual(tuner.connections, 3)
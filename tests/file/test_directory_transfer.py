@@ -0,0 +1,246 @@
+# coding: utf-8
+
+# -------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+# --------------------------------------------------------------------------
+import os
+import shutil
+import time
+from threading import Lock
+
+from azure.common import (
+    AzureHttpError,
+    AzureMissingResourceHttpError,
+)
+from azure.storage.file import (
+    Directory,
+    File,
+    FileService,
+)
+from azure.storage.file.models import FileProperties
+from tests.testcase import (
+    StorageTestCase,
+)
+
+# ------------------------------------------------------------------------------
+
+
+class _FakeShareService(FileService):
+    '''
+    Keeps the directories and files of a single share in memory, by path.
+    '''
+
+    def __init__(self, directories=(), files=None):
+        super(_FakeShareService, self).__init__('account', 'a2V5')
+        self.directories = set(directories)
+        self.files = dict(files or {})
+        self.listed_directories = []
+        self.listed_snapshots = set()
+        self.created_directories = []
+        self.requests = []
+        self.lock = Lock()
+        self.range_delay = None
+        self.ranges_in_flight = 0
+        self.max_ranges_in_flight = 0
+
+    def _get_path(self, directory_name, file_name):
+        return '/'.join(name for name in (directory_name, file_name) if name)
+
+    def create_directory(self, share_name, directory_name, metadata=None, fail_on_exist=False, timeout=None):
+        parent_name = directory_name.rpartition('/')[0]
+        if parent_name and parent_name not in self.directories:
+            raise AzureHttpError('Parent Not Found', 404)
+        with self.lock:
+            self.created_directories.append(directory_name)
+            self.directories.add(directory_name)
+        return True
+
+    def create_file(self, share_name, directory_name, file_name, content_length, content_settings=None,
+                    metadata=None, timeout=None):
+        if directory_name and directory_name not in self.directories:
+            raise AzureHttpError('Parent Not Found', 404)
+        if 'failing' in file_name:
+            raise AzureHttpError('Server Busy', 503)
+        with self.lock:
+            self.files[self._get_path(directory_name, file_name)] = bytearray(content_length)
+
+    def update_range(self, share_name, directory_name, file_name, data, start_range, end_range,
+                     validate_content=False, timeout=None):
+        with self.lock:
+            self.ranges_in_flight += 1
+            self.max_ranges_in_flight = max(self.max_ranges_in_flight, self.ranges_in_flight)
+        if self.range_delay is not None:
+            time.sleep(self.range_delay)
+        with self.lock:
+            self.ranges_in_flight -= 1
+            self.requests.append(('update_range', file_name, start_range, end_range))
+            self.files[self._get_path(directory_name, file_name)][start_range:end_range + 1] = data
+
+    def get_file_properties(self, share_name, directory_name, file_name, timeout=None, snapshot=None):
+        props = FileProperties()
+        props.etag = 'etag'
+        props.content_length = len(self.files[self._get_path(directory_name, file_name)])
+        return File(file_name, None, props, {})
+
+    def _get_file(self, share_name, directory_name, file_name, start_range=None, end_range=None,
+                  validate_content=False, timeout=None, _context=None, snapshot=None):
+        with self.lock:
+            self.requests.append(('get', file_name, start_range, end_range))
+        content = bytes(self.files[self._get_path(directory_name, file_name)])
+        props = FileProperties()
+        props.etag = 'etag'
+        if start_range is None:
+            return File(file_name, content, props, {})
+        props.content_range = 'bytes {0}-{1}/{2}'.format(start_range, end_range, len(content))
+        return File(file_name, content[start_range:end_range + 1], props, {})
+
+    def _children(self, directory_name):
+        parent = '' if directory_name is None else directory_name + '/'
+        directories = [path[len(parent):] for path in self.directories
+                       if path.startswith(parent) and '/' not in path[len(parent):]]
+        files = [path[len(parent):] for path in self.files
+                 if path.startswith(parent) and '/' not in path[len(parent):]]
+        return sorted(directories), sorted(files)
+
+    def list_directories_and_files(self, share_name, directory_name=None, num_results=None,
+                                   marker=None, timeout=None, prefix=None, snapshot=None):
+        if directory_name is not None and directory_name not in self.directories:
+            raise AzureMissingResourceHttpError('Not Found', 404)
+        with self.lock:
+            self.listed_directories.append(directory_name)
+            self.listed_snapshots.add(snapshot)
+        directories, files = self._children(directory_name)
+        for name in directories:
+            yield Directory(name)
+        for name in files:
+            props = FileProperties()
+            props.content_length = len(self.files[(directory_name + '/' if directory_name else '') + name])
+            yield File(name, None, props)
+
+
+class StorageFileDirectoryTransferTest(StorageTestCase):
+
+    def test_walk_share_lists_every_directory_once(self):
+        directories = ['a', 'a/b', 'a/b/c', 'd', 'd/e', 'f']
+        files = {'root.txt': b'1', 'a/one.txt': b'22', 'a/b/c/two.txt': b'333', 'd/e/three.txt': b''}
+        service = _FakeShareService(directories, files)
+
+        walked = dict((directory_name, ([d.name for d in subdirectories], [f.name for f in files]))
+                      for directory_name, subdirectories, files in
+                      service.walk_share('share', snapshot='2018-01-01T00:00:00.0000000Z', max_connections=3))
+
+        self.assertEqual([None] + directories, sorted(walked, key=lambda name: name or ''))
+        self.assertEqual((['a', 'd', 'f'], ['root.txt']), walked[None])
+        self.assertEqual((['c'], []), walked['a/b'])
+        self.assertEqual(([], ['two.txt']), walked['a/b/c'])
+        self.assertEqual(len(directories) + 1, len(service.listed_directories))
+        self.assertEqual(set(['2018-01-01T00:00:00.0000000Z']), service.listed_snapshots)
+
+    def test_walk_share_from_directory(self):
+        service = _FakeShareService(['a', 'a/b', 'c'], {'a/b/one.txt': b'1'})
+
+        walked = [directory_name for directory_name, _, _ in service.walk_share('share', 'a')]
+
+        self.assertEqual(['a', 'a/b'], walked)
+
+    def test_walk_share_raises_listing_errors(self):
+        service = _FakeShareService()
+
+        with self.assertRaises(AzureMissingResourceHttpError):
+            list(service.walk_share('share', 'missing'))
+
+    def test_upload_directory_to_share_creates_each_directory_once(self):
+        directory_path = self.get_resource_name('directory') + '.temp'
+        files = {
+            'a.txt': os.urandom(100),
+            'logs/b.txt': os.urandom(200),
+            'logs/c.txt': os.urandom(300),
+            'logs/old/d.txt': os.urandom(10),
+            'logs/old/large.dat': os.urandom(2 * 1024 + 10),
+            'logs/failing.txt': os.urandom(10),
+        }
+        service = _FakeShareService()
+        service.MAX_RANGE_SIZE = 1024
+
+        try:
+            for relative_path, data in files.items():
+                file_path = os.path.join(directory_path, *relative_path.split('/'))
+                if not os.path.isdir(os.path.dirname(file_path)):
+                    os.makedirs(os.path.dirname(file_path))
+                with open(file_path, 'wb') as stream:
+                    stream.write(data)
+
+            result = service.upload_directory_to_share('share', directory_path, 'backup/today', max_connections=4)
+        finally:
+            shutil.rmtree(directory_path, ignore_errors=True)
+
+        self.assertEqual(['backup', 'backup/today', 'backup/today/logs', 'backup/today/logs/old'],
+                         sorted(service.created_directories))
+        for relative_path, data in files.items():
+            if 'failing' not in relative_path:
+                self.assertEqual(data, bytes(service.files['backup/today/' + relative_path]))
+        self.assertEqual(5, result.files)
+        self.assertEqual(1, len(result.failures))
+        self.assertTrue(result.failures[0][0].endswith('failing.txt'))
+        # the small files are uploaded with a single range
+        self.assertEqual(4 + 3, len(service.requests))
+
+    def test_upload_directory_to_share_puts_ranges_of_large_file_in_parallel(self):
+        directory_path = self.get_resource_name('directory') + '.temp'
+        data = os.urandom(8 * 1024)
+        service = _FakeShareService()
+        service.MAX_RANGE_SIZE = 1024
+        service.range_delay = 0.05
+
+        try:
+            os.makedirs(directory_path)
+            with open(os.path.join(directory_path, 'large.dat'), 'wb') as stream:
+                stream.write(data)
+
+            result = service.upload_directory_to_share('share', directory_path, max_connections=3)
+        finally:
+            shutil.rmtree(directory_path, ignore_errors=True)
+
+        self.assertEqual(1, result.files)
+        self.assertEqual(data, bytes(service.files['large.dat']))
+        # the idle threads of the directory upload help with the ranges of the file
+        self.assertGreater(service.max_ranges_in_flight, 1)
+        self.assertLessEqual(service.max_ranges_in_flight, 3)
+
+    def test_download_directory_from_share_downloads_tree(self):
+        directories = ['backup', 'backup/logs', 'backup/logs/empty']
+        files = {
+            'backup/a.txt': os.urandom(100),
+            'backup/logs/b.txt': os.urandom(200),
+            'backup/logs/large.dat': os.urandom(2 * 1024 + 10),
+            'other.txt': os.urandom(10),
+        }
+        service = _FakeShareService(directories, dict((name, bytearray(data)) for name, data in files.items()))
+        service.MAX_SINGLE_GET_SIZE = 1024
+        service.MAX_CHUNK_GET_SIZE = 1024
+        directory_path = self.get_resource_name('directory') + '.temp'
+
+        try:
+            result = service.download_directory_from_share('share', 'backup', directory_path,
+                                                           snapshot='2018-01-01T00:00:00.0000000Z')
+            downloaded = {}
+            for root, _, file_names in os.walk(directory_path):
+                for file_name in file_names:
+                    with open(os.path.join(root, file_name), 'rb') as stream:
+                        relative_path = os.path.relpath(os.path.join(root, file_name), directory_path)
+                        downloaded[relative_path.replace(os.sep, '/')] = stream.read()
+            empty_directory_created = os.path.isdir(os.path.join(directory_path, 'logs', 'empty'))
+        finally:
+            shutil.rmtree(directory_path, ignore_errors=True)
+
+        self.assertEqual(dict((name[len('backup/'):], data) for name, data in files.items()
+                              if name.startswith('backup/')), downloaded)
+        self.assertTrue(empty_directory_created)
+        self.assertEqual(3, result.files)
+        self.assertEqual([], result.failures)
+        self.assertEqual(set(['2018-01-01T00:00:00.0000000Z']), service.listed_snapshots)
+        # the small files are downloaded with a single get of the whole file
+        self.assertIn(('get', 'a.txt', None, None), service.requests)
+        self.assertIn(('get', 'large.dat', 2048, 2057), service.requests)
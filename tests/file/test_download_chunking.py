@@ -0,0 +1,136 @@
+# coding: utf-8
+
+# -------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+# --------------------------------------------------------------------------
+import os
+from io import BytesIO
+
+from azure.common import (
+    AzureException,
+    AzureHttpError,
+)
+from azure.storage.file import (
+    File,
+    FileService,
+)
+from azure.storage.file.models import FileProperties
+from tests.testcase import (
+    StorageTestCase,
+)
+
+# ------------------------------------------------------------------------------
+
+
+class _FakeFileService(FileService):
+    '''
+    Serves ranged gets of a file from memory, recording the requested ranges.
+    '''
+
+    def __init__(self, content):
+        super(_FakeFileService, self).__init__('account', 'a2V5')
+        self.content = content
+        self.etag = 'etag'
+        self.requested_ranges = []
+        self.fail_after_requests = None
+
+    def get_file_properties(self, share_name, directory_name, file_name, timeout=None, snapshot=None):
+        props = FileProperties()
+        props.etag = self.etag
+        props.content_length = len(self.content)
+        return File(file_name, None, props, {})
+
+    def _get_file(self, share_name, directory_name, file_name, start_range=None, end_range=None,
+                  validate_content=False, timeout=None, _context=None, snapshot=None):
+        if self.fail_after_requests is not None and len(self.requested_ranges) >= self.fail_after_requests:
+            raise AzureHttpError('Server Busy', 503)
+        self.requested_ranges.append((start_range, end_range))
+        props = FileProperties()
+        props.etag = self.etag
+        return File(file_name, self.content[start_range:end_range + 1], props, {})
+
+
+class StorageFileDownloadChunkingTest(StorageTestCase):
+
+    def setUp(self):
+        super(StorageFileDownloadChunkingTest, self).setUp()
+        name = self.get_resource_name('checkpoint')
+        self.file_path = name + '.temp.dat'
+        self.checkpoint_path = name + '.checkpoint.temp.dat'
+
+    def tearDown(self):
+        for path in (self.file_path, self.checkpoint_path):
+            if os.path.isfile(path):
+                os.remove(path)
+        return super(StorageFileDownloadChunkingTest, self).tearDown()
+
+    def test_checkpointed_download_resumes_missing_chunks(self):
+        content = os.urandom(10 * 1024 + 100)
+        service = _FakeFileService(content)
+        service.MAX_CHUNK_GET_SIZE = 1024
+        service.fail_after_requests = 5
+
+        with self.assertRaises(AzureHttpError):
+            service.get_file_to_path('share', None, 'file', self.file_path, max_connections=1,
+                                     checkpoint_path=self.checkpoint_path)
+
+        service.fail_after_requests = None
+        service.requested_ranges = []
+        file = service.get_file_to_path('share', None, 'file', self.file_path, max_connections=3,
+                                        checkpoint_path=self.checkpoint_path)
+        with open(self.file_path, 'rb') as stream:
+            downloaded = stream.read()
+
+        self.assertEqual(content, downloaded)
+        self.assertEqual(len(content), file.properties.content_length)
+        self.assertFalse(os.path.isfile(self.checkpoint_path))
+        self.assertEqual(6, len(service.requested_ranges))
+
+    def test_checkpointed_download_fails_if_file_changes(self):
+        service = _FakeFileService(os.urandom(4 * 1024))
+        service.MAX_CHUNK_GET_SIZE = 1024
+        get_file = service._get_file
+
+        def _get_file_then_modify(*args, **kwargs):
+            # the file is modified after the first chunk
+            file = get_file(*args, **kwargs)
+            service.etag = 'etag2'
+            return file
+        service._get_file = _get_file_then_modify
+
+        with self.assertRaises(AzureException):
+            service.get_file_to_path('share', None, 'file', self.file_path, max_connections=1,
+                                     checkpoint_path=self.checkpoint_path)
+
+        # the next attempt sees the new etag and restarts from the beginning
+        service._get_file = get_file
+        service.requested_ranges = []
+        service.get_file_to_path('share', None, 'file', self.file_path, max_connections=1,
+                                 checkpoint_path=self.checkpoint_path)
+
+        self.assertEqual(4, len(service.requested_ranges))
+
+    def test_download_with_file_hint_skips_first_get(self):
+        content = os.urandom(4 * 1024 + 100)
+        service = _FakeFileService(content)
+        service.MAX_CHUNK_GET_SIZE = 1024
+        file_hint = service.get_file_properties('share', None, 'file')
+        stream = BytesIO()
+
+        file = service.get_file_to_stream('share', None, 'file', stream, max_connections=3, file_hint=file_hint)
+
+        self.assertEqual(content, stream.getvalue())
+        self.assertEqual(len(content), file.properties.content_length)
+        self.assertEqual([(0, 1023), (1024, 2047), (2048, 3071), (3072, 4095), (4096, 4195)],
+                         sorted(service.requested_ranges))
+
+    def test_download_with_file_hint_fails_if_file_changed(self):
+        service = _FakeFileService(os.urandom(4 * 1024))
+        service.MAX_CHUNK_GET_SIZE = 1024
+        file_hint = service.get_file_properties('share', None, 'file')
+        service.etag = 'etag2'
+
+        with self.assertRaises(AzureException):
+            service.get_file_to_stream('share', None, 'file', BytesIO(), max_connections=2, file_hint=file_hint)
@@ -0,0 +1,122 @@
+# coding: utf-8
+
+# -------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+# --------------------------------------------------------------------------
+import threading
+import time
+
+from azure.common import AzureHttpError
+from azure.storage.queue import (
+    PutMessagesResult,
+    QueueMessage,
+    QueueMessageFormat,
+    QueueService,
+)
+from azure.storage.queue._serialization import (
+    _convert_queue_message_xml,
+    _get_queue_message_xml,
+)
+from tests.testcase import (
+    StorageTestCase,
+)
+
+# ------------------------------------------------------------------------------
+
+
+class _FakeQueueService(QueueService):
+    '''
+    Accepts the put message requests without sending them, rejecting them as
+    busy while more than capacity are in flight.
+    '''
+
+    def __init__(self, capacity=None):
+        super(_FakeQueueService, self).__init__('account', 'a2V5')
+        self.capacity = capacity
+        self.lock = threading.Lock()
+        self.bodies = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.busy_responses = 0
+
+    def _perform_request(self, request, parser=None, parser_args=None, operation_context=None,
+                         expected_errors=None):
+        content = parser_args[-1]
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            busy = self.capacity is not None and self.in_flight > self.capacity
+            if busy:
+                self.busy_responses += 1
+        try:
+            time.sleep(0.01)
+            if busy:
+                raise AzureHttpError('Server Busy', 503)
+            if content == u'invalid':
+                raise AzureHttpError('Bad Request', 400)
+            with self.lock:
+                self.bodies.append(request.body)
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+        message = QueueMessage()
+        message.id = u'id-' + content
+        message.content = content
+        return [message]
+
+
+class StorageQueueBatchTest(StorageTestCase):
+
+    def test_put_messages_returns_messages_in_order(self):
+        service = _FakeQueueService()
+        contents = (u'message {0}'.format(i) for i in range(50))
+
+        result = service.put_messages('queue', contents, max_connections=4)
+
+        self.assertIsInstance(result, PutMessagesResult)
+        self.assertEqual([u'message {0}'.format(i) for i in range(50)],
+                         [message.content for message in result.messages])
+        self.assertEqual([], result.failures)
+        self.assertEqual(50, len(service.bodies))
+        self.assertGreater(service.max_in_flight, 1)
+        self.assertLessEqual(service.max_in_flight, 4)
+
+    def test_put_messages_reports_failures_in_order(self):
+        service = _FakeQueueService()
+        contents = [u'a', u'invalid', u'b', u'invalid', u'c']
+
+        result = service.put_messages('queue', contents)
+
+        self.assertEqual([u'id-a', None, u'id-b', None, u'id-c'],
+                         [message and message.id for message in result.messages])
+        self.assertEqual([1, 3], [index for index, _ in result.failures])
+        self.assertTrue(all(error.status_code == 400 for _, error in result.failures))
+
+    def test_put_messages_sends_fewer_at_once_when_queue_busy(self):
+        service = _FakeQueueService(capacity=2)
+
+        result = service.put_messages('queue', [u'message'] * 100, max_connections=8)
+
+        self.assertEqual([], result.failures)
+        self.assertEqual(100, len(service.bodies))
+        self.assertGreater(service.busy_responses, 0)
+        # the rejections lowered the number of messages sent at once well below 8
+        self.assertLess(service.busy_responses, 50)
+
+    def test_put_messages_fails_message_when_busy_at_one_connection(self):
+        service = _FakeQueueService(capacity=0)
+
+        result = service.put_messages('queue', [u'message'], max_connections=2)
+
+        self.assertEqual([None], result.messages)
+        self.assertEqual(503, result.failures[0][1].status_code)
+
+    def test_message_template_matches_element_tree(self):
+        for content in [u'message', u'<a b="c"> & \'d\'', u'é中\r\n\t']:
+            for encode_function in [QueueMessageFormat.text_xmlencode, QueueMessageFormat.noencode,
+                                    QueueMessageFormat.text_base64encode]:
+                self.assertEqual(_convert_queue_message_xml(content, encode_function, None),
+                                 _get_queue_message_xml(content, encode_function, None))